@@ -10,4 +10,137 @@ class Config:
     TRANSLATION_API_KEY = os.getenv("TRANSLATION_API_KEY", "your-api-key")
     HANDWRITING_MODEL_PATH = os.getenv("HANDWRITING_MODEL_PATH", "models/handwriting_model.pt")
 
+    # PGNet model served by /api/process-image
+    PGNET_MODEL_PATH = os.getenv("PGNET_MODEL_PATH", "app/utils/pgnet.onnx")
+    PGNET_USE_GPU = os.getenv("PGNET_USE_GPU", "False").lower() == "true"
+    # Named model variants served side by side ("name=path,name=path"); empty serves
+    # PGNET_MODEL_PATH as the only variant, "default". Requests pick a variant with the
+    # `model` field, otherwise by weight ("name=weight,..."; empty sends everything to
+    # the first variant). Incremental sessions stick to one variant.
+    PGNET_MODEL_VARIANTS = os.getenv("PGNET_MODEL_VARIANTS", "")
+    PGNET_MODEL_WEIGHTS = os.getenv("PGNET_MODEL_WEIGHTS", "")
+    # onnxruntime-optimized graphs are cached here, keyed by model hash and session
+    # options, so later starts skip graph optimization. Empty turns the cache off.
+    PGNET_OPTIMIZED_CACHE_DIR = os.getenv("PGNET_OPTIMIZED_CACHE_DIR", "model_cache")
+    # Input shape (height, width) used for the warm-up inference at startup.
+    # 640x896 is what E2EResizeForTest produces for a 480x640 webcam frame.
+    PGNET_WARMUP_SHAPE = os.getenv("PGNET_WARMUP_SHAPE", "640,896")
+
+    # Inference through IOBinding with preallocated, reused buffers per input shape.
+    # Optional shape buckets ("HxW,HxW") pad inputs up to the smallest bucket that fits;
+    # with fixed-shape models each bucket runs on a static-shape copy of the model.
+    # PGNET_BINDING_MAX_SHAPES input sizes keep their buffers, at every batch size.
+    PGNET_IO_BINDING = os.getenv("PGNET_IO_BINDING", "True").lower() == "true"
+    PGNET_SHAPE_BUCKETS = os.getenv("PGNET_SHAPE_BUCKETS", "")
+    PGNET_BINDING_MAX_SHAPES = int(os.getenv("PGNET_BINDING_MAX_SHAPES", "8"))
+    PGNET_FIXED_SHAPE_MODELS = os.getenv("PGNET_FIXED_SHAPE_MODELS", "False").lower() == "true"
+
+    # Large uploads are decoded at 1/2, 1/4 or 1/8 scale (JPEG DCT scaling) when the model
+    # would downscale them anyway; boxes are mapped back to the original coordinates.
+    # Inline renders at full size (RENDER_MAX_SIDE=0) still decode the full image, so
+    # set a preview size (or use the boxes/lazy render modes) to benefit from it.
+    # Uploads above MAX_UPLOAD_MB or MAX_IMAGE_MEGAPIXELS are rejected with 413, formats
+    # other than JPEG, PNG, WebP and BMP (whose size cannot be checked up front) with 415.
+    PGNET_REDUCED_DECODE = os.getenv("PGNET_REDUCED_DECODE", "True").lower() == "true"
+    MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "25"))
+    MAX_IMAGE_MEGAPIXELS = float(os.getenv("MAX_IMAGE_MEGAPIXELS", "50"))
+
+    # Tiled recognition of large frames (e.g. 4K boards) at native scale: frames with a
+    # longer side above PGNET_TILE_MIN_SIDE (0 = never) are split into overlapping
+    # tiles, recognized concurrently and merged (cut lines joined, duplicates dropped
+    # when they overlap by more than PGNET_TILE_NMS_THRESHOLD of the smaller box).
+    PGNET_TILE_MIN_SIDE = int(os.getenv("PGNET_TILE_MIN_SIDE", "0"))
+    PGNET_TILE_SIZE = int(os.getenv("PGNET_TILE_SIZE", "768"))
+    PGNET_TILE_OVERLAP = int(os.getenv("PGNET_TILE_OVERLAP", "128"))
+    PGNET_TILE_WORKERS = int(os.getenv("PGNET_TILE_WORKERS", "8"))
+    PGNET_TILE_NMS_THRESHOLD = float(os.getenv("PGNET_TILE_NMS_THRESHOLD", "0.5"))
+
+    # Micro-batching of concurrent requests (a max batch size of 1 turns it off)
+    PGNET_BATCH_MAX_SIZE = int(os.getenv("PGNET_BATCH_MAX_SIZE", "8"))
+    PGNET_BATCH_WINDOW_MS = float(os.getenv("PGNET_BATCH_WINDOW_MS", "5"))
+
+    # Cache of (boxes, texts) per image; a size of 0 disables it. Perceptual
+    # near-duplicate matching is off unless a max Hamming distance >= 0 is set.
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "60"))
+    RESULT_CACHE_PHASH_MAX_DISTANCE = int(os.getenv("RESULT_CACHE_PHASH_MAX_DISTANCE", "-1"))
+
+    # Translation provider: googletrans | http (LibreTranslate-compatible server or local stub) | argos | echo
+    TRANSLATE_PROVIDER = os.getenv("TRANSLATE_PROVIDER", "googletrans")
+    TRANSLATE_SOURCE_LANGUAGE = os.getenv("TRANSLATE_SOURCE_LANGUAGE", "auto")
+    TRANSLATE_MAX_CONCURRENCY = int(os.getenv("TRANSLATE_MAX_CONCURRENCY", "8"))
+    TRANSLATE_HTTP_URL = os.getenv("TRANSLATE_HTTP_URL", "http://localhost:5000/translate")
+    TRANSLATE_HTTP_API_KEY = os.getenv("TRANSLATE_HTTP_API_KEY", "")
+    TRANSLATE_HTTP_TIMEOUT_SECONDS = float(os.getenv("TRANSLATE_HTTP_TIMEOUT_SECONDS", "10"))
+
+    # Cache of translations keyed by (normalized text, target language); a size of 0
+    # disables it. Set TRANSLATION_CACHE_DB to a file path to keep translations across restarts.
+    TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "4096"))
+    TRANSLATION_CACHE_DB = os.getenv("TRANSLATION_CACHE_DB", "")
+
+    # Annotation rendering: inline (data URL in the response) | boxes (polygons only) |
+    # lazy (polygons + a result id to fetch the image from /api/annotated-image/{id}).
+    # RENDER_MAX_SIDE bounds the preview resolution (0 renders at full size).
+    RENDER_MODE = os.getenv("RENDER_MODE", "inline")
+    RENDER_MAX_SIDE = int(os.getenv("RENDER_MAX_SIDE", "0"))
+    RENDER_FORMAT = os.getenv("RENDER_FORMAT", "jpeg")  # jpeg | webp | png
+    RENDER_QUALITY = int(os.getenv("RENDER_QUALITY", "95"))
+    ANNOTATION_STORE_SIZE = int(os.getenv("ANNOTATION_STORE_SIZE", "64"))
+    ANNOTATION_STORE_TTL_SECONDS = float(os.getenv("ANNOTATION_STORE_TTL_SECONDS", "120"))
+
+    # Recognition responses are content-negotiated (Accept: application/json, the compact
+    # application/vnd.intercollab.compact+json or application/msgpack). With
+    # RESPONSE_COMPRESSION=gzip, bodies of at least RESPONSE_COMPRESSION_MIN_BYTES are
+    # gzipped for clients that accept it; the low default level keeps it cheap per frame.
+    RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "none")  # none | gzip
+    RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    RESPONSE_COMPRESSION_LEVEL = int(os.getenv("RESPONSE_COMPRESSION_LEVEL", "1"))
+
+    # Incremental per-session recognition (only changed tiles are re-read). Off with
+    # PGNET_EXECUTOR=process: a session's tile state cannot follow its frames across
+    # worker processes, so each frame is recognized in full.
+    INCREMENTAL_TILE_SIZE = int(os.getenv("INCREMENTAL_TILE_SIZE", "32"))
+    INCREMENTAL_DIFF_THRESHOLD = float(os.getenv("INCREMENTAL_DIFF_THRESHOLD", "8"))
+    INCREMENTAL_PADDING = int(os.getenv("INCREMENTAL_PADDING", "32"))
+    INCREMENTAL_FULL_REFRESH_RATIO = float(os.getenv("INCREMENTAL_FULL_REFRESH_RATIO", "0.5"))
+    INCREMENTAL_MAX_SESSIONS = int(os.getenv("INCREMENTAL_MAX_SESSIONS", "64"))
+    INCREMENTAL_SESSION_TTL_SECONDS = float(os.getenv("INCREMENTAL_SESSION_TTL_SECONDS", "600"))
+
+    # Lines of a session are followed across frames by polygon IoU, keeping their id
+    # (and translations) while they overlap their previous box by at least LINE_TRACK_MIN_IOU.
+    # Lines that vanish are remembered for LINE_TRACK_MAX_MISSED frames.
+    LINE_TRACK_MIN_IOU = float(os.getenv("LINE_TRACK_MIN_IOU", "0.3"))
+    LINE_TRACK_MAX_MISSED = int(os.getenv("LINE_TRACK_MAX_MISSED", "2"))
+
+    # Execution of the blocking pipeline off the event loop
+    PGNET_EXECUTOR = os.getenv("PGNET_EXECUTOR", "thread")  # thread | process
+    PGNET_EXECUTOR_WORKERS = int(os.getenv("PGNET_EXECUTOR_WORKERS", "4"))
+    PGNET_EXECUTOR_QUEUE_SIZE = int(os.getenv("PGNET_EXECUTOR_QUEUE_SIZE", "16"))
+    TRANSLATE_EXECUTOR_WORKERS = int(os.getenv("TRANSLATE_EXECUTOR_WORKERS", "8"))
+    TRANSLATE_EXECUTOR_QUEUE_SIZE = int(os.getenv("TRANSLATE_EXECUTOR_QUEUE_SIZE", "64"))
+    # Default per-request deadline; clients may ask for less with the X-Request-Timeout-Ms header
+    REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "10"))
+
+    # Dedicated inference processes, each pinned to its own cores ("0-3;4-7", one set per
+    # worker; empty splits the available cores) with its own session. Frames reach them
+    # through a shared-memory ring of PGNET_WORKER_RING_SLOTS slots (0 = 2 per worker) of
+    # PGNET_WORKER_SLOT_MB each; larger frames are pickled. 0 processes runs inference here.
+    # Every API process starts its own pool: with several uvicorn workers there is one set
+    # of inference processes (and sessions) per API worker, so size this per API worker.
+    # A worker that does not answer within REQUEST_TIMEOUT_SECONDS is restarted.
+    PGNET_WORKER_PROCESSES = int(os.getenv("PGNET_WORKER_PROCESSES", "0"))
+    PGNET_WORKER_CORES = os.getenv("PGNET_WORKER_CORES", "")
+    PGNET_WORKER_RING_SLOTS = int(os.getenv("PGNET_WORKER_RING_SLOTS", "0"))
+    PGNET_WORKER_SLOT_MB = float(os.getenv("PGNET_WORKER_SLOT_MB", "8"))
+
+    # Logging and observability. ORT traces from /api/debug/profile are written to PGNET_PROFILE_DIR.
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    PGNET_PROFILE_DIR = os.getenv("PGNET_PROFILE_DIR", "profiles")
+
+    # onnxruntime SessionOptions (0 threads lets onnxruntime pick)
+    ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+    ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "0"))
+    ORT_EXECUTION_MODE = os.getenv("ORT_EXECUTION_MODE", "sequential")  # sequential | parallel
+    ORT_GRAPH_OPTIMIZATION_LEVEL = os.getenv("ORT_GRAPH_OPTIMIZATION_LEVEL", "all")  # disable | basic | extended | all
+
 config = Config()
@@ -1,13 +1,61 @@
 # intercollab-backend/app/main.py
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from contextlib import asynccontextmanager
+import asyncio
 import base64
 import io
+import logging
 import os
-from app.utils.utils import get_text_prediction
+import time
+import uuid
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from app.config import config
+from app.utils.batching import scheduler_stats
+from app.utils.incremental import incremental_sessions
+from app.utils.inference_pgnet import ImageTooLarge, UnsupportedImage
+from app.utils.line_tracking import line_trackers
+from app.utils.metrics import REQUEST_SECONDS, metrics, stage
+from app.utils.model_manager import model_manager
+from app.utils.worker_pool import get_worker_pool, start_worker_pool, stop_worker_pool
+from app.utils.profiling import ort_profiler
+from app.utils.executor import ExecutorSaturated, inference_executor, translation_executor
+from app.utils.rendering import annotation_store, check_render_options
+from app.utils.response_formats import NotAcceptable, encode_response, negotiate, serialize
+from app.utils.result_cache import result_cache
+from app.utils.service_metrics import register_service_metrics
+from app.utils.session_registry import registry
+from app.utils.shape_buckets import runner_stats
+from app.utils.tiling import tiled_recognizer
+from app.utils.translation import get_translation_service
+from app.utils.translation_cache import translation_cache
+from app.utils.utils import get_text_prediction, render_stored_result, track_lines
+
+logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm up every PGNet variant once, before the first request arrives,
+    # either here or in the dedicated inference worker processes (one pool per API worker).
+    pool = start_worker_pool()
+    try:
+        if pool is not None:
+            model_manager.serve_remotely(pool)
+            await asyncio.to_thread(pool.wait_ready, 300)
+        await asyncio.to_thread(model_manager.load_all)
+    except Exception as e:
+        # Keep serving so /api/health and /api/debug/model-path can report the problem
+        logger.exception("Error loading PGNet model: %s", e)
+    yield
+    stop_worker_pool()
+    await get_translation_service().close()
+    inference_executor.shutdown()
+    translation_executor.shutdown()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow requests from frontend
 app.add_middleware(
@@ -18,37 +66,452 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/api/process-image")
-async def process_image(image_data: str = Form(...)):
+in_flight_requests = 0
+register_service_metrics(lambda: in_flight_requests)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    global in_flight_requests
+    in_flight_requests += 1
+    started = time.perf_counter()
+    status = 500
     try:
-        # Remove header from base64 string if present
-        if "base64," in image_data:
-            image_data = image_data.split("base64,")[1]
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        in_flight_requests -= 1
+        # Label by route template, not the raw path, to keep the number of series bounded
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(status)
+        )
+
+class ClientDisconnected(Exception):
+    pass
+
+def request_timeout(request: Request):
+    """Per-request deadline in seconds: the X-Request-Timeout-Ms header, capped by the configured default."""
+    timeout = config.REQUEST_TIMEOUT_SECONDS
+    header = request.headers.get("x-request-timeout-ms")
+    if header:
+        try:
+            timeout = min(timeout, max(float(header), 1.0) / 1000.0)
+        except ValueError:
+            pass
+    return timeout
+
+async def run_until_done(request: Request, coro):
+    """
+    Await a coroutine under the request deadline.
+    
+    The work is abandoned when its deadline passes or the client disconnects.
+    """
+    if await request.is_disconnected():
+        coro.close()
+        raise ClientDisconnected()
+    work = asyncio.ensure_future(asyncio.wait_for(coro, request_timeout(request)))
+    while True:
+        done, _ = await asyncio.wait({work}, timeout=0.25)
+        if done:
+            return work.result()
+        if await request.is_disconnected():
+            work.cancel()
+            raise ClientDisconnected()
+
+async def run_blocking(request: Request, executor, fn, *args):
+    """Run blocking work on a bounded executor, off the event loop, under the request deadline."""
+    return await run_until_done(request, executor.run(fn, *args, timeout=request_timeout(request)))
+
+def overload_response(e):
+    if isinstance(e, ExecutorSaturated):
+        return JSONResponse(
+            status_code=503,
+            content={"status": "error", "message": "Server busy, retry shortly"},
+            headers={"Retry-After": "1"}
+        )
+    if isinstance(e, asyncio.TimeoutError):
+        return JSONResponse(
+            status_code=504,
+            content={"status": "error", "message": "Request deadline exceeded"}
+        )
+    if isinstance(e, ClientDisconnected):
+        # Nobody is listening any more; nginx's "client closed request"
+        return JSONResponse(status_code=499, content={"status": "error", "message": "Client disconnected"})
+    return None
+
+def bad_request(message):
+    return JSONResponse(status_code=400, content={"status": "error", "message": message})
+
+def incremental_enabled(requested=True):
+    # A session's tile state lives in the process that recognizes its frames; with a
+    # process-pool executor each frame may land in another worker, so every frame is
+    # recognized in full there
+    return requested and inference_executor.kind != "process"
+
+async def translate_lines(result, session_id, target_language):
+    """
+    Translate a tracked result line by line; lines already translated for the session are reused.
+    
+    Adds "translation" to every line and the joined "translated_text".
+    """
+    lines = await line_trackers.translate(
+        session_id, result["lines"], target_language, get_translation_service().translate_many
+    )
+    result["translated_text"] = " ".join(line["translation"] for line in lines)
+    return result
+
+def max_upload_bytes():
+    return int(config.MAX_UPLOAD_MB * 1024 * 1024)
+
+def too_large(message):
+    return JSONResponse(status_code=413, content={"status": "error", "message": message})
+
+async def read_upload(request: Request):
+    """
+    Read a raw request body as it streams in, giving up as soon as it exceeds MAX_UPLOAD_MB.
+    
+    Returns:
+        bytearray | None: The body, or None when it is too large
+    """
+    limit = max_upload_bytes()
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > limit:
+        return None
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            return None
+    return body
+
+async def recognize_upload(
+    request: Request, image_bytes, session_id, render_mode, max_side, image_format, quality, model, target_language
+):
+    """
+    Validate the options, run the pipeline and build the response shared by both upload endpoints.
+    
+    The response format follows the Accept header: application/json (default),
+    application/vnd.intercollab.compact+json or application/msgpack.
+    """
+    try:
+        response_format = negotiate(request.headers.get("accept"))
+    except NotAcceptable as e:
+        return JSONResponse(status_code=406, content={"status": "error", "message": str(e)})
+    try:
+        render_mode, image_format = check_render_options(render_mode, image_format)
+        if model:
+            model_manager.choose(model)
+    except ValueError as e:
+        return bad_request(str(e))
+    if target_language and not session_id:
+        return bad_request("target_language needs a session_id to track lines")
+    try:
+        # Process the image on the inference executor, off the event loop
+        result = await run_blocking(
+            request, inference_executor, get_text_prediction,
+            image_bytes, session_id, render_mode, max_side, image_format, quality, model,
+            incremental_enabled(), response_format != "json"
+        )
+        # Lines are tracked here, where the session's tracks live (not in an executor process)
+        if session_id:
+            result = track_lines(result, session_id)
+        if render_mode == "lazy":
+            result["result_id"] = annotation_store.put(image_bytes, result["boxes"])
+        # Only new or changed lines go to the translation provider
+        if target_language:
+            result = await run_until_done(request, translate_lines(result, session_id, target_language))
         
+        with stage("recognition", "serialize"):
+            return encode_response(
+                {"status": "success", **result}, response_format, request.headers.get("accept-encoding")
+            )
+    except (ExecutorSaturated, asyncio.TimeoutError, ClientDisconnected) as e:
+        return overload_response(e)
+    except ImageTooLarge as e:
+        return too_large(str(e))
+    except UnsupportedImage as e:
+        return JSONResponse(status_code=415, content={"status": "error", "message": str(e)})
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        logger.error("Error processing image: %s\n%s", e, error_details)
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": str(e), "details": error_details}
+        )
+
+@app.post("/api/process-image")
+async def process_image(
+    request: Request,
+    image_data: str = Form(...),
+    session_id: str = Form(None),
+    render_mode: str = Form(None),
+    max_side: int = Form(None),
+    image_format: str = Form(None),
+    quality: int = Form(None),
+    model: str = Form(None),
+    target_language: str = Form(None)
+):
+    # Remove header from base64 string if present
+    if "base64," in image_data:
+        image_data = image_data.split("base64,")[1]
+    # Base64 takes 4 characters for every 3 bytes
+    if len(image_data) // 4 * 3 > max_upload_bytes():
+        return too_large(f"Upload exceeds {config.MAX_UPLOAD_MB:g} MB")
+    try:
         # Decode base64 to bytes
-        image_bytes = base64.b64decode(image_data)
-        
-        # Process the image using the utility function
-        recognized_text, annotated_image = get_text_prediction(image_bytes)
-        
-        return {
-            "status": "success", 
-            "text": recognized_text,
-            "annotated_image": annotated_image
-        }
+        with stage("recognition", "base64_decode"):
+            image_bytes = base64.b64decode(image_data)
+    except ValueError as e:
+        return bad_request(f"Invalid base64 image data: {e}")
+    if not image_bytes:
+        return bad_request("Empty image data")
+    # Drop the base64 text before inference so it is not held alongside the bytes
+    del image_data
+    return await recognize_upload(
+        request, image_bytes, session_id, render_mode, max_side, image_format, quality, model, target_language
+    )
+
+@app.post("/api/process-image/raw")
+async def process_image_raw(
+    request: Request,
+    session_id: str = None,
+    render_mode: str = None,
+    max_side: int = None,
+    image_format: str = None,
+    quality: int = None,
+    model: str = None,
+    target_language: str = None
+):
+    """
+    Like /api/process-image, but the body is the encoded image itself and the options are query parameters.
+    
+    The body is streamed in and checked against MAX_UPLOAD_MB as it arrives, without
+    the base64 and form parsing copies, which matters for 12-20 MP camera frames.
+    """
+    image_bytes = await read_upload(request)
+    if image_bytes is None:
+        return too_large(f"Upload exceeds {config.MAX_UPLOAD_MB:g} MB")
+    if not image_bytes:
+        return bad_request("Empty upload")
+    return await recognize_upload(
+        request, image_bytes, session_id, render_mode, max_side, image_format, quality, model, target_language
+    )
+
+@app.websocket("/api/ws/process-image")
+async def process_image_stream(websocket: WebSocket):
+    """
+    Stream binary JPEG frames in, get one JSON result per processed frame back.
+    
+    Only the newest pending frame is kept: frames that arrive while the model is
+    busy replace each other, so a slow model never builds a backlog.
+    
+    Connect with ?incremental=true to only re-recognize the parts of the board
+    that changed between frames of this connection (ignored with PGNET_EXECUTOR=process). With ?target_language=xx the
+    lines are tracked across frames and translated, each only when it is new or its
+    text changed. render_mode, max_side, image_format, quality and model query
+    parameters work as in /api/process-image. ?format=compact sends compact JSON
+    text messages and ?format=msgpack binary MessagePack messages.
+    
+    Every frame gets a result: "success", "error", or, when the frame was skipped,
+    "busy", "timeout" or "too_large" (above MAX_UPLOAD_MB).
+    """
+    await websocket.accept()
+    params = websocket.query_params
+    try:
+        render_mode, image_format = check_render_options(params.get("render_mode"), params.get("image_format"))
+        max_side = int(params["max_side"]) if "max_side" in params else None
+        quality = int(params["quality"]) if "quality" in params else None
+        model = params.get("model")
+        if model:
+            model_manager.choose(model)
+        response_format = negotiate(requested=params.get("format", "json"))
+    except ValueError as e:
+        await websocket.send_json({"status": "error", "message": str(e)})
+        await websocket.close(code=1003)
+        return
+    incremental = incremental_enabled(params.get("incremental", "false").lower() == "true")
+    target_language = params.get("target_language")
+    session_id = f"ws-{uuid.uuid4().hex}" if incremental or target_language else None
+    pending = {"frame": None, "frame_id": 0, "dropped": 0, "oversized": 0}
+    frame_ready = asyncio.Event()
+    
+    async def send_result(result):
+        result["dropped_frames"] = pending["dropped"]
+        result["oversized_frames"] = pending["oversized"]
+        message = serialize(result, response_format)
+        if response_format == "msgpack":
+            await websocket.send_bytes(message)
+        else:
+            await websocket.send_text(message.decode("utf-8"))
+    
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            frame = message.get("bytes")
+            if not frame:
+                continue
+            # Frames above MAX_UPLOAD_MB are skipped, counted and answered so the
+            # client does not wait for a result that never comes
+            if len(frame) > max_upload_bytes():
+                pending["oversized"] += 1
+                pending["frame_id"] += 1
+                await send_result({"status": "too_large", "frame_id": pending["frame_id"]})
+                continue
+            # Latest frame wins: overwrite whatever has not been picked up yet
+            if pending["frame"] is not None:
+                pending["dropped"] += 1
+            pending["frame"] = frame
+            pending["frame_id"] += 1
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            done, _ = await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                waiter.cancel()
+                break
+            frame_ready.clear()
+            frame, frame_id = pending["frame"], pending["frame_id"]
+            pending["frame"] = None
+            
+            try:
+                prediction = await inference_executor.run(
+                    get_text_prediction, frame, session_id, render_mode, max_side, image_format, quality, model,
+                    incremental, response_format != "json", timeout=config.REQUEST_TIMEOUT_SECONDS
+                )
+                if session_id:
+                    prediction = track_lines(prediction, session_id)
+                if render_mode == "lazy":
+                    prediction["result_id"] = annotation_store.put(frame, prediction["boxes"])
+                if target_language:
+                    prediction = await asyncio.wait_for(
+                        translate_lines(prediction, session_id, target_language), config.REQUEST_TIMEOUT_SECONDS
+                    )
+                result = {"status": "success", "frame_id": frame_id, **prediction}
+            except ExecutorSaturated:
+                result = {"status": "busy", "frame_id": frame_id}
+            except asyncio.TimeoutError:
+                result = {"status": "timeout", "frame_id": frame_id}
+            except Exception as e:
+                logger.exception("Error processing streamed frame: %s", e)
+                result = {"status": "error", "frame_id": frame_id, "message": str(e)}
+            await send_result(result)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        if session_id:
+            incremental_sessions.drop(session_id)
+            line_trackers.drop(session_id)
+
+@app.get("/api/annotated-image/{result_id}")
+async def annotated_image(
+    result_id: str,
+    request: Request,
+    max_side: int = None,
+    image_format: str = None,
+    quality: int = None
+):
+    """Render the annotated image of a result returned with render_mode=lazy."""
+    try:
+        _, image_format = check_render_options(image_format=image_format)
+    except ValueError as e:
+        return bad_request(str(e))
+    stored = annotation_store.get(result_id)
+    if stored is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Unknown or expired result id"})
+    try:
+        data, media_type = await run_blocking(
+            request, inference_executor, render_stored_result, *stored, max_side, image_format, quality
+        )
+        return Response(content=data, media_type=media_type)
+    except (ExecutorSaturated, asyncio.TimeoutError, ClientDisconnected) as e:
+        return overload_response(e)
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        print(f"Error processing image: {str(e)}")
-        print(f"Error details: {error_details}")
+        logger.error("Error rendering annotated image: %s\n%s", e, error_details)
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": str(e), "details": error_details}
         )
 
+@app.get("/api/metrics")
+async def prometheus_metrics():
+    """Stage histograms, request latency, queue depths, cache and model stats in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+class ProfileRequest(BaseModel):
+    requests: int = 10
+    model: Optional[str] = None
+
+@app.post("/api/debug/profile")
+async def start_profile(request: ProfileRequest):
+    """Run the next N recognitions of a variant (the default one) with onnxruntime's profiler on and dump the trace."""
+    if request.requests < 1:
+        return bad_request("requests must be at least 1")
+    try:
+        model_path = model_manager.model_path(model_manager.choose(request.model) if request.model else None)
+    except ValueError as e:
+        return bad_request(str(e))
+    try:
+        # Building the profiling session takes a while; keep it off the event loop
+        await asyncio.to_thread(ort_profiler.start, model_path, not config.PGNET_USE_GPU, request.requests)
+    except RuntimeError as e:
+        return JSONResponse(status_code=409, content={"status": "error", "message": str(e)})
+    return {"status": "success", **ort_profiler.status()}
+
+@app.get("/api/debug/profile")
+async def profile_status():
+    return ort_profiler.status()
+
+class ModelSwapRequest(BaseModel):
+    model_path: Optional[str] = None
+
+class ModelWeightsRequest(BaseModel):
+    weights: Dict[str, float]
+
+@app.get("/api/models")
+async def list_models():
+    return {"variants": model_manager.status(), "weights": model_manager.weights}
+
+@app.post("/api/models/{name}/swap")
+async def swap_model(name: str, request: ModelSwapRequest):
+    """
+    Hot-swap a variant to a new model file (or reload its current file).
+    
+    The new session is loaded and warmed up before it takes traffic; requests
+    already running finish on the old one.
+    """
+    try:
+        variant = await asyncio.to_thread(model_manager.swap, name, request.model_path)
+    except (ValueError, FileNotFoundError) as e:
+        return bad_request(str(e))
+    except Exception as e:
+        logger.exception("Error swapping model variant %s: %s", name, e)
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+    return {"status": "success", "variant": variant}
+
+@app.put("/api/models/weights")
+async def set_model_weights(request: ModelWeightsRequest):
+    try:
+        weights = model_manager.set_weights(request.weights)
+    except ValueError as e:
+        return bad_request(str(e))
+    return {"status": "success", "weights": weights}
+
 @app.get("/api/debug/model-path")
 async def debug_model_path():
-    model_path = os.environ.get("PGNET_MODEL_PATH", "app/utils/pgnet.onnx")
+    model_path = config.PGNET_MODEL_PATH
     exists = os.path.exists(model_path)
     file_size = os.path.getsize(model_path) if exists else None
     return {
@@ -58,31 +521,74 @@ async def debug_model_path():
         "cwd": os.getcwd()
     }
 
+@app.get("/api/health")
+async def health():
+    ready = model_manager.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "variants": model_manager.status(),
+            "models": registry.status(),
+            "batching": scheduler_stats(),
+            "io_binding": runner_stats(),
+            "worker_pool": get_worker_pool().stats() if get_worker_pool() else None,
+            "tiling": tiled_recognizer.stats(),
+            "executors": [inference_executor.stats(), translation_executor.stats()],
+            "result_cache": result_cache.stats(),
+            "annotation_store": annotation_store.stats(),
+            "translation": get_translation_service().stats(),
+            "translation_cache": translation_cache.stats(),
+            "incremental": {**incremental_sessions.stats(), "enabled": incremental_enabled()},
+            "line_tracking": line_trackers.stats()
+        }
+    )
+
 # Add to intercollab-backend/app/main.py
-from pydantic import BaseModel
-from googletrans import Translator
 
 # Create a model for translation requests
 class TranslationRequest(BaseModel):
     text: str
     target_language: str
 
+class BatchTranslationRequest(BaseModel):
+    texts: List[str]
+    target_languages: List[str]
+
 @app.post("/api/translate")
-async def translate_text(request: TranslationRequest):
+async def translate_text(request: TranslationRequest, http_request: Request):
     try:
-        translator = Translator()
-        # Use googletrans to translate the text
-        result = translator.translate(
-            request.text, 
-            dest=request.target_language
+        # Cached, coalesced translation through the configured provider
+        translated_text = await run_until_done(
+            http_request, get_translation_service().translate(request.text, request.target_language)
         )
-        return {"translated_text": result.text}
+        return {"translated_text": translated_text}
+    except (ExecutorSaturated, asyncio.TimeoutError, ClientDisconnected) as e:
+        return overload_response(e)
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        print(f"Error translating text: {str(e)}")
-        print(f"Error details: {error_details}")
+        logger.error("Error translating text: %s\n%s", e, error_details)
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": str(e), "details": error_details}
-        )
\ No newline at end of file
+        )
+
+@app.post("/api/translate/batch")
+async def translate_batch(request: BatchTranslationRequest, http_request: Request):
+    try:
+        # One provider round-trip per target language for every text not already cached
+        translations = await run_until_done(
+            http_request, get_translation_service().translate_batch(request.texts, request.target_languages)
+        )
+        return {"translations": translations}
+    except (ExecutorSaturated, asyncio.TimeoutError, ClientDisconnected) as e:
+        return overload_response(e)
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        logger.error("Error translating texts: %s\n%s", e, error_details)
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": str(e), "details": error_details}
+        )
@@ -0,0 +1,279 @@
+# intercollab-backend/app/utils/batch_recognize.py
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+from app.config import config
+from app.utils.batching import BatchScheduler
+from app.utils.image_sets import IMAGE_EXTENSIONS, list_images
+from app.utils.inference_pgnet import PGNetPredictor
+from app.utils.rendering import boxes_payload
+from app.utils.session_registry import build_session_options, create_session
+
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm")
+
+# Tells the next stage that the one before it has finished
+_DONE = object()
+
+
+def item_key(source, frame=None):
+    """The id of one image or video frame in the output, used to resume."""
+    return source if frame is None else f"{source}#{frame}"
+
+
+def load_done_keys(output_path):
+    """
+    Keys already recognized by an earlier (possibly interrupted) run.
+
+    A line cut short by the interruption is removed from the file, so appending
+    starts on a fresh line. Failed items are not counted, so they are retried.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "error" not in record:
+            done.add(item_key(record["source"], record.get("frame")))
+    return done
+
+
+def video_frames(path, every=1, fps=None):
+    """
+    Read a video frame by frame, keeping every `every`-th frame or `fps` frames per second.
+
+    Yields:
+        (tuple): (frame index, timestamp in seconds, BGR frame)
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    video_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    if fps and video_fps > 0:
+        every = max(int(round(video_fps / fps)), 1)
+    index = 0
+    try:
+        while True:
+            # grab() skips decoding the frames that are not kept
+            if not capture.grab():
+                break
+            if index % every == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield index, index / video_fps if video_fps > 0 else None, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def list_sources(paths):
+    """Image files and videos from files and directories given on the command line."""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                sources += [os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS)]
+            sources += list_images(path)
+        elif path.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+            sources.append(path)
+        else:
+            raise ValueError(f"Not an image, video or directory: {path}")
+    return sorted(set(sources))
+
+
+class BatchRecognizer:
+    """
+    Streaming offline recognition of image sets and recorded videos.
+
+    Three stages connected by bounded queues, so memory stays flat however many
+    images there are:
+      1. a reader lists the sources and reads video frames (images are only listed);
+      2. decode workers decode and preprocess in parallel and hand the input tensors
+         to a BatchScheduler, which runs same-shape frames as one batch;
+      3. post-processing workers wait for their batch slice, decode the texts and
+         pass the results to the caller, in completion order.
+    """
+
+    def __init__(self, model_path, cpu=True, batch_size=8, decode_workers=4, post_workers=2, queue_size=32):
+        self.cpu = cpu
+        self.sess, _ = create_session(model_path, cpu, build_session_options(), config.PGNET_OPTIMIZED_CACHE_DIR)
+        self.scheduler = BatchScheduler(self.sess, max_batch_size=batch_size, window_ms=20)
+        self.decode_workers = decode_workers
+        self.post_workers = post_workers
+        self.queue_size = queue_size
+        self._stop = threading.Event()
+
+    def _put(self, q, item):
+        # Bounded queues: wait for room, but give up when the run is stopped
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _read(self, sources, done, work, every, fps):
+        try:
+            for source in sources:
+                if self._stop.is_set():
+                    break
+                if not source.lower().endswith(VIDEO_EXTENSIONS):
+                    if item_key(source) not in done:
+                        self._put(work, (source, None, None, source))
+                    continue
+                try:
+                    for index, timestamp, frame in video_frames(source, every, fps):
+                        if self._stop.is_set():
+                            break
+                        if item_key(source, index) not in done:
+                            self._put(work, (source, index, timestamp, frame))
+                except Exception as e:
+                    self._put(work, (source, None, None, e))
+        finally:
+            for _ in range(self.decode_workers):
+                self._put(work, _DONE)
+
+    def _decode(self, work, inferring, finished_decoders):
+        while True:
+            item = work.get()
+            if item is _DONE:
+                break
+            source, frame_index, timestamp, image = item
+            try:
+                if isinstance(image, Exception):
+                    raise image
+                # Image paths are decoded by the predictor, at a reduced size for large images
+                predictor = PGNetPredictor(image=image, cpu=self.cpu, sess=self.sess)
+                img, shape_list = predictor.preprocess(image)
+                future = self.scheduler.submit(img)
+                self._put(inferring, (source, frame_index, timestamp, predictor, shape_list, future))
+            except Exception as e:
+                self._put(inferring, (source, frame_index, timestamp, None, None, e))
+        with finished_decoders[1]:
+            finished_decoders[0] += 1
+            last = finished_decoders[0] == self.decode_workers
+        if last:
+            for _ in range(self.post_workers):
+                self._put(inferring, _DONE)
+
+    def _postprocess(self, inferring, results):
+        while True:
+            item = inferring.get()
+            if item is _DONE:
+                self._put(results, _DONE)
+                return
+            source, frame_index, timestamp, predictor, shape_list, future = item
+            record = {"source": source, "frame": frame_index}
+            if timestamp is not None:
+                record["timestamp"] = round(timestamp, 3)
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                dt_boxes, texts = predictor.postprocess(future.result(), shape_list)
+                record["text"] = " ".join(texts)
+                record["boxes"] = boxes_payload(dt_boxes, texts)
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+            self._put(results, record)
+
+    def run(self, sources, done=(), every=1, fps=None):
+        """
+        Recognize every source not in `done`.
+
+        Yields:
+            dict: One record per image or sampled video frame, as soon as it is done.
+        """
+        work = queue.Queue(self.queue_size)
+        inferring = queue.Queue(self.queue_size)
+        results = queue.Queue(self.queue_size)
+        finished_decoders = [0, threading.Lock()]
+        threads = [threading.Thread(target=self._read, args=(sources, done, work, every, fps), daemon=True)]
+        threads += [
+            threading.Thread(target=self._decode, args=(work, inferring, finished_decoders), daemon=True)
+            for _ in range(self.decode_workers)
+        ]
+        threads += [
+            threading.Thread(target=self._postprocess, args=(inferring, results), daemon=True)
+            for _ in range(self.post_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        remaining = self.post_workers
+        try:
+            while remaining:
+                record = results.get()
+                if record is _DONE:
+                    remaining -= 1
+                    continue
+                yield record
+        finally:
+            self._stop.set()
+            self.scheduler.close()
+
+
+if __name__ == "__main__":
+    # Backfills recognition over archived sessions. Results are appended to the JSONL
+    # output as they complete; run the same command again to resume an interrupted run.
+    # Example usage (from intercollab-backend):
+    #   python -m app.utils.batch_recognize ./archive --output archive.jsonl
+    #   python -m app.utils.batch_recognize lecture.mp4 --fps 1 --output lecture.jsonl
+    parser = argparse.ArgumentParser(description="Recognize text in image directories and videos")
+    parser.add_argument("inputs", nargs="+", help="images, videos or directories of them")
+    parser.add_argument("--output", type=str, required=True, help="JSONL file the results are appended to")
+    parser.add_argument("--model", type=str, default=config.PGNET_MODEL_PATH, help="ONNX model path")
+    parser.add_argument("--gpu", action="store_true", help="run on CUDA instead of CPU")
+    parser.add_argument("--batch-size", type=int, default=8, help="frames per inference batch")
+    parser.add_argument("--decode-workers", type=int, default=4, help="parallel decode/preprocess threads")
+    parser.add_argument("--post-workers", type=int, default=2, help="parallel post-processing threads")
+    parser.add_argument("--queue-size", type=int, default=32, help="items buffered between stages")
+    parser.add_argument("--every", type=int, default=1, help="keep every N-th video frame")
+    parser.add_argument("--fps", type=float, default=None, help="sample videos at this rate instead of --every")
+    parser.add_argument("--restart", action="store_true", help="ignore earlier results instead of resuming")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        sys.exit(f"Model file not found at {args.model}")
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    sources = list_sources(args.inputs)
+    done = load_done_keys(args.output)
+    if done:
+        print(f"Resuming: {len(done)} items already done")
+
+    recognizer = BatchRecognizer(
+        args.model, cpu=not args.gpu, batch_size=args.batch_size, decode_workers=args.decode_workers,
+        post_workers=args.post_workers, queue_size=args.queue_size,
+    )
+    started = time.perf_counter()
+    count = errors = 0
+    with open(args.output, "a", encoding="utf-8") as out:
+        try:
+            for record in recognizer.run(sources, done, every=args.every, fps=args.fps):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                # Flushed per line, so an interrupted run loses at most the line being written
+                out.flush()
+                count += 1
+                errors += "error" in record
+                if count % 100 == 0:
+                    print(f"{count} items, {count / (time.perf_counter() - started):.1f}/s")
+        except KeyboardInterrupt:
+            print("Interrupted; run the same command again to resume")
+    elapsed = time.perf_counter() - started
+    print(f"{count} items ({errors} failed) in {elapsed:.1f}s, {count / elapsed if elapsed else 0.0:.1f}/s")
+    print(f"Batches: {recognizer.scheduler.stats()['avg_batch_size']:.2f} frames on average")
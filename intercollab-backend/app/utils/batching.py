@@ -0,0 +1,218 @@
+# intercollab-backend/app/utils/batching.py
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.config import config
+
+
+OUTPUT_NAMES = ["f_border", "f_char", "f_direction", "f_score"]
+
+
+class _PendingFrame:
+    __slots__ = ("img", "future", "enqueued_at")
+
+    def __init__(self, img):
+        self.img = img
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching in front of InferenceSession.run.
+
+    Concurrent requests submit their preprocessed [1, C, H, W] tensors. A single
+    worker thread waits up to `window_ms` after the oldest pending frame for more
+    frames of the same padded shape (E2EResizeForTest pads to multiples of 128, so
+    frames from the same camera share a shape, and with shape buckets different
+    shapes can share a bucket), runs them as one batch and hands
+    each caller its own slice of the f_border/f_char/f_direction/f_score outputs.
+    """
+
+    def __init__(self, sess, max_batch_size=None, window_ms=None, runner=None):
+        """
+        Args:
+            sess (onnxruntime.InferenceSession): The shared session to run batches on.
+            runner (BucketedRunner, optional): Runs batches through IOBinding with
+                preallocated buffers; frames are then grouped by their shape bucket.
+            max_batch_size (int, optional): Upper bound on frames per batch.
+            window_ms (float, optional): How long to wait for more frames after the first one.
+        """
+        self.sess = sess
+        self.runner = runner
+        self.input_name = sess.get_inputs()[0].name
+        self.max_batch_size = max_batch_size or config.PGNET_BATCH_MAX_SIZE
+        self.window = (config.PGNET_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closed = False
+
+        # Metrics
+        self._batches = 0
+        self._frames = 0
+        self._queue_delay_total = 0.0
+        self._queue_delay_max = 0.0
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run_forever, name="pgnet-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, img):
+        """
+        Queue a preprocessed image for batched inference.
+
+        Args:
+            img (numpy.ndarray): The preprocessed image tensor with shape [1, C, H, W].
+
+        Returns:
+            concurrent.futures.Future: Resolves to the same dict `PGNetPredictor.predict` returns.
+        """
+        frame = _PendingFrame(img)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The batch scheduler was closed")
+            self._ensure_worker()
+            self._pending.append(frame)
+            self._cond.notify()
+        return frame.future
+
+    def run(self, img):
+        """Blocking version of `submit`."""
+        return self.submit(img).result()
+
+    def _group_key(self, shape):
+        if self.runner is not None:
+            return self.runner.bucket_shape(shape)
+        return shape
+
+    def _take_batch(self):
+        """Wait for a batch to be ready and remove it from the pending list. Called with the lock held."""
+        while not self._pending:
+            if self._closed:
+                return None
+            self._cond.wait()
+
+        oldest = self._pending[0]
+        shape = self._group_key(oldest.img.shape)
+        deadline = oldest.enqueued_at + self.window
+        while True:
+            same_shape = [frame for frame in self._pending if self._group_key(frame.img.shape) == shape]
+            remaining = deadline - time.perf_counter()
+            if len(same_shape) >= self.max_batch_size or remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        batch = same_shape[:self.max_batch_size]
+        taken = set(map(id, batch))
+        self._pending = [frame for frame in self._pending if id(frame) not in taken]
+        return batch
+
+    def _run_forever(self):
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def close(self):
+        """Stop the worker thread once the frames already queued have run."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        for frame in batch:
+            delay = started - frame.enqueued_at
+            self._queue_delay_total += delay
+            self._queue_delay_max = max(self._queue_delay_max, delay)
+        self._batches += 1
+        self._frames += len(batch)
+
+        try:
+            if self.runner is not None:
+                preds_list = self.runner.run_batch([frame.img for frame in batch])
+            else:
+                if len(batch) == 1:
+                    inputs = batch[0].img
+                else:
+                    inputs = np.concatenate([frame.img for frame in batch], axis=0)
+                outputs = self.sess.run(None, {self.input_name: inputs})
+                # Split the batched outputs back into per-request [1, ...] predictions
+                preds_list = [
+                    {name: output[i:i + 1] for name, output in zip(OUTPUT_NAMES, outputs)}
+                    for i in range(len(batch))
+                ]
+        except Exception as e:
+            for frame in batch:
+                frame.future.set_exception(e)
+            return
+
+        for frame, preds in zip(batch, preds_list):
+            frame.future.set_result(preds)
+
+    def stats(self):
+        """Return batch fill rate and queueing delay counters."""
+        with self._cond:
+            queued = len(self._pending)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window * 1000.0,
+            "batches": self._batches,
+            "frames": self._frames,
+            "queued": queued,
+            "avg_batch_size": self._frames / self._batches if self._batches else 0.0,
+            "fill_rate": self._frames / (self._batches * self.max_batch_size) if self._batches else 0.0,
+            "avg_queue_delay_ms": 1000.0 * self._queue_delay_total / self._frames if self._frames else 0.0,
+            "max_queue_delay_ms": 1000.0 * self._queue_delay_max,
+        }
+
+
+def supports_batching(sess):
+    """A model exported with a fixed batch dimension of 1 cannot be batched."""
+    batch_dim = sess.get_inputs()[0].shape[0]
+    return not (isinstance(batch_dim, int) and batch_dim == 1)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(sess, runner=None):
+    """
+    Return the shared BatchScheduler for a session, or None when batching is off.
+
+    Batching is off when PGNET_BATCH_MAX_SIZE is 1 or the model has a fixed batch size of 1.
+    """
+    if config.PGNET_BATCH_MAX_SIZE <= 1 or not supports_batching(sess):
+        return None
+    with _schedulers_lock:
+        entry = _schedulers.get(id(sess))
+        if entry is None or entry[0] is not sess:
+            entry = (sess, BatchScheduler(sess, runner=runner))
+            _schedulers[id(sess)] = entry
+        return entry[1]
+
+
+def release_scheduler(sess):
+    """Close and forget the scheduler of a session that is no longer served."""
+    with _schedulers_lock:
+        entry = _schedulers.get(id(sess))
+        if entry is None or entry[0] is not sess:
+            return
+        del _schedulers[id(sess)]
+    entry[1].close()
+
+
+def scheduler_stats():
+    """Stats for every scheduler created so far."""
+    with _schedulers_lock:
+        schedulers = [scheduler for _, scheduler in _schedulers.values()]
+    return [scheduler.stats() for scheduler in schedulers]
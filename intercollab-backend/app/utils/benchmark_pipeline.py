@@ -0,0 +1,319 @@
+# intercollab-backend/app/utils/benchmark_pipeline.py
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import onnxruntime
+
+from app.config import config
+from app.utils.image_sets import list_images
+from app.utils.inference_pgnet import decode_image, get_dict_path, get_postprocessor, preprocess_image
+from app.utils.pgnet.postprocess import clip_boxes
+from app.utils.rendering import draw_annotations, encode_image, to_data_url
+from app.utils.session_registry import build_session_options, get_providers
+from app.utils.stand_in_model import ensure_stand_in_model
+
+
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+# Lines of text drawn on a synthetic board
+DENSITIES = {
+    "sparse": 3,
+    "medium": 12,
+    "dense": 40,
+}
+
+STAGES = (
+    "base64_decode",
+    "image_decode",
+    "preprocess",
+    "inference",
+    "postprocess",
+    "clip",
+    "draw",
+    "encode",
+    "base64_encode",
+    "pipeline",
+)
+
+
+def synthetic_board(width, height, lines, seed=0):
+    """
+    A whiteboard-like test image: light, slightly noisy background with dark handwritten-ish text.
+
+    Deterministic for a given seed so runs are comparable.
+    """
+    rng = np.random.default_rng(seed)
+    board = np.full((height, width, 3), 235, dtype=np.uint8)
+    board = cv2.add(board, rng.integers(0, 15, size=board.shape, dtype=np.uint8))
+    alphabet = list("abcdefghijklmnopqrstuvwxyz0123456789")
+    scale = width / 1280
+    for _ in range(lines):
+        word_count = int(rng.integers(1, 6))
+        text = " ".join("".join(rng.choice(alphabet, size=int(rng.integers(2, 9)))) for _ in range(word_count))
+        org = (int(rng.integers(0, max(width // 2, 1))), int(rng.integers(int(40 * scale), height)))
+        color = tuple(int(c) for c in rng.integers(0, 90, size=3))
+        cv2.putText(board, text, org, cv2.FONT_HERSHEY_SIMPLEX, 1.2 * scale, color, max(int(round(3 * scale)), 2))
+    return board
+
+
+def build_cases(resolutions, densities, image_dir=None):
+    """(name, encoded JPEG bytes) for every synthetic board and every image in `image_dir`."""
+    cases = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for density in densities:
+            board = synthetic_board(width, height, DENSITIES[density], seed=len(cases))
+            cases.append((f"{resolution}-{density}", encode_image(board, "jpeg", 90)[0]))
+    if image_dir:
+        for path in list_images(image_dir):
+            with open(path, "rb") as f:
+                cases.append((os.path.basename(path), f.read()))
+    return cases
+
+
+class PipelineStages:
+    """The stages of one /api/process-image call, runnable one at a time."""
+
+    def __init__(self, sess):
+        self.sess = sess
+        self.input_name = sess.get_inputs()[0].name
+        self.postprocessor = get_postprocessor(get_dict_path())
+
+    def prepare(self, image_bytes):
+        """Run the pipeline once and keep every intermediate result as input for the stage runs."""
+        state = {"b64": base64.b64encode(image_bytes).decode("ascii")}
+        state["bytes"] = base64.b64decode(state["b64"])
+        state["frame"] = decode_image(state["bytes"])
+        state["img"], state["shape_list"] = preprocess_image(state["frame"])
+        state["preds"] = self.inference(state["img"])
+        post_result = self.postprocessor(state["preds"], state["shape_list"])
+        state["points"], state["texts"] = post_result["points"], post_result["texts"]
+        state["boxes"] = clip_boxes(state["points"], state["frame"].shape)
+        state["annotated"] = draw_annotations(state["frame"].copy(), state["boxes"], state["texts"])
+        state["encoded"] = encode_image(state["annotated"], "jpeg")
+        return state
+
+    def inference(self, img):
+        outputs = self.sess.run(None, {self.input_name: img})
+        return dict(zip(("f_border", "f_char", "f_direction", "f_score"), outputs))
+
+    def pipeline(self, b64):
+        frame = decode_image(base64.b64decode(b64))
+        img, shape_list = preprocess_image(frame)
+        post_result = self.postprocessor(self.inference(img), shape_list)
+        boxes = clip_boxes(post_result["points"], frame.shape)
+        draw_annotations(frame, boxes, post_result["texts"])
+        return to_data_url(*encode_image(frame, "jpeg"))
+
+    def stage(self, name, state):
+        """Return (setup, fn): `fn(*setup())` runs the stage; setup is not timed."""
+        if name == "base64_decode":
+            return lambda: (state["b64"],), base64.b64decode
+        if name == "image_decode":
+            return lambda: (state["bytes"],), decode_image
+        if name == "preprocess":
+            return lambda: (state["frame"],), preprocess_image
+        if name == "inference":
+            return lambda: (state["img"],), self.inference
+        if name == "postprocess":
+            return lambda: (state["preds"], state["shape_list"]), self.postprocessor
+        if name == "clip":
+            return lambda: (state["points"], state["frame"].shape), clip_boxes
+        if name == "draw":
+            # Drawing is in place, so every run gets a fresh copy of the frame
+            return lambda: (state["frame"].copy(), state["boxes"], state["texts"]), draw_annotations
+        if name == "encode":
+            return lambda: (state["annotated"], "jpeg"), encode_image
+        if name == "base64_encode":
+            return lambda: state["encoded"], to_data_url
+        if name == "pipeline":
+            return lambda: (state["b64"],), self.pipeline
+        raise ValueError(f"Unknown stage: {name}")
+
+
+def measure(setup, fn, iterations, warmup):
+    """Latency percentiles of `fn(*setup())` in ms."""
+    for _ in range(warmup):
+        fn(*setup())
+    samples = []
+    for _ in range(iterations):
+        args = setup()
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples = np.array(samples)
+    return {
+        "iterations": iterations,
+        "mean_ms": float(samples.mean()),
+        "min_ms": float(samples.min()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def measure_allocations(setup, fn, runs=3):
+    """
+    Python and NumPy heap allocations of one call, via tracemalloc.
+
+    Memory allocated inside onnxruntime and OpenCV is not traced.
+
+    Returns:
+        dict: Peak bytes allocated during the call and bytes still held after it.
+    """
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(runs):
+            args = setup()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            result = fn(*args)
+            after, peak = tracemalloc.get_traced_memory()
+            del result
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+    return {"peak_alloc_kb": min(peaks) / 1024.0, "retained_kb": min(retained) / 1024.0}
+
+
+def run_benchmark(sess, cases, stages=STAGES, iterations=20, warmup=3, allocations=True):
+    """
+    Benchmark every stage on every case.
+
+    Returns:
+        list: One result dict per (case, stage).
+    """
+    pipeline = PipelineStages(sess)
+    results = []
+    for case_name, image_bytes in cases:
+        state = pipeline.prepare(image_bytes)
+        height, width = state["frame"].shape[:2]
+        print(f"{case_name}: {width}x{height}, {len(state['texts'])} text instances")
+        for stage_name in stages:
+            setup, fn = pipeline.stage(stage_name, state)
+            result = {"case": case_name, "width": width, "height": height, "stage": stage_name}
+            result.update(measure(setup, fn, iterations, warmup))
+            if allocations:
+                result.update(measure_allocations(setup, fn))
+            results.append(result)
+    return results
+
+
+def find_regressions(results, baseline, max_regression, min_ms):
+    """
+    Stages whose p50 got slower than the baseline by more than `max_regression` (a fraction).
+
+    Stages faster than `min_ms` in the baseline are ignored as noise.
+    """
+    previous = {(r["case"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["case"], result["stage"]))
+        if old is None or old["p50_ms"] < min_ms:
+            continue
+        change = result["p50_ms"] / old["p50_ms"] - 1.0
+        if change > max_regression:
+            regressions.append({
+                "case": result["case"],
+                "stage": result["stage"],
+                "baseline_p50_ms": old["p50_ms"],
+                "p50_ms": result["p50_ms"],
+                "change": change,
+            })
+    return regressions
+
+
+def environment(model_path, stand_in):
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "onnxruntime": onnxruntime.__version__,
+        "model_path": model_path,
+        "stand_in_model": stand_in,
+        "ort_intra_op_threads": config.ORT_INTRA_OP_THREADS,
+        "ort_graph_optimization_level": config.ORT_GRAPH_OPTIMIZATION_LEVEL,
+    }
+
+
+def print_results(results):
+    print(f"\n{'case':<20}{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KB':>12}")
+    for r in results:
+        peak = f"{r['peak_alloc_kb']:>12.1f}" if "peak_alloc_kb" in r else f"{'-':>12}"
+        print(f"{r['case']:<20}{r['stage']:<16}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{peak}")
+
+
+if __name__ == "__main__":
+    # Example usage (from intercollab-backend):
+    #   python -m app.utils.benchmark_pipeline --json bench.json
+    #   python -m app.utils.benchmark_pipeline --json new.json --baseline bench.json
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the recognition pipeline")
+    parser.add_argument("--model", type=str, default=config.PGNET_MODEL_PATH, help="ONNX model path")
+    parser.add_argument("--stand-in", action="store_true", help="always use the tiny stand-in model")
+    parser.add_argument("--resolutions", type=str, default="vga,hd,fhd", help=f"any of {','.join(RESOLUTIONS)}")
+    parser.add_argument("--densities", type=str, default="sparse,dense", help=f"any of {','.join(DENSITIES)}")
+    parser.add_argument("--images", type=str, default=None, help="directory of extra sample images")
+    parser.add_argument("--stages", type=str, default=",".join(STAGES), help="comma-separated stages to run")
+    parser.add_argument("--iterations", type=int, default=20, help="timed runs per stage")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed runs per stage")
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--gpu", action="store_true", help="run on CUDA instead of CPU")
+    parser.add_argument("--json", type=str, default=None, help="write machine-readable results here")
+    parser.add_argument("--baseline", type=str, default=None, help="earlier --json output to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed p50 slowdown (fraction)")
+    parser.add_argument("--min-ms", type=float, default=0.1, help="ignore stages faster than this in the baseline")
+    args = parser.parse_args()
+
+    model_path = args.model
+    stand_in = args.stand_in or not os.path.exists(model_path)
+    if stand_in:
+        model_path = ensure_stand_in_model(os.path.join(tempfile.gettempdir(), "pgnet_stand_in.onnx"))
+        print(f"Using the stand-in model at {model_path}; latencies after inference are not representative")
+
+    sess = onnxruntime.InferenceSession(
+        model_path, sess_options=build_session_options(), providers=get_providers(not args.gpu)
+    )
+    stages = [stage for stage in args.stages.split(",") if stage]
+    cases = build_cases(
+        [r for r in args.resolutions.split(",") if r],
+        [d for d in args.densities.split(",") if d],
+        args.images,
+    )
+    results = run_benchmark(
+        sess, cases, stages, iterations=args.iterations, warmup=args.warmup, allocations=not args.no_allocations
+    )
+    print_results(results)
+
+    report = {"meta": environment(model_path, stand_in), "results": results}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["regressions"] = find_regressions(results, baseline, args.max_regression, args.min_ms)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression['case']} {regression['stage']}: "
+                  f"{regression['baseline_p50_ms']:.2f} -> {regression['p50_ms']:.2f} ms "
+                  f"({regression['change']:+.0%})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if report.get("regressions"):
+        sys.exit(1)
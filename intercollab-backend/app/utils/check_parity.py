@@ -0,0 +1,222 @@
+# intercollab-backend/app/utils/check_parity.py
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import onnxruntime
+
+from app.config import config
+from app.utils.benchmark_pipeline import DENSITIES, RESOLUTIONS, build_cases
+from app.utils.inference_pgnet import decode_image, get_dict_path, get_postprocessor, preprocess_image
+from app.utils.pgnet.textpoint import thin
+from app.utils.session_registry import build_session_options, get_providers
+from app.utils.shape_buckets import OUTPUT_NAMES
+from app.utils.stand_in_model import ensure_stand_in_model
+
+
+def paddle_reference(dict_path):
+    """
+    The paddleocr preprocessing, thinning and post-processing the in-tree code replaces.
+
+    Needs the optional `paddleocr` package (and scikit-image, which it pulls in).
+
+    Returns:
+        (tuple): (preprocess(img) -> (image, shape_list), thin(map) -> bool map,
+                  postprocess(preds, shape_list) -> {"points", "texts"})
+    """
+    from paddleocr.ppocr.data.imaug.operators import E2EResizeForTest, KeepKeys, NormalizeImage, ToCHWImage
+    from paddleocr.ppocr.postprocess.pg_postprocess import PGPostProcess
+    from skimage.morphology import thin as skimage_thin
+
+    transforms = [
+        E2EResizeForTest(max_side_len=768, valid_set="totaltext"),
+        NormalizeImage(scale=1.0 / 255.0, mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225], order="hwc"),
+        ToCHWImage(),
+        KeepKeys(keep_keys=["image", "shape"]),
+    ]
+
+    def preprocess(img):
+        data = {"image": img}
+        for transform in transforms:
+            data = transform(data)
+        image, shape_list = data
+        return np.expand_dims(image, axis=0), np.expand_dims(shape_list, axis=0)
+
+    postprocess = PGPostProcess(character_dict_path=dict_path, valid_set="totaltext", score_thresh=0.5, mode="fast")
+    return preprocess, skimage_thin, postprocess
+
+
+def same_polys(ours, reference):
+    if len(ours) != len(reference):
+        return False
+    return all(np.array_equal(np.asarray(a), np.asarray(b)) for a, b in zip(ours, reference))
+
+
+def run_model(sess, img):
+    outputs = sess.run(None, {sess.get_inputs()[0].name: img})
+    return dict(zip(OUTPUT_NAMES, outputs))
+
+
+def tcl_map_of(preds):
+    """The binary center-line map the decoder thins, as PGPostProcess builds it."""
+    return (preds["f_score"][0][0] > 0.5).astype(np.uint8)
+
+
+def same_result(ours, theirs):
+    return list(ours["texts"]) == list(theirs["texts"]) and same_polys(ours["points"], theirs["points"])
+
+
+def check_case(sess, image_bytes, reference):
+    """
+    Compare every replaced step on one image.
+
+    Returns:
+        list: Names of the steps whose output differs from paddleocr's.
+    """
+    ref_preprocess, ref_thin, ref_postprocess = reference
+    frame = decode_image(image_bytes)
+    failures = []
+
+    img, shape_list = preprocess_image(frame)
+    ref_img, ref_shape_list = ref_preprocess(frame.copy())
+    if not (np.array_equal(img, ref_img) and img.dtype == ref_img.dtype and np.array_equal(shape_list, ref_shape_list)):
+        failures.append("preprocess")
+
+    preds = run_model(sess, img)
+
+    tcl_map = tcl_map_of(preds)
+    if not np.array_equal(thin(tcl_map), ref_thin(tcl_map)):
+        failures.append("thin")
+
+    ours = get_postprocessor(get_dict_path())(preds, shape_list)
+    theirs = ref_postprocess(preds, shape_list)
+    if not same_result(ours, theirs):
+        failures.append("postprocess")
+    return failures
+
+
+def record_case(sess, image_bytes, reference, directory, name):
+    """
+    Save a model's output maps with paddleocr's thinning and post-processing of them, for `replay_cases`.
+
+    Writes `<name>.npz` (the four output maps, the shape list and scikit-image's
+    skeleton of the center-line map) and `<name>.json` (paddleocr's texts and
+    polygons). Recorded with the real pgnet.onnx, these let the in-tree decoder be
+    checked against paddleocr without the model, paddleocr or scikit-image.
+    """
+    ref_preprocess, ref_thin, ref_postprocess = reference
+    img, shape_list = ref_preprocess(decode_image(image_bytes))
+    preds = run_model(sess, img)
+    skeleton = ref_thin(tcl_map_of(preds))
+    theirs = ref_postprocess(preds, shape_list)
+    os.makedirs(directory, exist_ok=True)
+    np.savez_compressed(os.path.join(directory, f"{name}.npz"), shape_list=shape_list, skeleton=skeleton, **preds)
+    with open(os.path.join(directory, f"{name}.json"), "w") as f:
+        json.dump({
+            "texts": list(theirs["texts"]),
+            "points": [np.asarray(points).tolist() for points in theirs["points"]],
+        }, f)
+
+
+def recorded_cases(directory):
+    """Names of the cases recorded in `directory`, sorted."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(file_name[:-len(".npz")] for file_name in os.listdir(directory) if file_name.endswith(".npz"))
+
+
+def replay_case(directory, name, postprocess=None):
+    """
+    Run the in-tree thinning and post-processing on one recorded case.
+
+    Returns:
+        list: Names of the steps whose output differs from the recorded one.
+    """
+    postprocess = postprocess or get_postprocessor(get_dict_path())
+    recorded = np.load(os.path.join(directory, f"{name}.npz"))
+    preds = {output: recorded[output] for output in OUTPUT_NAMES}
+    with open(os.path.join(directory, f"{name}.json")) as f:
+        theirs = json.load(f)
+    failures = []
+    if not np.array_equal(thin(tcl_map_of(preds)), recorded["skeleton"]):
+        failures.append("thin")
+    if not same_result(postprocess(preds, recorded["shape_list"]), theirs):
+        failures.append("postprocess")
+    return failures
+
+
+def replay_cases(directory):
+    """
+    Replay every case recorded in `directory`.
+
+    Returns:
+        list: (case name, names of the steps that differ) pairs.
+    """
+    postprocess = get_postprocessor(get_dict_path())
+    return [(name, replay_case(directory, name, postprocess)) for name in recorded_cases(directory)]
+
+
+if __name__ == "__main__":
+    # Checks that the in-tree transforms and decoder give bit-identical results to
+    # paddleocr. Run it wherever paddleocr is installed (it is not needed to serve).
+    # With --record, the real model's output maps and paddleocr's results are saved,
+    # so --replay (and tests/test_parity.py) can check the decoder later without the
+    # model or paddleocr.
+    # Example usage (from intercollab-backend):
+    #   python -m app.utils.check_parity
+    #   python -m app.utils.check_parity --images ./calibration_images
+    #   python -m app.utils.check_parity --images ./calibration_images --record tests/fixtures/parity
+    #   python -m app.utils.check_parity --replay tests/fixtures/parity
+    parser = argparse.ArgumentParser(description="Compare the in-tree PGNet pre/post-processing with paddleocr's")
+    parser.add_argument("--model", type=str, default=config.PGNET_MODEL_PATH, help="ONNX model path")
+    parser.add_argument("--stand-in", action="store_true", help="always use the tiny stand-in model")
+    parser.add_argument("--resolutions", type=str, default=",".join(RESOLUTIONS), help="synthetic board sizes")
+    parser.add_argument("--densities", type=str, default=",".join(DENSITIES), help="synthetic text densities")
+    parser.add_argument("--images", type=str, default=None, help="directory of extra sample images")
+    parser.add_argument("--record", type=str, default=None, help="save output maps and paddleocr results here")
+    parser.add_argument("--replay", type=str, default=None, help="check the decoder against recorded cases")
+    args = parser.parse_args()
+
+    if args.replay:
+        results = replay_cases(args.replay)
+        for name, failures in results:
+            print(f"{name:<32}{'MISMATCH ' + ','.join(failures) if failures else 'ok'}")
+        mismatches = sum(bool(failures) for _, failures in results)
+        print(f"\n{len(results) - mismatches}/{len(results)} recorded cases identical")
+        sys.exit(1 if mismatches or not results else 0)
+
+    try:
+        reference = paddle_reference(get_dict_path())
+    except ImportError as e:
+        sys.exit(f"paddleocr is needed for the parity check: {e}")
+
+    model_path = args.model
+    if args.stand_in or not os.path.exists(model_path):
+        if args.record:
+            sys.exit(f"Recording needs the real model; not found at {model_path}")
+        model_path = ensure_stand_in_model(os.path.join(tempfile.gettempdir(), "pgnet_stand_in.onnx"))
+        print(f"Using the stand-in model at {model_path}")
+    sess = onnxruntime.InferenceSession(model_path, sess_options=build_session_options(), providers=get_providers(True))
+
+    cases = build_cases(
+        [r for r in args.resolutions.split(",") if r],
+        [d for d in args.densities.split(",") if d],
+        args.images,
+    )
+    if args.record:
+        for name, image_bytes in cases:
+            record_case(sess, image_bytes, reference, args.record, name)
+        print(f"Recorded {len(cases)} cases to {args.record}")
+        sys.exit(0)
+
+    mismatches = 0
+    for name, image_bytes in cases:
+        failures = check_case(sess, image_bytes, reference)
+        mismatches += bool(failures)
+        print(f"{name:<32}{'MISMATCH ' + ','.join(failures) if failures else 'ok'}")
+    print(f"\n{len(cases) - mismatches}/{len(cases)} images identical")
+    if mismatches:
+        sys.exit(1)
@@ -0,0 +1,226 @@
+# intercollab-backend/app/utils/compare_models.py
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import onnxruntime
+
+from app.utils.image_sets import list_images, load_labels, stream_map
+from app.utils.inference_pgnet import PGNetPredictor, decode_image
+from app.utils.session_registry import build_session_options, get_providers
+
+
+STAGES = ("decode", "preprocess", "inference", "postprocess", "total")
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings."""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def words(texts):
+    """Lower-cased words of a list of texts (the PGNet dictionary has no upper case)."""
+    return [word for text in texts for word in text.lower().split()]
+
+
+def text_scores(predicted, expected):
+    """
+    Compare recognized texts against reference texts, ignoring detection order.
+
+    Returns:
+        dict: Word match counts and the character edit distance between the
+              sorted word sequences.
+    """
+    predicted_words, expected_words = words(predicted), words(expected)
+    matched = sum((Counter(predicted_words) & Counter(expected_words)).values())
+    predicted_str = " ".join(sorted(predicted_words))
+    expected_str = " ".join(sorted(expected_words))
+    return {
+        "matched": matched,
+        "predicted": len(predicted_words),
+        "expected": len(expected_words),
+        "edit_distance": edit_distance(predicted_str, expected_str),
+        "chars": max(len(predicted_str), len(expected_str), 1),
+        "exact": Counter(predicted_words) == Counter(expected_words),
+    }
+
+
+def accuracy_summary(scores):
+    """Aggregate `text_scores` over a data set."""
+    matched = sum(score["matched"] for score in scores)
+    predicted = sum(score["predicted"] for score in scores)
+    expected = sum(score["expected"] for score in scores)
+    precision = matched / predicted if predicted else 0.0
+    recall = matched / expected if expected else 0.0
+    return {
+        "word_precision": precision,
+        "word_recall": recall,
+        "word_f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "char_accuracy": 1.0 - sum(score["edit_distance"] for score in scores) / sum(score["chars"] for score in scores),
+        "exact_images": sum(score["exact"] for score in scores) / len(scores) if scores else 0.0,
+    }
+
+
+def latency_summary(values_ms):
+    values = np.array(values_ms, dtype=np.float64)
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+    }
+
+
+def _decode_timed(path):
+    started = time.perf_counter()
+    frame = decode_image(path)
+    return frame, (time.perf_counter() - started) * 1000.0
+
+
+def run_model(model_path, paths, cpu=True, warmup=3, workers=4, prefetch=8):
+    """
+    Run the serving pipeline of one model over a list of images.
+
+    Images are decoded on a thread pool ahead of the model; every other stage is
+    timed per image on the calling thread exactly as PGNetPredictor runs it.
+
+    Returns:
+        dict: Per-image "texts", per-stage latencies in ms and the throughput.
+    """
+    sess = onnxruntime.InferenceSession(
+        model_path, sess_options=build_session_options(), providers=get_providers(cpu)
+    )
+    predictor = PGNetPredictor(None, cpu, sess=sess)
+
+    # Warm up on the first image so one-time allocations are not measured
+    if warmup and paths:
+        frame = decode_image(paths[0])
+        for _ in range(warmup):
+            img, shape_list = predictor.preprocess(frame)
+            predictor.postprocess(predictor.predict(img), shape_list)
+
+    timings = {stage: [] for stage in STAGES}
+    texts = []
+    started = time.perf_counter()
+    for frame, decode_ms in stream_map(_decode_timed, paths, workers, prefetch):
+        t0 = time.perf_counter()
+        img, shape_list = predictor.preprocess(frame)
+        t1 = time.perf_counter()
+        preds = predictor.predict(img)
+        t2 = time.perf_counter()
+        _, strs = predictor.postprocess(preds, shape_list)
+        t3 = time.perf_counter()
+
+        timings["decode"].append(decode_ms)
+        timings["preprocess"].append((t1 - t0) * 1000.0)
+        timings["inference"].append((t2 - t1) * 1000.0)
+        timings["postprocess"].append((t3 - t2) * 1000.0)
+        timings["total"].append(decode_ms + (t3 - t0) * 1000.0)
+        texts.append(list(strs))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "model_path": model_path,
+        "model_size_mb": os.path.getsize(model_path) / 1e6,
+        "images": len(paths),
+        "throughput_ips": len(paths) / elapsed if elapsed > 0 else 0.0,
+        "latency": {stage: latency_summary(values) for stage, values in timings.items() if values},
+        "texts": texts,
+    }
+
+
+def compare_models(fp32_path, quantized_path, samples, cpu=True, warmup=3, workers=4):
+    """
+    Run both models over the same images and compare speed and text accuracy.
+
+    Args:
+        samples (list): (image path, expected texts or None) pairs.
+
+    Returns:
+        dict: The report; "accuracy" is only present when labels were given.
+    """
+    paths = [path for path, _ in samples]
+    labeled = all(expected is not None for _, expected in samples)
+    report = {"images": len(paths), "models": {}}
+    results = {}
+    for name, model_path in (("fp32", fp32_path), ("quantized", quantized_path)):
+        print(f"Running {name} model {model_path} on {len(paths)} images...")
+        results[name] = run_model(model_path, paths, cpu=cpu, warmup=warmup, workers=workers)
+        model_report = {key: value for key, value in results[name].items() if key != "texts"}
+        if labeled:
+            model_report["accuracy"] = accuracy_summary([
+                text_scores(predicted, expected)
+                for predicted, (_, expected) in zip(results[name]["texts"], samples)
+            ])
+        report["models"][name] = model_report
+
+    # How often the quantized model reads the same text as the fp32 one
+    report["agreement"] = accuracy_summary([
+        text_scores(quantized, fp32)
+        for fp32, quantized in zip(results["fp32"]["texts"], results["quantized"]["texts"])
+    ])
+    fp32_ms = report["models"]["fp32"]["latency"]["inference"]["mean_ms"]
+    quantized_ms = report["models"]["quantized"]["latency"]["inference"]["mean_ms"]
+    report["inference_speedup"] = fp32_ms / quantized_ms if quantized_ms else 0.0
+    return report
+
+
+def print_report(report):
+    models = report["models"]
+    names = list(models)
+    print(f"\n{'':<28}" + "".join(f"{name:>14}" for name in names))
+    for stage in STAGES:
+        for stat in ("p50_ms", "p95_ms"):
+            row = [models[name]["latency"][stage][stat] for name in names]
+            print(f"{stage + ' ' + stat:<28}" + "".join(f"{value:>14.2f}" for value in row))
+    print(f"{'throughput (img/s)':<28}" + "".join(f"{models[name]['throughput_ips']:>14.2f}" for name in names))
+    print(f"{'model size (MB)':<28}" + "".join(f"{models[name]['model_size_mb']:>14.1f}" for name in names))
+    if all("accuracy" in models[name] for name in names):
+        for metric in ("word_precision", "word_recall", "word_f1", "char_accuracy", "exact_images"):
+            row = [models[name]["accuracy"][metric] for name in names]
+            print(f"{metric:<28}" + "".join(f"{value:>14.3f}" for value in row))
+    print(f"\nInference speedup: {report['inference_speedup']:.2f}x")
+    print(f"Quantized vs fp32 word F1: {report['agreement']['word_f1']:.3f}, "
+          f"identical images: {report['agreement']['exact_images']:.3f}")
+
+
+if __name__ == "__main__":
+    # Example usage (from intercollab-backend):
+    #   python -m app.utils.compare_models --labels data/test/labels.txt --json report.json
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Compare fp32 and quantized PGNet latency and accuracy")
+    parser.add_argument("--fp32", type=str, default=os.path.join(current_dir, "pgnet.onnx"), help="fp32 model path")
+    parser.add_argument("--quantized", type=str, default=os.path.join(current_dir, "pgnet2.onnx"), help="quantized model path")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--labels", type=str, help="PaddleOCR-style label file (image path<TAB>json annotations)")
+    source.add_argument("--images", type=str, help="directory of unlabeled images (latency and agreement only)")
+    parser.add_argument("--image-dir", type=str, default=None, help="base directory of the paths in --labels")
+    parser.add_argument("--max-images", type=int, default=None, help="use at most this many images")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed runs before measuring")
+    parser.add_argument("--workers", type=int, default=4, help="threads decoding images")
+    parser.add_argument("--gpu", action="store_true", help="run on CUDA instead of CPU")
+    parser.add_argument("--json", type=str, default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.labels:
+        samples = load_labels(args.labels, args.image_dir)
+    else:
+        samples = [(path, None) for path in list_images(args.images)]
+    samples = samples[:args.max_images]
+    if not samples:
+        raise SystemExit("No images to compare")
+
+    report = compare_models(args.fp32, args.quantized, samples, cpu=not args.gpu, warmup=args.warmup, workers=args.workers)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
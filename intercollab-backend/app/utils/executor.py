@@ -0,0 +1,162 @@
+# intercollab-backend/app/utils/executor.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.config import config
+from app.utils.metrics import merge_stage_timings, take_stage_timings
+
+
+class ExecutorSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when queued work reaches a worker after its deadline has passed."""
+
+
+def _init_process_worker():
+    # A forked worker starts with a copy of the API process's stage timings; drop them
+    # so only its own are sent back
+    take_stage_timings()
+    # Each worker process loads and warms up its own sessions (every configured variant) before taking work
+    from app.utils.model_manager import model_manager
+    model_manager.load_all()
+
+
+def _call_with_deadline(deadline, fn, *args):
+    # Work that sat in the queue past its deadline is dropped instead of run,
+    # the client has already been answered with a timeout.
+    if deadline is not None and time.time() > deadline:
+        raise DeadlineExceeded("Deadline passed before the work started")
+    return fn(*args)
+
+
+def _call_in_process(deadline, fn, *args):
+    # Stages timed in a worker process go back with the result, to be recorded by the API process
+    result = _call_with_deadline(deadline, fn, *args)
+    return result, take_stage_timings()
+
+
+class BoundedExecutor:
+    """
+    A thread or process pool with a bounded number of admitted tasks.
+
+    At most `max_workers + max_queue` tasks are admitted at once. Further calls
+    fail fast with ExecutorSaturated so the endpoint can answer 503 immediately
+    instead of letting latency grow without bound.
+    """
+
+    def __init__(self, name, kind="thread", max_workers=4, max_queue=16):
+        """
+        Args:
+            name (str): Used for thread names and in stats.
+            kind (str): "thread" or "process".
+            max_workers (int): Size of the pool.
+            max_queue (int): How many admitted tasks may wait for a free worker.
+        """
+        if kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        elif kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_process_worker)
+        else:
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self._rejected += 1
+                return False
+            self._admitted += 1
+            return True
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._admitted -= 1
+
+    async def run(self, fn, *args, timeout=None):
+        """
+        Run `fn(*args)` on the pool without blocking the event loop.
+
+        Args:
+            fn (callable): The blocking function (must be picklable for process pools).
+            timeout (float, optional): Seconds before giving up. Work that has not
+                started by then is cancelled or skipped.
+
+        Returns:
+            The return value of `fn`.
+
+        Raises:
+            ExecutorSaturated: The pool and its queue are full.
+            asyncio.TimeoutError: The deadline passed.
+        """
+        if not self._acquire():
+            raise ExecutorSaturated(f"{self.name} executor is saturated")
+
+        deadline = time.time() + timeout if timeout else None
+        try:
+            call = _call_in_process if self.kind == "process" else _call_with_deadline
+            future = self._pool.submit(call, deadline, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            # Cancelling the wrapped future also cancels the pool future if it is still queued
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            raise
+        except DeadlineExceeded as e:
+            # The worker saw the deadline pass just before wait_for did; same outcome for the caller
+            with self._lock:
+                self._timed_out += 1
+            raise asyncio.TimeoutError(str(e)) from e
+        if self.kind == "process":
+            result, timings = result
+            merge_stage_timings(timings)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "capacity": self.capacity,
+                "in_flight": self._admitted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Runs the PGNet pipeline (decode, inference, postprocess, annotation)
+inference_executor = BoundedExecutor(
+    "pgnet",
+    kind=config.PGNET_EXECUTOR,
+    max_workers=config.PGNET_EXECUTOR_WORKERS,
+    max_queue=config.PGNET_EXECUTOR_QUEUE_SIZE,
+)
+
+# Runs blocking translation providers (googletrans, Argos), kept apart so a busy model never starves translation
+translation_executor = BoundedExecutor(
+    "translate",
+    kind="thread",
+    max_workers=config.TRANSLATE_EXECUTOR_WORKERS,
+    max_queue=config.TRANSLATE_EXECUTOR_QUEUE_SIZE,
+)
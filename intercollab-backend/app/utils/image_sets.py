@@ -0,0 +1,69 @@
+# intercollab-backend/app/utils/image_sets.py
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def list_images(directory):
+    """Image files under a directory (recursively), in a stable order."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def stream_map(fn, items, workers=4, prefetch=8):
+    """
+    Lazily map `fn` over `items` on a thread pool, yielding results in order.
+
+    At most `prefetch` results are computed ahead of the consumer, so large image
+    sets are decoded in parallel without ever being held in memory at once.
+    OpenCV releases the GIL while decoding and resizing, so threads are enough.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-loader") as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            result = pending.popleft().result()
+            for item in items:
+                pending.append(pool.submit(fn, item))
+                break
+            yield result
+
+
+def load_labels(label_file, image_dir=None):
+    """
+    Read a PaddleOCR-style label file.
+
+    Each line is `<image path>\\t<json list of {"transcription": ..., "points": ...}>`.
+    Image paths are relative to `image_dir` (default: the label file's directory).
+    Transcriptions of "###" mark illegible text and are skipped.
+
+    Returns:
+        list: (image path, list of expected texts) pairs.
+    """
+    image_dir = image_dir or os.path.dirname(os.path.abspath(label_file))
+    samples = []
+    with open(label_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            path, annotations = line.split("\t", 1)
+            texts = [
+                annotation["transcription"]
+                for annotation in json.loads(annotations)
+                if annotation.get("transcription") not in (None, "", "###")
+            ]
+            samples.append((os.path.join(image_dir, path), texts))
+    return samples
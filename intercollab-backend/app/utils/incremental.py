@@ -0,0 +1,223 @@
+# intercollab-backend/app/utils/incremental.py
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from app.config import config
+
+
+def changed_tiles(gray, prev_gray, tile_size, threshold):
+    """
+    Compare two grayscale frames tile by tile.
+
+    Returns:
+        np.ndarray: A (rows, cols) boolean grid, True where the mean absolute
+                    difference of the tile exceeds `threshold`.
+    """
+    diff = cv2.absdiff(gray, prev_gray)
+    height, width = diff.shape
+    rows = -(-height // tile_size)
+    cols = -(-width // tile_size)
+    # Pad to a whole number of tiles so the grid can be reduced with one reshape
+    padded = np.zeros((rows * tile_size, cols * tile_size), dtype=np.float32)
+    padded[:height, :width] = diff
+    tile_means = padded.reshape(rows, tile_size, cols, tile_size).mean(axis=(1, 3))
+    return tile_means > threshold
+
+
+def box_rects(boxes):
+    """Axis-aligned (x0, y0, x1, y1) bounding rectangles of polygon boxes."""
+    if len(boxes) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    boxes = np.asarray(boxes, dtype=np.float32)
+    return np.concatenate([boxes.min(axis=1), boxes.max(axis=1)], axis=1)
+
+
+def overlaps(rects, region):
+    """Which rects intersect the (x0, y0, x1, y1) region."""
+    x0, y0, x1, y1 = region
+    return (rects[:, 0] < x1) & (rects[:, 2] > x0) & (rects[:, 1] < y1) & (rects[:, 3] > y0)
+
+
+class IncrementalRecognizer:
+    """
+    Per-session recognizer that only re-runs PGNet on the parts of the board that changed.
+
+    A reference frame and its results are kept. A new frame is diffed tile by
+    tile against it; connected groups of changed tiles become regions, each region is grown
+    to fully contain the old text boxes it touches and padded, and PGNet runs on
+    those crops only. Old boxes touching a region are replaced by the new detections
+    touching it; detections in the padding alone are dropped, as the old boxes there are kept.
+    """
+
+    def __init__(self, recognize, tile_size=None, diff_threshold=None, padding=None, full_refresh_ratio=None):
+        """
+        Args:
+            recognize (callable): `recognize(frame) -> (dt_boxes, texts)` for a full frame or crop.
+            tile_size (int, optional): Tile edge in pixels.
+            diff_threshold (float, optional): Mean absolute gray-level difference for a tile to count as changed.
+            padding (int, optional): Pixels of context added around each changed region.
+            full_refresh_ratio (float, optional): Above this fraction of changed tiles, recognize the whole frame.
+        """
+        self.recognize = recognize
+        self.tile_size = tile_size or config.INCREMENTAL_TILE_SIZE
+        self.diff_threshold = config.INCREMENTAL_DIFF_THRESHOLD if diff_threshold is None else diff_threshold
+        self.padding = config.INCREMENTAL_PADDING if padding is None else padding
+        self.full_refresh_ratio = (
+            config.INCREMENTAL_FULL_REFRESH_RATIO if full_refresh_ratio is None else full_refresh_ratio
+        )
+
+        self.lock = threading.Lock()
+        self.prev_gray = None
+        self.boxes = []
+        self.texts = []
+        self.last_used = time.monotonic()
+
+    def _changed_regions(self, grid, width, height, rects):
+        count, _, stats, _ = cv2.connectedComponentsWithStats(grid.astype(np.uint8), connectivity=8)
+        regions = []
+        for label in range(1, count):
+            col, row, cols, rows = stats[label, :4]
+            regions.append([
+                col * self.tile_size,
+                row * self.tile_size,
+                min((col + cols) * self.tile_size, width),
+                min((row + rows) * self.tile_size, height),
+            ])
+
+        # Grow regions so text lines they cut through are re-read whole, and merge
+        # regions that end up overlapping so no area is recognized twice.
+        changed = True
+        while changed:
+            changed = False
+            for region in regions:
+                touched = rects[overlaps(rects, region)] if len(rects) else rects
+                if len(touched):
+                    grown = [
+                        min(region[0], touched[:, 0].min()),
+                        min(region[1], touched[:, 1].min()),
+                        max(region[2], touched[:, 2].max()),
+                        max(region[3], touched[:, 3].max()),
+                    ]
+                    if grown != region:
+                        region[:] = grown
+                        changed = True
+            merged = []
+            for region in regions:
+                for other in merged:
+                    if overlaps(np.array([other]), region)[0]:
+                        other[:] = [
+                            min(region[0], other[0]),
+                            min(region[1], other[1]),
+                            max(region[2], other[2]),
+                            max(region[3], other[3]),
+                        ]
+                        changed = True
+                        break
+                else:
+                    merged.append(region)
+            regions = merged
+        return regions
+
+    def _recognize_full(self, frame, gray):
+        boxes, texts = self.recognize(frame)
+        self.boxes, self.texts = list(boxes), list(texts)
+        self.prev_gray = gray
+
+    def __call__(self, frame):
+        """
+        Recognize a frame, reusing the results of unchanged areas.
+
+        Args:
+            frame (np.ndarray): The decoded BGR frame.
+
+        Returns:
+            (tuple): (dt_boxes, texts) for the whole frame.
+        """
+        with self.lock:
+            self.last_used = time.monotonic()
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            height, width = gray.shape
+
+            if self.prev_gray is None or self.prev_gray.shape != gray.shape:
+                self._recognize_full(frame, gray)
+                return np.array(self.boxes), list(self.texts)
+
+            grid = changed_tiles(gray, self.prev_gray, self.tile_size, self.diff_threshold)
+            if not grid.any():
+                return np.array(self.boxes), list(self.texts)
+            if grid.mean() > self.full_refresh_ratio:
+                self._recognize_full(frame, gray)
+                return np.array(self.boxes), list(self.texts)
+
+            # Only re-read areas are refreshed in the reference frame, so slow
+            # changes (drift, a stroke drawn over many frames) add up until noticed
+            reference = self.prev_gray.copy()
+            rects = box_rects(self.boxes)
+            keep = np.ones(len(self.boxes), dtype=bool)
+            new_boxes, new_texts = [], []
+            for region in self._changed_regions(grid, width, height, rects):
+                if len(rects):
+                    keep &= ~overlaps(rects, region)
+
+                x0 = int(max(region[0] - self.padding, 0))
+                y0 = int(max(region[1] - self.padding, 0))
+                x1 = int(min(region[2] + self.padding, width))
+                y1 = int(min(region[3] + self.padding, height))
+                boxes, texts = self.recognize(frame[y0:y1, x0:x1])
+                reference[y0:y1, x0:x1] = gray[y0:y1, x0:x1]
+                # Crop coordinates back to frame coordinates
+                boxes = [box + np.array([x0, y0], dtype=box.dtype) for box in boxes]
+                # The padding is context only: detections there that miss the region
+                # are the old boxes kept above, so only those touching it are new
+                inside = overlaps(box_rects(boxes), region) if len(boxes) else []
+                for box, text, keep_new in zip(boxes, texts, inside):
+                    if keep_new:
+                        new_boxes.append(box)
+                        new_texts.append(text)
+
+            self.boxes = [box for box, kept in zip(self.boxes, keep) if kept] + new_boxes
+            self.texts = [text for text, kept in zip(self.texts, keep) if kept] + new_texts
+            self.prev_gray = reference
+            return np.array(self.boxes), list(self.texts)
+
+
+class IncrementalSessions:
+    """Bounded, expiring map of session id -> IncrementalRecognizer."""
+
+    def __init__(self, max_sessions=None, ttl_seconds=None):
+        self.max_sessions = max_sessions or config.INCREMENTAL_MAX_SESSIONS
+        self.ttl = config.INCREMENTAL_SESSION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def get(self, session_id, recognize):
+        """Return the recognizer for a session, creating it on first use."""
+        with self._lock:
+            now = time.monotonic()
+            for stale_id in [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl]:
+                del self._sessions[stale_id]
+
+            recognizer = self._sessions.get(session_id)
+            if recognizer is None:
+                recognizer = IncrementalRecognizer(recognize)
+                self._sessions[session_id] = recognizer
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return recognizer
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+
+# Shared by the serving process; main.incremental_enabled turns incremental mode off with a process-pool executor.
+incremental_sessions = IncrementalSessions()
@@ -1,42 +1,296 @@
 # Github: kuroko1t
 import argparse
 import os
+import struct
+import threading
 
 import cv2
 import numpy as np
 import onnxruntime
-from paddleocr.ppocr.data.imaug.operators import (
-    E2EResizeForTest,
-    KeepKeys,
-    NormalizeImage,
-    ToCHWImage
-)
-from paddleocr.ppocr.postprocess.pg_postprocess import PGPostProcess
 
+from app.config import config
+from app.utils.metrics import stage
 from app.utils.pgnet.chr_dct import chr_dct_list
+from app.utils.pgnet.postprocess import PGNetPostProcess, clip_boxes
+from app.utils.pgnet.transforms import e2e_resize_for_test, normalize_image, to_chw
+
+
+# We need a dictionary file (ic15_dict.txt) that maps indices to characters.
+# Use absolute path to ensure it's found
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DICT_PATH = os.path.join(BASE_DIR, "ic15_dict.txt")
+_dict_lock = threading.Lock()
+_dict_ready = False
+
+
+def get_dict_path():
+    """
+    Return the path of the character dictionary, creating it on first use.
+
+    The existence check only runs once per process instead of once per request.
+    """
+    global _dict_ready
+    if _dict_ready:
+        return DICT_PATH
+    with _dict_lock:
+        # If the dictionary file doesn't exist, create it using chr_dct_list (from pgnet.chr_dct).
+        if not os.path.exists(DICT_PATH):
+            with open(DICT_PATH, "w") as f:
+                f.writelines(chr_dct_list)
+        _dict_ready = True
+    return DICT_PATH
+
+
+_postprocessors = {}
+
+
+def get_postprocessor(dict_path):
+    """
+    Return the shared PGNetPostProcess for a dictionary.
+
+    The dictionary is read once per process instead of on every postprocess call.
+    """
+    postprocessor = _postprocessors.get(dict_path)
+    if postprocessor is None:
+        postprocessor = PGNetPostProcess(
+            character_dict_path=dict_path,
+            valid_set="totaltext",
+            score_thresh=0.5,
+        )
+        _postprocessors[dict_path] = postprocessor
+    return postprocessor
+
+
+# Longest height E2EResizeForTest feeds the model; larger frames are scaled down to it
+MAX_SIDE_LEN = 768
+
+# JPEG DCT scaling: libjpeg decodes straight to 1/2, 1/4 or 1/8 of the size
+REDUCED_MODES = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# JPEG start-of-frame markers (C4, C8 and CC are DHT, JPG and DAC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageTooLarge(ValueError):
+    """The image has more pixels than MAX_IMAGE_MEGAPIXELS allows."""
+
+
+class UnsupportedImage(ValueError):
+    """The image is not a JPEG, PNG, WebP or BMP, or its header is broken."""
+
+
+def _probe_webp_size(data):
+    chunk = bytes(data[12:16])
+    if chunk == b"VP8 " and len(data) >= 30 and bytes(data[23:26]) == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25 and data[20] == 0x2F:
+        bits = struct.unpack("<I", data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def _probe_bmp_size(data):
+    if len(data) < 26:
+        return None
+    header_size = struct.unpack("<I", data[14:18])[0]
+    if header_size == 12:
+        return struct.unpack("<HH", data[18:22])
+    width, height = struct.unpack("<ii", data[18:26])
+    # Top-down bitmaps have a negative height
+    return abs(width), abs(height)
+
+
+def probe_image_size(data):
+    """
+    Read the (width, height) of a JPEG, PNG, WebP or BMP from its header, without decoding it.
+
+    Returns:
+        tuple | None: (width, height), or None for other formats or broken headers.
+    """
+    data = memoryview(data).cast("B")
+    if bytes(data[:8]) == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if bytes(data[:4]) == b"RIFF" and bytes(data[8:12]) == b"WEBP":
+        return _probe_webp_size(data)
+    if bytes(data[:2]) == b"BM":
+        return _probe_bmp_size(data)
+    if bytes(data[:2]) != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0x01,) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+
+def check_image_size(size):
+    """
+    Reject images above MAX_IMAGE_MEGAPIXELS before any pixel is decoded.
+
+    Args:
+        size (tuple | None): (width, height) from `probe_image_size`; None (a format
+            whose size cannot be read up front) is rejected as well.
+    """
+    if size is None:
+        raise UnsupportedImage("Unsupported or broken image: send a JPEG, PNG, WebP or BMP")
+    if size[0] * size[1] > config.MAX_IMAGE_MEGAPIXELS * 1_000_000:
+        raise ImageTooLarge(
+            f"Image of {size[0]}x{size[1]} exceeds the {config.MAX_IMAGE_MEGAPIXELS:g} megapixel limit"
+        )
+
+
+def decode_image_reduced(image, min_height=0, min_side=0):
+    """
+    Decode an encoded image at the smallest 1/2, 1/4 or 1/8 scale that still has
+    at least `min_height` rows and a longest side of at least `min_side`.
+
+    JPEGs are decoded at the reduced size directly (DCT scaling), so a 20 MP upload
+    never exists at full resolution; other formats are decoded and then reduced.
+
+    Args:
+        image (str | bytes | bytearray | memoryview): A file path or the encoded image.
+        min_height (int): Rows the decoded frame must keep (e.g. MAX_SIDE_LEN).
+        min_side (int): Length the longest side must keep (e.g. a preview size).
+
+    Returns:
+        (tuple): (frame, scale, (width, height)) with `scale` = [sx, sy], the factors
+                 that map frame coordinates back to the original image.
+    """
+    if isinstance(image, str):
+        image = np.fromfile(image, np.uint8)
+    size = probe_image_size(image)
+    check_image_size(size)
+    factor, flag = 1, cv2.IMREAD_COLOR
+    # The EXIF orientation may swap the sides, so assume the less favourable one
+    short_side, long_side = min(size), max(size)
+    for candidate, reduced_flag in REDUCED_MODES:
+        if short_side // candidate >= min_height and long_side // candidate >= min_side:
+            factor, flag = candidate, reduced_flag
+            break
+    img = cv2.imdecode(np.frombuffer(image, np.uint8), flag)
+    if img is None:
+        raise ValueError("Could not decode image")
+    height, width = img.shape[:2]
+    if factor == 1:
+        return img, np.array([1.0, 1.0]), (width, height)
+    original = size
+    if size[0] != size[1] and (width > height) != (size[0] > size[1]):
+        original = (size[1], size[0])  # rotated by the EXIF orientation
+    return img, np.array([original[0] / width, original[1] / height]), original
+
+
+def rescale_boxes(dt_boxes, scale, size):
+    """
+    Map polygons found on a reduced decode back to the original image's coordinates.
+
+    Args:
+        dt_boxes (np.ndarray): Polygons in frame coordinates.
+        scale (np.ndarray): [sx, sy] from `decode_image_reduced`.
+        size (tuple): (width, height) of the original image.
+    """
+    if len(dt_boxes) == 0 or (scale == 1.0).all():
+        return dt_boxes
+    return clip_boxes(np.asarray(dt_boxes, dtype=np.float64) * scale, (size[1], size[0]))
+
+
+def decode_image(image):
+    """
+    Turn any supported image source into a BGR ndarray.
+
+    Args:
+        image (str | bytes | bytearray | memoryview | np.ndarray): A file path, the
+            encoded image bytes (e.g. an uploaded JPEG), or an already decoded frame.
+
+    Returns:
+        np.ndarray: The decoded BGR image. Decoded frames are returned as is.
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, str):
+        img = cv2.imread(image)
+    else:
+        # Decode straight from memory, no temporary file needed
+        img = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image")
+    return img
+
+
+def preprocess_image(img):
+    """
+    Turn a decoded BGR image into the PGNet input tensor.
+
+    This is the one preprocessing pipeline for serving, calibration and benchmarks,
+    so they all feed the model the same resolution and normalization.
+
+    Args:
+        img (np.ndarray): The decoded BGR image.
+
+    Returns:
+        (tuple): (image, shape_list), the [1, C, H, W] input tensor and the
+                 [[src_h, src_w, ratio_h, ratio_w]] shape info for postprocessing.
+    """
+    # The same transforms as PaddleOCR's test pipeline (see app/utils/pgnet/transforms.py):
+    # - Resize the image for test (max_side_len=768 here), sides rounded up to multiples of 128.
+    # - Normalize by dividing by 255 and using the ImageNet mean/std.
+    # - Transpose image to [C, H, W].
+    img, shape_list = e2e_resize_for_test(img, max_side_len=MAX_SIDE_LEN, valid_set="totaltext")
+    img = to_chw(normalize_image(img))
+
+    # Expand dims to make batch size = 1 for ONNX model (i.e., [1, C, H, W]).
+    img = np.expand_dims(img, axis=0)
+    # Similarly, expand dims for shape_list.
+    shape_list = np.expand_dims(shape_list, axis=0)
+
+    return img, shape_list
 
 
 # intercollab-backend/app/utils/inference_pgnet.py
 class PGNetPredictor:
-    def __init__(self, img_path, cpu, model_path=None):
+    def __init__(self, image, cpu, model_path=None, sess=None, scheduler=None, runner=None):
         """
         Constructor for the PGNetPredictor class.
         
         Args:
-            img_path (str): Path to the input image.
+            image (str | bytes | memoryview | np.ndarray): The input image, as a path,
+                encoded bytes or an already decoded BGR frame.
             cpu (bool): Whether to run inference on CPU. If False, GPU (CUDA) is used.
             model_path (str, optional): Path to the ONNX model file.
+            sess (onnxruntime.InferenceSession, optional): An already loaded session
+                (e.g. from the session registry). When given, no new session is built.
+            scheduler (BatchScheduler, optional): Batches `predict` calls with other
+                concurrent requests instead of running the session directly.
+            runner (BucketedRunner, optional): Runs the session through IOBinding with
+                preallocated, shape-bucketed buffers.
         """
-        self.img_path = img_path
-        # We need a dictionary file (ic15_dict.txt) that maps indices to characters.
-        # Use absolute path to ensure it's found
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        self.dict_path = os.path.join(base_dir, "ic15_dict.txt")
-        
-        # If the dictionary file doesn't exist, create it using chr_dct_list (from pgnet.chr_dct).
-        if not os.path.exists(self.dict_path):
-            with open(self.dict_path, "w") as f:
-                f.writelines(chr_dct_list)
+        self.image = image
+        self.dict_path = get_dict_path()
+        # Set by preprocess when the image was decoded at a reduced size
+        self.scale = None
+        self.src_size = None
+        self.scheduler = scheduler
+        self.runner = runner
+
+        if sess is not None:
+            self.sess = sess
+            self.input_name = sess.get_inputs()[0].name
+            return
         
         # Set the ONNXRuntime providers based on whether we want to use CPU or GPU.
         if not cpu:
@@ -50,61 +304,37 @@ class PGNetPredictor:
             
         # Create an ONNXRuntime session with the specified providers (CPU or GPU).
         self.sess = onnxruntime.InferenceSession(model_path, providers=providers)
+        # The input name never changes, so look it up once instead of per predict()
+        self.input_name = self.sess.get_inputs()[0].name
 
-    def preprocess(self, img_path):
+    def preprocess(self, image):
         """
         Preprocess the input image before feeding it into the ONNX model.
         
-        1. Read the image using OpenCV.
+        1. Decode the image with OpenCV, at a reduced size when possible (skipped if it is already an ndarray).
         2. Apply transforms (resize, normalize, transpose).
         3. Return the processed image and shape information.
         
         Args:
-            img_path (str): Path to the image that needs to be preprocessed.
+            image (str | bytes | memoryview | np.ndarray): The image that needs to be preprocessed.
         
         Returns:
             (tuple): A tuple of (image, shape_list), where `image` is the processed
                      image tensor, and `shape_list` is shape information needed
                      for postprocessing.
         """
-        # Read the image from disk.
-        img = cv2.imread(img_path)
-        # Keep a copy of the original image for later use (e.g., drawing).
-        self.ori_im = img.copy()
-        
-        # Prepare a dictionary to feed into the transform pipeline.
-        data = {"image": img}
-        
-        # Define transformations from PaddleOCR:
-        # - E2EResizeForTest: Resize the image for test (max_side_len=768 here).
-        # - NormalizeImage: Normalize by dividing by 255 and using the given mean/std.
-        # - ToCHWImage: Transpose image to [C, H, W].
-        # - KeepKeys: Keep only "image" and "shape" keys in the data dictionary.
-        transforms = [
-            E2EResizeForTest(max_side_len=768, valid_set="totaltext"),
-            NormalizeImage(
-                scale=1.0 / 255.0,
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225],
-                order="hwc",
-            ),
-            ToCHWImage(),
-            KeepKeys(keep_keys=["image", "shape"]),
-        ]
-        
-        # Apply each transform in sequence.
-        for transform in transforms:
-            data = transform(data)
-        
-        # After KeepKeys, 'data' becomes (img, shape_list).
-        img, shape_list = data
-        
-        # Expand dims to make batch size = 1 for ONNX model (i.e., [1, C, H, W]).
-        img = np.expand_dims(img, axis=0)
-        # Similarly, expand dims for shape_list.
-        shape_list = np.expand_dims(shape_list, axis=0)
+        # Decode the image (no-op for an already decoded frame). Encoded images are
+        # decoded at a reduced size when the model would downscale them anyway; the
+        # boxes are scaled back to the original image in postprocess.
+        if isinstance(image, np.ndarray) or not config.PGNET_REDUCED_DECODE:
+            img = decode_image(image)
+        else:
+            img, self.scale, self.src_size = decode_image_reduced(image, min_height=MAX_SIDE_LEN)
+        # Keep the original image for clipping the boxes. The transforms never write
+        # to it, so a reference is enough (no copy of a full-size frame per request).
+        self.ori_im = img
         
-        return img, shape_list
+        return preprocess_image(img)
 
     def predict(self, img):
         """
@@ -122,8 +352,16 @@ class PGNetPredictor:
                       "f_score": <score output>
                   }
         """
+        # Let the scheduler batch this frame with other concurrent requests.
+        if self.scheduler is not None:
+            return self.scheduler.run(img)
+        
+        # Run through IOBinding with preallocated buffers when available.
+        if self.runner is not None:
+            return self.runner.run(img)
+        
         # Prepare the input dictionary, matching the input name required by the model.
-        ort_inputs = {self.sess.get_inputs()[0].name: img}
+        ort_inputs = {self.input_name: img}
         
         # Run the ONNX model with all outputs (None).
         outputs = self.sess.run(None, ort_inputs)
@@ -141,6 +379,9 @@ class PGNetPredictor:
         """
         Clip the detected bounding boxes so they lie within the image boundaries.
         
+        All boxes are clipped in a single NumPy operation (same result as calling
+        `clip_det_res` on each box).
+        
         Args:
             dt_boxes (np.ndarray): Detected bounding boxes.
             image_shape (tuple): Shape of the original image (height, width, ...).
@@ -148,16 +389,7 @@ class PGNetPredictor:
         Returns:
             np.ndarray: Clipped bounding boxes.
         """
-        img_height, img_width = image_shape[0:2]
-        dt_boxes_new = []
-        
-        # Go through each box and clip points that fall outside the image boundary.
-        for box in dt_boxes:
-            box = self.clip_det_res(box, img_height, img_width)
-            dt_boxes_new.append(box)
-        
-        dt_boxes = np.array(dt_boxes_new)
-        return dt_boxes
+        return clip_boxes(dt_boxes, image_shape)
 
     def clip_det_res(self, points, img_height, img_width):
         """
@@ -182,7 +414,7 @@ class PGNetPredictor:
         """
         Postprocess the model outputs to obtain bounding boxes and recognized text.
         
-        1. Use PGPostProcess to decode predictions into bounding boxes and strings.
+        1. Use PGNetPostProcess to decode predictions into bounding boxes and strings.
         2. Clip bounding boxes to ensure they lie within image boundaries.
         
         Args:
@@ -193,20 +425,20 @@ class PGNetPredictor:
             (tuple): (dt_boxes, strs) where dt_boxes are the bounding boxes, and
                      strs are the recognized texts.
         """
-        # PGPostProcess decodes the model outputs into polygon coordinates and text strings.
-        pgpostprocess = PGPostProcess(
-            character_dict_path=self.dict_path,
-            valid_set="totaltext",
-            score_thresh=0.5,
-            mode="fast",
-        )
+        # PGNetPostProcess decodes the model outputs into polygon coordinates and text strings.
+        # It is built once per process (see get_postprocessor).
+        pgpostprocess = get_postprocessor(self.dict_path)
         
         # Get the postprocessing result, which contains "points" and "texts".
-        post_result = pgpostprocess(preds, shape_list)
+        with stage("recognition", "postprocess"):
+            post_result = pgpostprocess(preds, shape_list)
         points, strs = post_result["points"], post_result["texts"]
         
         # Clip the bounding boxes to ensure they are within the image boundaries.
-        dt_boxes = self.filter_tag_det_res_only_clip(points, self.ori_im.shape)
+        with stage("recognition", "clip"):
+            dt_boxes = self.filter_tag_det_res_only_clip(points, self.ori_im.shape)
+            if self.scale is not None:
+                dt_boxes = rescale_boxes(dt_boxes, self.scale, self.src_size)
         
         return dt_boxes, strs
 
@@ -221,9 +453,11 @@ class PGNetPredictor:
             (tuple): (dt_boxes, strs), the bounding boxes and recognized text.
         """
         # Preprocess
-        img, shape_list = self.preprocess(self.img_path)
-        # Model prediction
-        preds = self.predict(img)
+        with stage("recognition", "preprocess"):
+            img, shape_list = self.preprocess(self.image)
+        # Model prediction (including any wait for a micro-batch)
+        with stage("recognition", "inference"):
+            preds = self.predict(img)
         # Postprocess and return bounding boxes + texts
         dt_boxes, strs = self.postprocess(preds, shape_list)
         return dt_boxes, strs
@@ -282,7 +516,8 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     # Initialize the predictor with the given arguments
-    pgnetpredictor = PGNetPredictor(args.img_path, args.cpu)
+    # (for whole directories or videos, use app/utils/batch_recognize.py)
+    pgnetpredictor = PGNetPredictor(args.img_path, args.cpu, model_path=args.model_path)
     
     # Run the end-to-end detection and recognition
     dt_boxes, strs = pgnetpredictor()
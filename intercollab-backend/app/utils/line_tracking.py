@@ -0,0 +1,211 @@
+# intercollab-backend/app/utils/line_tracking.py
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.config import config
+from app.utils.incremental import box_rects
+from app.utils.tiling import intersection_area, polygon_area
+
+
+def _rect_iou(a, b):
+    # Grown by a pixel, so that flat or one-pixel boxes still overlap themselves
+    a = a + np.array([-1, -1, 1, 1])
+    b = b + np.array([-1, -1, 1, 1])
+    inter = max(min(a[2], b[2]) - max(a[0], b[0]), 0) * max(min(a[3], b[3]) - max(a[1], b[1]), 0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union
+
+
+class _Track:
+    __slots__ = ("id", "poly", "area", "text", "missed", "translations")
+
+    def __init__(self, track_id, poly, text):
+        self.id = track_id
+        self.poly = poly
+        self.area = polygon_area(poly)
+        self.text = text
+        self.missed = 0
+        self.translations = {}  # target language -> (source text, translation)
+
+
+class LineTracker:
+    """
+    Follows the text lines of one session across frames.
+
+    Each detection is matched to the line it overlaps most in the previous frames
+    (polygon IoU above `min_iou`), so a line keeps its id while the board around it
+    changes. Lines that disappear are remembered for `max_missed` frames in case the
+    detection only flickered. Translations are kept per line and only redone when
+    the line's text changes.
+    """
+
+    def __init__(self, min_iou=None, max_missed=None):
+        self.min_iou = config.LINE_TRACK_MIN_IOU if min_iou is None else min_iou
+        self.max_missed = config.LINE_TRACK_MAX_MISSED if max_missed is None else max_missed
+        self.lock = threading.Lock()
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self.last_used = time.monotonic()
+
+    def _match(self, polys, rects, areas):
+        """Greedy one-to-one matching of detections to tracks by descending IoU."""
+        track_rects = box_rects([track.poly for track in self.tracks])
+        pairs = []
+        for det, rect in enumerate(rects):
+            near = np.flatnonzero(
+                (track_rects[:, 0] <= rect[2]) & (track_rects[:, 2] >= rect[0])
+                & (track_rects[:, 1] <= rect[3]) & (track_rects[:, 3] >= rect[1])
+            ) if len(track_rects) else []
+            for t in near:
+                track = self.tracks[t]
+                inter = intersection_area(polys[det], track.poly)
+                union = areas[det] + track.area - inter
+                # Degenerate polygons have no area to compare; use their bounding boxes
+                iou = inter / union if union >= 1.0 else _rect_iou(rect, track_rects[t])
+                if iou >= self.min_iou:
+                    pairs.append((iou, det, t))
+        matches, used_tracks = {}, set()
+        for _, det, t in sorted(pairs, reverse=True):
+            if det not in matches and t not in used_tracks:
+                matches[det] = t
+                used_tracks.add(t)
+        return matches
+
+    def update(self, dt_boxes, texts):
+        """
+        Match a frame's detections to the session's lines.
+
+        Returns:
+            list: One dict per detection: "id", "text", "points" and "status"
+                  ("new", "changed" or "unchanged").
+        """
+        with self.lock:
+            self.last_used = time.monotonic()
+            polys = [np.asarray(box, dtype=np.float32) for box in dt_boxes]
+            rects = box_rects(polys)
+            areas = [polygon_area(poly) for poly in polys]
+            matches = self._match(polys, rects, areas)
+
+            lines, tracks, seen = [], [], set()
+            for det, (poly, text) in enumerate(zip(polys, texts)):
+                if det in matches:
+                    track = self.tracks[matches[det]]
+                    seen.add(matches[det])
+                    status = "unchanged" if track.text == text else "changed"
+                    track.poly, track.area, track.text, track.missed = poly, areas[det], text, 0
+                else:
+                    track = _Track(next(self._ids), poly, text)
+                    status = "new"
+                tracks.append(track)
+                lines.append({
+                    "id": track.id,
+                    "text": text,
+                    "points": poly.round(1).tolist(),
+                    "status": status,
+                })
+            for t, track in enumerate(self.tracks):
+                if t not in seen:
+                    track.missed += 1
+                    if track.missed <= self.max_missed:
+                        tracks.append(track)
+            self.tracks = tracks
+            return lines
+
+    def pending_translations(self, lines, target_language):
+        """The lines whose translation into `target_language` is missing or stale."""
+        with self.lock:
+            by_id = {track.id: track for track in self.tracks}
+            pending = []
+            for line in lines:
+                track = by_id.get(line["id"])
+                cached = track.translations.get(target_language) if track is not None else None
+                if cached is None or cached[0] != line["text"]:
+                    pending.append(line)
+            return pending
+
+    def apply_translations(self, lines, target_language, translated):
+        """
+        Store new translations ({line id: translation}) and attach every line's translation.
+
+        Returns:
+            list: `lines` with a "translation" each.
+        """
+        with self.lock:
+            by_id = {track.id: track for track in self.tracks}
+            for line in lines:
+                track = by_id.get(line["id"])
+                if line["id"] in translated:
+                    line["translation"] = translated[line["id"]]
+                    if track is not None:
+                        track.translations[target_language] = (line["text"], line["translation"])
+                elif track is not None and target_language in track.translations:
+                    line["translation"] = track.translations[target_language][1]
+            return lines
+
+
+class LineTrackerSessions:
+    """Bounded, expiring map of session id -> LineTracker."""
+
+    def __init__(self, max_sessions=None, ttl_seconds=None):
+        self.max_sessions = max_sessions or config.INCREMENTAL_MAX_SESSIONS
+        self.ttl = config.INCREMENTAL_SESSION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self.lines_translated = 0
+        self.lines_reused = 0
+
+    def get(self, session_id):
+        """Return the tracker for a session, creating it on first use."""
+        with self._lock:
+            now = time.monotonic()
+            for stale_id in [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl]:
+                del self._sessions[stale_id]
+
+            tracker = self._sessions.get(session_id)
+            if tracker is None:
+                tracker = LineTracker()
+                self._sessions[session_id] = tracker
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return tracker
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    async def translate(self, session_id, lines, target_language, translate_many):
+        """
+        Add a "translation" to every line, only translating new or changed lines.
+
+        Args:
+            translate_many (callable): `await translate_many(texts, target_language)`,
+                e.g. TranslationService.translate_many.
+
+        Returns:
+            list: The lines, each with a "translation".
+        """
+        tracker = self.get(session_id)
+        pending = tracker.pending_translations(lines, target_language)
+        translations = await translate_many([line["text"] for line in pending], target_language)
+        with self._lock:
+            self.lines_translated += len(pending)
+            self.lines_reused += len(lines) - len(pending)
+        translated = {line["id"]: translation for line, translation in zip(pending, translations)}
+        return tracker.apply_translations(lines, target_language, translated)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "lines_translated": self.lines_translated,
+                "lines_reused": self.lines_reused,
+            }
+
+
+# Shared by the serving process: tracking runs there (see utils.track_lines), whichever executor recognized the frame.
+line_trackers = LineTrackerSessions()
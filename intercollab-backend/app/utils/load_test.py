@@ -0,0 +1,473 @@
+# intercollab-backend/app/utils/load_test.py
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from app.utils.batch_recognize import VIDEO_EXTENSIONS, video_frames
+from app.utils.benchmark_pipeline import RESOLUTIONS, synthetic_board
+from app.utils.image_sets import list_images
+from app.utils.rendering import encode_image
+from app.utils.stand_in_model import ensure_stand_in_model
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings scaled by --workers: the inference executor's threads, the dedicated
+# inference processes, or whole uvicorn worker processes
+WORKER_SETTINGS = ("executor", "inference", "uvicorn")
+
+# Responses that mean the server shed the request rather than failed it
+REJECTED_STATUSES = (429, 503)
+TIMEOUT_STATUSES = (499, 504)
+
+
+class MockTranslationServer:
+    """
+    A local LibreTranslate-compatible translation server for the "http" provider.
+
+    Translations are "[target] text", after `latency_ms` (to stand in for the
+    network round trip); `error_rate` of the requests fail with a 500.
+    """
+
+    def __init__(self, latency_ms=50.0, error_rate=0.0, port=0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                texts = body.get("q", [])
+                with server._lock:
+                    server.requests += 1
+                    server.texts += len(texts) if isinstance(texts, list) else 1
+                time.sleep(server.latency_ms / 1000.0)
+                if random.random() < server.error_rate:
+                    self._reply(500, {"error": "Mock translation failure"})
+                    return
+                target = body.get("target", "en")
+                if isinstance(texts, list):
+                    translated = [f"[{target}] {text}" for text in texts]
+                else:
+                    translated = f"[{target}] {texts}"
+                self._reply(200, {"translatedText": translated})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/translate"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "texts": self.texts}
+
+
+def synthetic_stream(width, height, frames, max_lines=20, seed=0):
+    """
+    A whiteboard being written on: every frame has the lines of the previous one plus
+    a few more, so consecutive frames mostly repeat (as from a fixed camera).
+
+    Returns:
+        list: Encoded JPEG frames.
+    """
+    step = max(frames // max_lines, 1)
+    # The same seed draws the same noise and the same first lines, so each board extends the last
+    return [
+        encode_image(synthetic_board(width, height, min(1 + i // step, max_lines), seed=seed), "jpeg", 90)[0]
+        for i in range(frames)
+    ]
+
+
+def load_frames(path, fps=1.0, limit=300):
+    """
+    Encoded frames of a recorded stream: a directory of images (in order) or a video
+    sampled at `fps`, at most `limit` frames.
+    """
+    if os.path.isdir(path):
+        frames = []
+        for image_path in list_images(path)[:limit]:
+            with open(image_path, "rb") as f:
+                frames.append(f.read())
+        return frames
+    if path.lower().endswith(VIDEO_EXTENSIONS):
+        frames = []
+        for _, _, frame in video_frames(path, fps=fps):
+            frames.append(encode_image(frame, "jpeg", 90)[0])
+            if len(frames) >= limit:
+                break
+        return frames
+    raise ValueError(f"Not an image directory or video: {path}")
+
+
+class LoadStats:
+    """Latencies and outcomes per endpoint."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.outcomes = {}
+
+    def record(self, endpoint, outcome, seconds=None):
+        counts = self.outcomes.setdefault(endpoint, {"ok": 0, "rejected": 0, "timeout": 0, "error": 0})
+        counts[outcome] += 1
+        if outcome == "ok":
+            self.latencies.setdefault(endpoint, []).append(seconds * 1000.0)
+
+    def summary(self, elapsed):
+        summary = {}
+        for endpoint, counts in self.outcomes.items():
+            total = sum(counts.values())
+            samples = np.array(self.latencies.get(endpoint, [0.0]))
+            summary[endpoint] = {
+                "requests": total,
+                "throughput_rps": counts["ok"] / elapsed if elapsed else 0.0,
+                "p50_ms": float(np.percentile(samples, 50)),
+                "p95_ms": float(np.percentile(samples, 95)),
+                "p99_ms": float(np.percentile(samples, 99)),
+                "max_ms": float(samples.max()),
+                "error_rate": (counts["error"] + counts["timeout"]) / total,
+                "rejection_rate": counts["rejected"] / total,
+                **counts,
+            }
+        return summary
+
+
+def classify(status_code):
+    if 200 <= status_code < 300:
+        return "ok"
+    if status_code in REJECTED_STATUSES:
+        return "rejected"
+    if status_code in TIMEOUT_STATUSES:
+        return "timeout"
+    return "error"
+
+
+async def _timed_post(client, stats, endpoint, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.post(endpoint, **kwargs)
+    except Exception:
+        # Connection resets and client-side timeouts
+        stats.record(endpoint, "error")
+        return None
+    outcome = classify(response.status_code)
+    stats.record(endpoint, outcome, time.perf_counter() - started)
+    return response if outcome == "ok" else None
+
+
+async def simulate_client(client, index, frames, stats, deadline, fps, translate_every, target_language,
+                          render_mode, sessions):
+    """
+    One classroom camera: uploads its stream at `fps` (as fast as possible with 0),
+    starting at a different frame than its neighbours, and translates the recognized
+    text every `translate_every` frames.
+
+    Like a real camera, a client that falls behind skips the frames it missed
+    instead of queueing them.
+    """
+    interval = 1.0 / fps if fps else 0.0
+    next_at = time.perf_counter()
+    position = index * 7
+    count = 0
+    while time.perf_counter() < deadline:
+        form = {"image_data": frames[position % len(frames)], "render_mode": render_mode}
+        if sessions:
+            form["session_id"] = f"load-test-{index}"
+        response = await _timed_post(client, stats, "/api/process-image", data=form)
+        count += 1
+        text = response.json().get("text") if response is not None else None
+        if translate_every and text and count % translate_every == 0:
+            await _timed_post(
+                client, stats, "/api/translate", json={"text": text, "target_language": target_language}
+            )
+        if interval:
+            next_at += interval
+            now = time.perf_counter()
+            if next_at > now:
+                await asyncio.sleep(next_at - now)
+            else:
+                missed = int((now - next_at) / interval) + 1
+                position += missed
+                next_at += missed * interval
+        position += 1
+
+
+async def run_load(base_url, frames, clients=8, duration=30.0, fps=2.0, translate_every=5, target_language="es",
+                   render_mode="inline", sessions=False, timeout=30.0):
+    """
+    Replay `frames` from `clients` simulated clients against a running server for `duration` seconds.
+
+    Args:
+        frames (list): Encoded frames; every client cycles through them.
+
+    Returns:
+        dict: Per-endpoint summary (see LoadStats.summary) and "elapsed_s".
+    """
+    import httpx
+
+    encoded = [base64.b64encode(frame).decode("ascii") for frame in frames]
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=clients * 2, max_keepalive_connections=clients * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            simulate_client(client, index, encoded, stats, deadline, fps, translate_every, target_language,
+                            render_mode, sessions)
+            for index in range(clients)
+        ))
+        elapsed = time.perf_counter() - started
+    return {"elapsed_s": elapsed, "endpoints": stats.summary(elapsed)}
+
+
+class ResourceSampler:
+    """
+    CPU and memory of a process and its children (uvicorn and inference workers),
+    sampled in the background. Needs the optional `psutil` package.
+    """
+
+    def __init__(self, pid, interval=0.5):
+        import psutil
+
+        self.psutil = psutil
+        self.pid = pid
+        self.interval = interval
+        self.cpu_samples = []
+        self.rss_samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        psutil = self.psutil
+        root = psutil.Process(self.pid)
+        tracked = {}
+        while not self._stop.wait(self.interval):
+            try:
+                processes = [root] + root.children(recursive=True)
+            except psutil.NoSuchProcess:
+                return
+            cpu = rss = 0.0
+            for process in processes:
+                # cpu_percent() measures since the previous call on the same object
+                process = tracked.setdefault(process.pid, process)
+                try:
+                    cpu += process.cpu_percent()
+                    rss += process.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+            self.cpu_samples.append(cpu)
+            self.rss_samples.append(rss / (1024 * 1024))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        # The first sample of every process has no previous call to compare with
+        cpu = self.cpu_samples[1:] or [0.0]
+        return {
+            "cpu_percent_mean": float(np.mean(cpu)),
+            "cpu_percent_max": float(np.max(cpu)),
+            "rss_mb_peak": float(max(self.rss_samples, default=0.0)),
+        }
+
+
+def server_env(model_path, translation_url, worker_setting, workers, extra_env=()):
+    """Environment of a server run against the stand-ins, with `workers` applied to `worker_setting`."""
+    env = dict(os.environ)
+    env.update({
+        "PGNET_MODEL_PATH": model_path,
+        "TRANSLATE_PROVIDER": "http",
+        "TRANSLATE_HTTP_URL": translation_url,
+        "LOG_LEVEL": "WARNING",
+    })
+    if worker_setting == "executor":
+        env["PGNET_EXECUTOR_WORKERS"] = str(workers)
+    elif worker_setting == "inference":
+        env["PGNET_WORKER_PROCESSES"] = str(workers)
+    for item in extra_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def start_server(env, port, uvicorn_workers=1, ready_timeout=120.0):
+    """
+    Start `uvicorn app.main:app` and wait until /api/health reports ready.
+
+    Returns:
+        (tuple): (subprocess.Popen, log file path)
+    """
+    import httpx
+
+    log_path = os.path.join(tempfile.gettempdir(), f"intercollab_load_test_{port}.log")
+    log = open(log_path, "w")
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(uvicorn_workers), "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    deadline = time.monotonic() + ready_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}, see {log_path}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=2.0).status_code == 200:
+                return process, log_path
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    stop_server(process)
+    raise RuntimeError(f"Server not ready after {ready_timeout:.0f}s, see {log_path}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def print_results(runs):
+    print(f"\n{'workers':>8} {'endpoint':<20}{'req':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'err %':>7}{'rej %':>7}{'cpu %':>8}{'rss MB':>8}")
+    for run in runs:
+        resources = run.get("resources") or {}
+        cpu = f"{resources['cpu_percent_mean']:>8.0f}" if resources else f"{'-':>8}"
+        rss = f"{resources['rss_mb_peak']:>8.0f}" if resources else f"{'-':>8}"
+        for endpoint, r in sorted(run["endpoints"].items()):
+            print(f"{run['workers']:>8} {endpoint:<20}{r['requests']:>7}{r['throughput_rps']:>8.1f}"
+                  f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+                  f"{r['error_rate'] * 100:>7.1f}{r['rejection_rate'] * 100:>7.1f}{cpu}{rss}")
+
+
+if __name__ == "__main__":
+    # Starts the app against the stand-in model and a mock translation server, replays
+    # whiteboard streams from many clients and reports throughput, latency, errors,
+    # rejections and server CPU/memory for every worker count.
+    # Example usage (from intercollab-backend):
+    #   python -m app.utils.load_test --workers 1,2,4 --clients 16 --duration 30 --json load.json
+    #   python -m app.utils.load_test --frames ./recorded_lecture --worker-setting inference --workers 1,2
+    #   python -m app.utils.load_test --url http://localhost:8000 --clients 4
+    parser = argparse.ArgumentParser(description="Load-test the backend with local stand-ins")
+    parser.add_argument("--workers", type=str, default="1,2,4", help="comma-separated worker counts to compare")
+    parser.add_argument("--worker-setting", type=str, default="executor", choices=WORKER_SETTINGS,
+                        help="what --workers scales")
+    parser.add_argument("--clients", type=int, default=8, help="simulated clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per worker count")
+    parser.add_argument("--fps", type=float, default=2.0, help="frames per second per client (0 = unthrottled)")
+    parser.add_argument("--frames", type=str, default=None, help="recorded stream: image directory or video")
+    parser.add_argument("--resolution", type=str, default="hd", choices=list(RESOLUTIONS),
+                        help="size of the synthetic stream")
+    parser.add_argument("--stream-frames", type=int, default=40, help="frames in the synthetic stream")
+    parser.add_argument("--render-mode", type=str, default="inline", help="render_mode sent with every frame")
+    parser.add_argument("--sessions", action="store_true", help="send a session id per client (incremental)")
+    parser.add_argument("--translate-every", type=int, default=5, help="translate every N-th result (0 = never)")
+    parser.add_argument("--target-language", type=str, default="es", help="target language of the translations")
+    parser.add_argument("--translate-latency-ms", type=float, default=50.0, help="mock translation latency")
+    parser.add_argument("--translate-error-rate", type=float, default=0.0, help="mock translation failure rate")
+    parser.add_argument("--model", type=str, default=None, help="ONNX model to serve (default: the stand-in)")
+    parser.add_argument("--env", action="append", default=[], help="extra server setting KEY=VALUE (repeatable)")
+    parser.add_argument("--port", type=int, default=8765, help="port of the started server")
+    parser.add_argument("--url", type=str, default=None, help="test an already running server instead")
+    parser.add_argument("--json", type=str, default=None, help="write machine-readable results here")
+    args = parser.parse_args()
+
+    if args.frames:
+        frames = load_frames(args.frames)
+    else:
+        frames = synthetic_stream(*RESOLUTIONS[args.resolution], args.stream_frames)
+    if not frames:
+        sys.exit("No frames to replay")
+    load = dict(
+        clients=args.clients, duration=args.duration, fps=args.fps, translate_every=args.translate_every,
+        target_language=args.target_language, render_mode=args.render_mode, sessions=args.sessions,
+    )
+    runs = []
+    if args.url:
+        result = asyncio.run(run_load(args.url.rstrip("/"), frames, **load))
+        runs.append({"workers": "-", **result})
+    else:
+        model_path = args.model or ensure_stand_in_model(os.path.join(tempfile.gettempdir(), "pgnet_stand_in.onnx"))
+        translator = MockTranslationServer(args.translate_latency_ms, args.translate_error_rate).start()
+        try:
+            for workers in [int(w) for w in args.workers.split(",") if w]:
+                env = server_env(model_path, translator.url, args.worker_setting, workers, args.env)
+                uvicorn_workers = workers if args.worker_setting == "uvicorn" else 1
+                print(f"{args.worker_setting} workers: {workers}, {args.clients} clients, {args.duration:g}s")
+                process, log_path = start_server(env, args.port, uvicorn_workers)
+                try:
+                    try:
+                        sampler = ResourceSampler(process.pid).start()
+                    except ImportError:
+                        print("psutil is not installed; CPU and memory are not reported")
+                        sampler = None
+                    result = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", frames, **load))
+                    resources = sampler.stop() if sampler is not None else None
+                finally:
+                    stop_server(process)
+                runs.append({"workers": workers, **result, "resources": resources})
+        finally:
+            translator.stop()
+        print(f"Mock translation server: {translator.stats()['requests']} requests")
+    print_results(runs)
+
+    if args.json:
+        report = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "cpu_count": os.cpu_count(),
+                "worker_setting": args.worker_setting,
+                "frames": len(frames),
+                "source": args.frames or f"synthetic {args.resolution}",
+                "model_path": args.model or "stand-in",
+                "server_env": args.env,
+                **load,
+            },
+            "runs": runs,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
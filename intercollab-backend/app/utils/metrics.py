@@ -0,0 +1,185 @@
+# intercollab-backend/app/utils/metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Seconds; spans a cheap stage (~0.5 ms) up to a slow full-resolution request
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A labelled Prometheus histogram with fixed buckets."""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def take(self):
+        """Return the recorded series and start over, e.g. to ship them to another process."""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series):
+        """Add series returned by `take` (in any process) to this histogram."""
+        with self._lock:
+            for label_values, values in series.items():
+                current = self._series.get(label_values)
+                if current is None:
+                    self._series[label_values] = list(values)
+                else:
+                    self._series[label_values] = [a + b for a, b in zip(current, values)]
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observe the duration of a `with` block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                labels = _format_labels(self.label_names, label_values, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {values[-1]}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {values[-2]!r}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+class Collected:
+    """Counters or gauges read from existing stats when scraped."""
+
+    def __init__(self, name, documentation, kind, label_names, collect):
+        """
+        Args:
+            kind (str): "counter" or "gauge".
+            collect (callable): Returns a list of (label values, value) pairs.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.label_names = tuple(label_names)
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, value in self.collect():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def collected(self, name, documentation, kind="gauge", label_names=(), collect=None):
+        return self._register(Collected(name, documentation, kind, label_names, collect))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # One broken collector must not take the whole scrape down
+                continue
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the whole process. Worker processes (PGNET_EXECUTOR=process, the
+# inference worker pool) send their stage timings back with each result, see
+# take_stage_timings and merge_stage_timings.
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "intercollab_stage_seconds",
+    "Time spent in each stage of the recognition and translation pipelines.",
+    ("pipeline", "stage"),
+)
+
+REQUEST_SECONDS = metrics.histogram(
+    "intercollab_request_seconds",
+    "HTTP request latency by route and status code.",
+    ("method", "route", "status"),
+)
+
+
+def stage(pipeline, name):
+    """Time a pipeline stage: `with stage("recognition", "inference"): ...`"""
+    return STAGE_SECONDS.time(pipeline, name)
+
+
+def take_stage_timings():
+    """Stage timings recorded in this process since the last call (in a worker process, after each task)."""
+    return STAGE_SECONDS.take()
+
+
+def merge_stage_timings(timings):
+    """Record stage timings taken in a worker process in this process's histograms."""
+    if timings:
+        STAGE_SECONDS.merge(timings)
@@ -0,0 +1,280 @@
+# intercollab-backend/app/utils/model_manager.py
+import hashlib
+import logging
+import os
+import random
+import threading
+from contextlib import contextmanager
+
+from app.config import config
+from app.utils.batching import release_scheduler
+from app.utils.session_registry import registry
+from app.utils.shape_buckets import release_runner
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANT = "default"
+
+
+def parse_variants(spec, default_path=None):
+    """
+    Parse PGNET_MODEL_VARIANTS ("name=path,name=path") into an ordered {name: path}.
+
+    An empty spec serves `default_path` (PGNET_MODEL_PATH) as the "default" variant.
+    """
+    if not spec.strip():
+        return {DEFAULT_VARIANT: default_path or config.PGNET_MODEL_PATH}
+    variants = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, sep, path = item.partition("=")
+        if not sep or not name.strip() or not path.strip():
+            raise ValueError(f"Invalid model variant {item!r}, expected name=path")
+        variants[name.strip()] = path.strip()
+    return variants
+
+
+def parse_weights(spec, names):
+    """
+    Parse PGNET_MODEL_WEIGHTS ("name=weight,...") for the given variant names.
+
+    Variants left out get a weight of 0; an empty spec sends everything to the first variant.
+    """
+    weights = {name: 0.0 for name in names}
+    if not spec.strip():
+        weights[names[0]] = 1.0
+        return weights
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, sep, weight = item.partition("=")
+        name = name.strip()
+        if not sep or name not in weights:
+            raise ValueError(f"Invalid model weight {item!r}")
+        weights[name] = float(weight)
+    return check_weights(weights)
+
+
+def check_weights(weights):
+    if any(weight < 0 for weight in weights.values()) or sum(weights.values()) <= 0:
+        raise ValueError("Model weights must be non-negative and not all zero")
+    return weights
+
+
+class LoadedModel:
+    """One generation of a variant: a model file and the session built from it."""
+
+    def __init__(self, name, model_path, sess, generation):
+        self.name = name
+        self.model_path = model_path
+        self.sess = sess
+        self.generation = generation
+        self.in_flight = 0
+        self.retired = False
+
+    @property
+    def cache_namespace(self):
+        """Results of different variants or generations never share cache entries."""
+        return f"{self.name}:{self.generation}"
+
+
+class ModelManager:
+    """
+    Serves several named PGNet variants side by side and hot-swaps their model files.
+
+    Every request leases the current generation of one variant. Swapping builds and
+    warms up the new session first, then switches new requests over atomically;
+    requests already running finish on the old session, which is released (with its
+    batch scheduler and IOBinding buffers) when the last of them is done.
+    """
+
+    def __init__(self, variants=None, weights=None, cpu=None):
+        """
+        Args:
+            variants (dict, optional): {name: model path}; defaults to PGNET_MODEL_VARIANTS.
+            weights (dict, optional): {name: weight}; defaults to PGNET_MODEL_WEIGHTS.
+            cpu (bool, optional): Run on CPU; defaults to not PGNET_USE_GPU.
+        """
+        variants = parse_variants(config.PGNET_MODEL_VARIANTS) if variants is None else variants
+        self.cpu = not config.PGNET_USE_GPU if cpu is None else cpu
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._models = {name: LoadedModel(name, path, None, 0) for name, path in variants.items()}
+        self.weights = parse_weights(config.PGNET_MODEL_WEIGHTS, list(variants)) if weights is None else weights
+        # Set when inference runs in an InferenceWorkerPool: no sessions in this process
+        self.remote = None
+
+    def serve_remotely(self, pool):
+        """Leave the sessions to a worker pool; leases then only carry the variant's identity."""
+        self.remote = pool
+
+    @property
+    def default_variant(self):
+        return next(iter(self._models))
+
+    def model_path(self, name=None):
+        return self._models[name or self.default_variant].model_path
+
+    def load_all(self):
+        """Load and warm up every variant (at startup)."""
+        if self.remote is not None:
+            return
+        for name in list(self._models):
+            self._ensure_loaded(self._models[name])
+
+    def _ensure_loaded(self, model):
+        if model.sess is None:
+            sess = registry.load(model.model_path, cpu=self.cpu)
+            with self._lock:
+                if model.sess is None:
+                    model.sess = sess
+        return model
+
+    def choose(self, name=None, sticky_key=None):
+        """
+        Pick the variant for a request.
+
+        Args:
+            name (str, optional): An explicitly requested variant.
+            sticky_key (str, optional): Routes the same key (e.g. a session id) to the same variant.
+
+        Returns:
+            str: The variant name.
+        """
+        with self._lock:
+            if name:
+                if name not in self._models:
+                    raise ValueError(f"Unknown model variant: {name}")
+                return name
+            weighted = [(variant, weight) for variant, weight in self.weights.items() if weight > 0]
+        if len(weighted) == 1:
+            return weighted[0][0]
+        if sticky_key is not None:
+            digest = hashlib.blake2b(sticky_key.encode(), digest_size=8).digest()
+            point = int.from_bytes(digest, "big") / 2 ** 64
+        else:
+            point = random.random()
+        point *= sum(weight for _, weight in weighted)
+        for variant, weight in weighted:
+            point -= weight
+            if point < 0:
+                return variant
+        return weighted[-1][0]
+
+    @contextmanager
+    def lease(self, name=None, sticky_key=None):
+        """
+        Use the current generation of a variant for the duration of a `with` block.
+
+        Yields:
+            LoadedModel: name, model_path, sess and generation of the variant.
+        """
+        name = self.choose(name, sticky_key)
+        while True:
+            with self._lock:
+                model = self._models[name]
+                if model.sess is not None or self.remote is not None:
+                    model.in_flight += 1
+                    break
+            self._ensure_loaded(model)
+        try:
+            yield model
+        finally:
+            with self._lock:
+                model.in_flight -= 1
+                release = model.retired and model.in_flight == 0
+            if release:
+                self._release(model)
+
+    def _release(self, model):
+        with self._lock:
+            still_used = any(current.sess is model.sess for current in self._models.values())
+        if still_used:
+            return
+        release_scheduler(model.sess)
+        release_runner(model.sess)
+        registry.unload(model.model_path, model.sess, cpu=self.cpu)
+        logger.info("Released generation %d of model variant %s", model.generation, model.name)
+
+    def swap(self, name, model_path=None):
+        """
+        Point a variant at a (new) model file without dropping in-flight requests.
+
+        Also adds the variant if it does not exist yet (with a weight of 0, so it only
+        serves requests that ask for it until the weights are changed).
+
+        Args:
+            name (str): The variant to swap.
+            model_path (str, optional): The new model file; defaults to reloading the
+                variant's current file (e.g. after it was replaced on disk).
+
+        Returns:
+            dict: The variant's new status.
+        """
+        with self._swap_lock:
+            with self._lock:
+                current = self._models.get(name)
+            if model_path is None:
+                if current is None:
+                    raise ValueError(f"Unknown model variant: {name}")
+                model_path = current.model_path
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Model file not found at {model_path}")
+
+            with self._lock:
+                generation = current.generation + 1 if current is not None else 0
+            # Build and warm up the new session before any request can see it
+            if self.remote is not None:
+                self.remote.sync_model(name, model_path, generation)
+                sess = None
+            else:
+                sess = registry.load(model_path, cpu=self.cpu, reload=True)
+            with self._lock:
+                old = self._models.get(name)
+                self._models[name] = LoadedModel(name, model_path, sess, generation)
+                self.weights.setdefault(name, 0.0)
+                release = False
+                if old is not None and old.sess is not None:
+                    old.retired = True
+                    release = old.in_flight == 0
+            if release:
+                self._release(old)
+            logger.info("Model variant %s now serves %s (generation %d)", name, model_path, generation)
+            return self.status(name)[0]
+
+    def set_weights(self, weights):
+        """Replace the A/B weights; variants left out get a weight of 0."""
+        with self._lock:
+            unknown = set(weights) - set(self._models)
+            if unknown:
+                raise ValueError(f"Unknown model variants: {', '.join(sorted(unknown))}")
+            new_weights = {name: float(weights.get(name, 0.0)) for name in self._models}
+            self.weights = check_weights(new_weights)
+            return dict(self.weights)
+
+    def is_ready(self):
+        if self.remote is not None:
+            return self.remote.is_ready()
+        return all(model.sess is not None for model in self._models.values())
+
+    def status(self, name=None):
+        with self._lock:
+            models = [self._models[name]] if name else list(self._models.values())
+            return [
+                {
+                    "name": model.name,
+                    "model_path": model.model_path,
+                    "generation": model.generation,
+                    "weight": self.weights.get(model.name, 0.0),
+                    "loaded": model.sess is not None,
+                    "in_flight": model.in_flight,
+                }
+                for model in models
+            ]
+
+
+# Shared by the whole process. With a process-pool executor every worker has its
+# own manager built from the config, and swaps only apply to the serving process.
+model_manager = ModelManager()
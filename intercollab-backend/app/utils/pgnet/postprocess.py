@@ -0,0 +1,217 @@
+# intercollab-backend/app/utils/pgnet/postprocess.py
+import cv2
+import numpy as np
+
+from app.utils.pgnet.textpoint import (
+    expand_poly_along_width,
+    sort_and_expand_with_direction_v2,
+    thin,
+)
+
+
+def load_lexicon(character_dict_path):
+    """Read the character dictionary exactly like paddleocr's get_dict does."""
+    character_str = ""
+    with open(character_dict_path, "rb") as fin:
+        for line in fin.readlines():
+            character_str += line.decode("utf-8").strip("\n").strip("\r\n")
+    return list(character_str)
+
+
+def thin_cropped(binary_map):
+    """
+    Skeletonize a binary map, only working on the bounding box of its foreground.
+
+    Thinning only ever removes foreground pixels and pads with zeros, so running it
+    on the tight crop gives exactly the same skeleton as running it on the full map.
+    """
+    ys, xs = np.nonzero(binary_map)
+    skeleton = np.zeros(binary_map.shape, dtype=bool)
+    if len(ys) == 0:
+        return skeleton
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    skeleton[y0:y1, x0:x1] = thin(binary_map[y0:y1, x0:x1])
+    return skeleton
+
+
+def clip_boxes(dt_boxes, image_shape):
+    """
+    Clip all detected polygons to the image in one NumPy operation.
+
+    Matches PGNetPredictor.clip_det_res applied to every point: coordinates are
+    clamped to [0, size - 1] and truncated to whole pixels.
+
+    Args:
+        dt_boxes (list | np.ndarray): Detected polygons, each of shape [points, 2].
+        image_shape (tuple): Shape of the original image (height, width, ...).
+
+    Returns:
+        np.ndarray: Clipped boxes with shape [boxes, points, 2].
+    """
+    img_height, img_width = image_shape[0:2]
+    boxes = np.array(dt_boxes)
+    if boxes.size == 0:
+        return boxes
+    limits = np.array([img_width - 1, img_height - 1], dtype=boxes.dtype)
+    return np.floor(np.clip(boxes, 0, limits))
+
+
+class PGNetPostProcess:
+    """
+    PGNet "fast" mode post-processing with the dictionary loaded once.
+
+    Produces the same points and texts as paddleocr's PGPostProcess(mode="fast"),
+    but is built once per process instead of per request, only skeletonizes the
+    area that contains text, groups skeleton pixels by instance in a single pass,
+    and decodes the CTC sequences and restores the border points of all text
+    instances with batched NumPy operations.
+    """
+
+    def __init__(self, character_dict_path, valid_set="totaltext", score_thresh=0.5, pts_num=6):
+        """
+        Args:
+            character_dict_path (str): Path to the character dictionary (e.g. ic15_dict.txt).
+            valid_set (str): "totaltext" (polygon output) or "partvgg" (quad output).
+            score_thresh (float): Threshold on f_score for text center line pixels.
+            pts_num (int): Number of center line points kept per instance.
+        """
+        if valid_set not in ("totaltext", "partvgg"):
+            raise ValueError(f"Unsupported valid_set: {valid_set}")
+        self.lexicon = np.array(load_lexicon(character_dict_path))
+        self.valid_set = valid_set
+        self.score_thresh = score_thresh
+        self.pts_num = pts_num
+        self.offset_expand = 1.2 if valid_set == "totaltext" else 1.0
+
+    def center_lines(self, p_score, f_direction):
+        """
+        Find the sorted and extended center line of every text instance.
+
+        Args:
+            p_score (np.ndarray): f_score of one image, shape [1, H, W].
+            f_direction (np.ndarray): f_direction of one image, shape [2, H, W].
+
+        Returns:
+            list: One list of (y, x) points per instance.
+        """
+        p_score = p_score[0]
+        f_direction = f_direction.transpose(1, 2, 0)
+        p_tcl_map = (p_score > self.score_thresh) * 1.0
+        skeleton_map = thin_cropped(p_tcl_map.astype(np.uint8))
+        instance_count, instance_label_map = cv2.connectedComponents(
+            skeleton_map.astype(np.uint8), connectivity=8
+        )
+        if instance_count <= 1:
+            return []
+
+        # Group the skeleton pixels of all instances at once. A stable sort by label
+        # keeps each instance's pixels in row-major order, the same order
+        # np.where(instance_label_map == instance_id) would give.
+        labels = instance_label_map.ravel()
+        pixel_idx = np.flatnonzero(labels)
+        pixel_idx = pixel_idx[np.argsort(labels[pixel_idx], kind="stable")]
+        bounds = np.searchsorted(labels[pixel_idx], np.arange(1, instance_count + 1))
+        ys, xs = np.divmod(pixel_idx, instance_label_map.shape[1])
+
+        all_pos_yxs = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if end - start < 3:
+                continue
+            pos_list = list(zip(ys[start:end], xs[start:end]))
+            all_pos_yxs.append(sort_and_expand_with_direction_v2(pos_list, f_direction, p_tcl_map))
+        return all_pos_yxs
+
+    def decode(self, all_pos_yxs, p_char):
+        """
+        Greedy CTC decode of every instance with one gather and one argmax.
+
+        Args:
+            all_pos_yxs (list): Center lines from `center_lines`.
+            p_char (np.ndarray): f_char of one image, shape [C, H, W]; channel C - 1 is the blank.
+
+        Returns:
+            (tuple): (keep_yxs_list, texts) with `pts_num` points per kept instance.
+        """
+        gather_list = [gather for gather in all_pos_yxs if len(gather) >= self.pts_num]
+        if not gather_list:
+            return [], []
+
+        blank = p_char.shape[0] - 1
+        lengths = np.array([len(gather) for gather in gather_list])
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        points = np.array([point for gather in gather_list for point in gather]).reshape(-1, 2)
+
+        labels = np.argmax(p_char[:, points[:, 0], points[:, 1]], axis=0)
+        # groupby(labels) keeps the first label of every run; runs restart per instance
+        keep = np.ones(len(labels), dtype=bool)
+        keep[1:] = labels[1:] != labels[:-1]
+        keep[starts] = True
+        keep &= labels != blank
+
+        instance_ids = np.repeat(np.arange(len(gather_list)), lengths)
+        kept_ids = instance_ids[keep]
+        kept_chars = self.lexicon[labels[keep]]
+        char_bounds = np.searchsorted(kept_ids, np.arange(len(gather_list) + 1))
+
+        texts = []
+        keep_yxs_list = []
+        for i, gather in enumerate(gather_list):
+            text = "".join(kept_chars[char_bounds[i]:char_bounds[i + 1]])
+            if len(text) < 2:
+                continue
+            detal = len(gather) // (self.pts_num - 1)
+            keep_idx_list = [0] + [detal * (k + 1) for k in range(self.pts_num - 2)] + [-1]
+            texts.append(text)
+            keep_yxs_list.append([gather[idx] for idx in keep_idx_list])
+        return keep_yxs_list, texts
+
+    def restore_polys(self, keep_yxs_list, p_border, ratio_w, ratio_h, src_w, src_h):
+        """
+        Turn the kept center line points into polygons in original image coordinates.
+
+        Returns:
+            list: One float64 polygon per instance.
+        """
+        if not keep_yxs_list:
+            return []
+
+        yx = np.array(keep_yxs_list).reshape(len(keep_yxs_list), self.pts_num, 2)
+        offsets = p_border[:, yx[..., 0], yx[..., 1]]  # [4, N, pts]
+        offsets = offsets.transpose(1, 2, 0).reshape(len(keep_yxs_list), self.pts_num, 2, 2)
+        offsets = offsets * self.offset_expand
+        ori_yx = yx.astype(np.float32)[:, :, None, :]
+        point_pairs = (ori_yx + offsets)[..., ::-1] * 4.0 / np.array([ratio_w, ratio_h])
+
+        # point_pair2poly: top points left to right, then bottom points right to left
+        polys = np.concatenate([point_pairs[:, :, 0], point_pairs[:, ::-1, 1]], axis=1)
+        polys = [expand_poly_along_width(poly, shrink_ratio_of_width=0.2) for poly in polys]
+        polys = np.array(polys)
+        polys[..., 0] = np.clip(polys[..., 0], a_min=0, a_max=src_w)
+        polys[..., 1] = np.clip(polys[..., 1], a_min=0, a_max=src_h)
+
+        if self.valid_set == "partvgg":
+            middle_point = polys.shape[1] // 2
+            polys = polys[:, [0, middle_point - 1, middle_point, -1], :]
+        return list(polys)
+
+    def __call__(self, preds, shape_list):
+        """
+        Decode the outputs of one image.
+
+        Args:
+            preds (dict): f_border, f_char, f_direction and f_score with a batch dimension of 1.
+            shape_list (np.ndarray): [[src_h, src_w, ratio_h, ratio_w]] from E2EResizeForTest.
+
+        Returns:
+            dict: {"points": list of polygons, "texts": list of strings}
+        """
+        p_score = preds["f_score"][0]
+        p_border = preds["f_border"][0]
+        p_char = preds["f_char"][0]
+        p_direction = preds["f_direction"][0]
+        src_h, src_w, ratio_h, ratio_w = shape_list[0]
+
+        all_pos_yxs = self.center_lines(p_score, p_direction)
+        keep_yxs_list, texts = self.decode(all_pos_yxs, p_char)
+        points = self.restore_polys(keep_yxs_list, p_border, ratio_w, ratio_h, src_w, src_h)
+        return {"points": points, "texts": texts}
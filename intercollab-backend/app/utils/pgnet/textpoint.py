@@ -0,0 +1,207 @@
+# intercollab-backend/app/utils/pgnet/textpoint.py
+#
+# The pieces of paddleocr's ppocr/utils/e2e_utils/extract_textpoint_fast.py (Apache-2.0)
+# and scikit-image's morphology.thin (BSD-3-Clause) that PGNet post-processing needs,
+# so serving does not have to import paddle or scikit-image. Outputs are identical to
+# the originals; `python -m app.utils.check_parity` compares them when paddleocr is
+# installed.
+import cv2
+import numpy as np
+
+
+def _generate_thin_luts():
+    """
+    Build the deletion lookup tables of the two Guo-Hall sub-iterations.
+
+    Same conditions as scikit-image's _generate_thin_luts. Bit i of the table index
+    is the i-th neighbour, starting east and going counter-clockwise (see _THIN_MASK).
+    """
+    def bits(n):
+        return [bool(n >> i & 1) for i in range(9)]
+
+    def g1(b):
+        return sum(1 for i in (0, 2, 4, 6) if not b[i] and (b[i + 1] or b[(i + 2) % 8])) == 1
+
+    def g2(b):
+        n1 = sum(1 for k in (1, 3, 5, 7) if b[k] or b[k - 1])
+        n2 = sum(1 for k in (1, 3, 5, 7) if b[k] or b[(k + 1) % 8])
+        return min(n1, n2) in (2, 3)
+
+    def g3(b):
+        return not ((b[1] or b[2] or not b[7]) and b[0])
+
+    def g3p(b):
+        return not ((b[5] or b[6] or not b[3]) and b[4])
+
+    neighbourhoods = [bits(n) for n in range(256)]
+    g123 = np.array([g1(b) and g2(b) and g3(b) for b in neighbourhoods], dtype=bool)
+    g123p = np.array([g1(b) and g2(b) and g3p(b) for b in neighbourhoods], dtype=bool)
+    return g123, g123p
+
+
+G123_LUT, G123P_LUT = _generate_thin_luts()
+_THIN_MASK = np.array([[8, 4, 2], [16, 0, 1], [32, 64, 128]], dtype=np.float32)
+
+
+def thin(image):
+    """
+    Morphological thinning (Guo-Hall), the same skeleton as skimage.morphology.thin.
+
+    Args:
+        image (np.ndarray): 2D binary image; nonzero pixels are foreground.
+
+    Returns:
+        np.ndarray: The thinned image as bool.
+    """
+    skel = (np.asarray(image) != 0).astype(np.uint8)
+    n_pts_old, n_pts_new = -1, int(skel.sum())
+    while n_pts_old != n_pts_new:
+        n_pts_old = n_pts_new
+        for lut in (G123_LUT, G123P_LUT):
+            # Correlate with the neighbourhood mask (zeros outside the image), then
+            # look up the deletion decision for every pixel's neighbourhood
+            neighbourhood = cv2.filter2D(skel, cv2.CV_16S, _THIN_MASK, borderType=cv2.BORDER_CONSTANT)
+            skel[lut[neighbourhood]] = 0
+        n_pts_new = int(skel.sum())
+    return skel.astype(bool)
+
+
+def _sort_part_with_direction(pos_list, point_direction):
+    pos_list = np.array(pos_list).reshape(-1, 2)
+    point_direction = np.array(point_direction).reshape(-1, 2)
+    average_direction = np.mean(point_direction, axis=0, keepdims=True)
+    pos_proj_leng = np.sum(pos_list * average_direction, axis=1)
+    order = np.argsort(pos_proj_leng)
+    return pos_list[order].tolist(), point_direction[order].tolist()
+
+
+def sort_with_direction(pos_list, f_direction):
+    """
+    Sort center line points along the predicted reading direction.
+
+    Args:
+        pos_list (list): [(y, x), ...] points of one instance.
+        f_direction (np.ndarray): Direction map, shape [H, W, 2] (x, y).
+
+    Returns:
+        (tuple): (sorted points, their (y, x) directions as an ndarray)
+    """
+    pos_list = np.array(pos_list).reshape(-1, 2)
+    point_direction = f_direction[pos_list[:, 0], pos_list[:, 1]]
+    point_direction = point_direction[:, ::-1]  # x, y -> y, x
+    sorted_point, sorted_direction = _sort_part_with_direction(pos_list, point_direction)
+
+    point_num = len(sorted_point)
+    if point_num >= 16:
+        # Re-sort each half with its own average direction, for curved text
+        middle_num = point_num // 2
+        first_point, first_direction = _sort_part_with_direction(
+            sorted_point[:middle_num], sorted_direction[:middle_num]
+        )
+        last_point, last_direction = _sort_part_with_direction(
+            sorted_point[middle_num:], sorted_direction[middle_num:]
+        )
+        sorted_point = first_point + last_point
+        sorted_direction = first_direction + last_direction
+
+    return sorted_point, np.array(sorted_direction)
+
+
+def _extend(start, step, count, h, w, binary_tcl_map):
+    """Walk from `start` in `step`s while the pixels stay on the text center line."""
+    points = []
+    for i in range(count):
+        y, x = np.round(start + step * (i + 1)).flatten().astype("int32").tolist()
+        if y < h and x < w and (y, x) not in points:
+            if binary_tcl_map[y, x] > 0.5:
+                points.append((y, x))
+            else:
+                break
+    return points
+
+
+def sort_and_expand_with_direction_v2(pos_list, f_direction, binary_tcl_map):
+    """
+    Sort an instance's center line and extend both ends along the text direction.
+
+    Args:
+        pos_list (list): [(y, x), ...] points of one instance.
+        f_direction (np.ndarray): Direction map, shape [H, W, 2].
+        binary_tcl_map (np.ndarray): Text center line map, shape [H, W]; extension
+            stops at the first point that is not on it.
+
+    Returns:
+        list: The sorted and extended points.
+    """
+    h, w, _ = f_direction.shape
+    sorted_list, point_direction = sort_with_direction(pos_list, f_direction)
+
+    point_num = len(sorted_list)
+    sub_direction_len = max(point_num // 3, 2)
+    left_direction = point_direction[:sub_direction_len, :]
+    right_direction = point_direction[point_num - sub_direction_len:, :]
+
+    left_average_direction = -np.mean(left_direction, axis=0, keepdims=True)
+    left_average_len = np.linalg.norm(left_average_direction)
+    left_start = np.array(sorted_list[0])
+    left_step = left_average_direction / (left_average_len + 1e-6)
+
+    right_average_direction = np.mean(right_direction, axis=0, keepdims=True)
+    right_average_len = np.linalg.norm(right_average_direction)
+    right_step = right_average_direction / (right_average_len + 1e-6)
+    right_start = np.array(sorted_list[-1])
+
+    append_num = max(int((left_average_len + right_average_len) / 2.0 * 0.15), 1)
+    max_append_num = 2 * append_num
+
+    left_list = _extend(left_start, left_step, max_append_num, h, w, binary_tcl_map)
+    right_list = _extend(right_start, right_step, max_append_num, h, w, binary_tcl_map)
+    return left_list[::-1] + sorted_list + right_list
+
+
+def shrink_quad_along_width(quad, begin_width_ratio=0.0, end_width_ratio=1.0):
+    ratio_pair = np.array([[begin_width_ratio], [end_width_ratio]], dtype=np.float32)
+    p0_1 = quad[0] + (quad[1] - quad[0]) * ratio_pair
+    p3_2 = quad[3] + (quad[2] - quad[3]) * ratio_pair
+    return np.array([p0_1[0], p0_1[1], p3_2[1], p3_2[0]])
+
+
+def expand_poly_along_width(poly, shrink_ratio_of_width=0.3):
+    """
+    Push the left and right ends of a polygon outwards, in place.
+
+    The ends move by `shrink_ratio_of_width` times the polygon's height there.
+
+    Args:
+        poly (np.ndarray): Polygon with an even number of points, shape [points, 2].
+        shrink_ratio_of_width (float): How far to expand, relative to the height.
+
+    Returns:
+        np.ndarray: `poly`, expanded.
+    """
+    point_num = poly.shape[0]
+    left_quad = np.array([poly[0], poly[1], poly[-2], poly[-1]], dtype=np.float32)
+    left_ratio = (
+        -shrink_ratio_of_width
+        * np.linalg.norm(left_quad[0] - left_quad[3])
+        / (np.linalg.norm(left_quad[0] - left_quad[1]) + 1e-6)
+    )
+    left_quad_expand = shrink_quad_along_width(left_quad, left_ratio, 1.0)
+    right_quad = np.array(
+        [
+            poly[point_num // 2 - 2],
+            poly[point_num // 2 - 1],
+            poly[point_num // 2],
+            poly[point_num // 2 + 1],
+        ],
+        dtype=np.float32,
+    )
+    right_ratio = 1.0 + shrink_ratio_of_width * np.linalg.norm(
+        right_quad[0] - right_quad[3]
+    ) / (np.linalg.norm(right_quad[0] - right_quad[1]) + 1e-6)
+    right_quad_expand = shrink_quad_along_width(right_quad, 0.0, right_ratio)
+    poly[0] = left_quad_expand[0]
+    poly[-1] = left_quad_expand[-1]
+    poly[point_num // 2 - 1] = right_quad_expand[1]
+    poly[point_num // 2] = right_quad_expand[2]
+    return poly
@@ -0,0 +1,58 @@
+# intercollab-backend/app/utils/pgnet/transforms.py
+#
+# In-tree versions of the paddleocr test-time transforms PGNet uses (E2EResizeForTest,
+# NormalizeImage, ToCHWImage, KeepKeys from ppocr/data/imaug/operators.py, Apache-2.0).
+# They give the same arrays, without importing paddle.
+import cv2
+import numpy as np
+
+
+MAX_STRIDE = 128
+
+
+def e2e_resize_for_test(img, max_side_len=768, valid_set="totaltext"):
+    """
+    Resize an image so both sides are multiples of 128, like paddleocr's E2EResizeForTest.
+
+    Args:
+        img (np.ndarray): The BGR image, shape [H, W, 3].
+        max_side_len (int): "totaltext" caps the height, "partvgg" scales the longer side to it.
+        valid_set (str): "totaltext" or "partvgg".
+
+    Returns:
+        (tuple): (resized image, np.array([src_h, src_w, ratio_h, ratio_w]))
+    """
+    h, w, _ = img.shape
+    if valid_set == "totaltext":
+        ratio = 1.25
+        if h * ratio > max_side_len:
+            ratio = float(max_side_len) / h
+    else:
+        ratio = float(max_side_len) / max(h, w)
+    resize_h = int(h * ratio)
+    resize_w = int(w * ratio)
+
+    resize_h = (resize_h + MAX_STRIDE - 1) // MAX_STRIDE * MAX_STRIDE
+    resize_w = (resize_w + MAX_STRIDE - 1) // MAX_STRIDE * MAX_STRIDE
+    resized = cv2.resize(img, (int(resize_w), int(resize_h)))
+    return resized, np.array([h, w, resize_h / float(h), resize_w / float(w)])
+
+
+class NormalizeImage:
+    """(img * scale - mean) / std in float32, per channel of an HWC image."""
+
+    def __init__(self, scale=1.0 / 255.0, mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)):
+        self.scale = np.float32(scale)
+        self.mean = np.array(mean).reshape((1, 1, 3)).astype("float32")
+        self.std = np.array(std).reshape((1, 1, 3)).astype("float32")
+
+    def __call__(self, img):
+        return (img.astype("float32") * self.scale - self.mean) / self.std
+
+
+normalize_image = NormalizeImage()
+
+
+def to_chw(img):
+    """Transpose an HWC image to CHW."""
+    return img.transpose((2, 0, 1))
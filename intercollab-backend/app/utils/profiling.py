@@ -0,0 +1,90 @@
+# intercollab-backend/app/utils/profiling.py
+import logging
+import os
+import threading
+
+import onnxruntime
+
+from app.config import config
+from app.utils.session_registry import build_session_options, get_providers
+
+
+logger = logging.getLogger(__name__)
+
+
+class OrtProfiler:
+    """
+    Runs the next N recognitions of one model on a session with onnxruntime's profiler enabled.
+
+    ORT can only profile a session created with profiling on, so starting a run
+    builds a dedicated session; once N requests have used it, the trace (a Chrome
+    trace-event JSON with per-node timings) is written to PGNET_PROFILE_DIR.
+    Recognitions of other models keep using their own sessions.
+    """
+
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir or config.PGNET_PROFILE_DIR
+        self._lock = threading.Lock()
+        self._sess = None
+        self._model_path = None
+        self._starting = False
+        self._remaining = 0
+        self._in_use = 0
+        self.traces = []
+
+    def start(self, model_path, cpu, requests):
+        """Profile the next `requests` recognitions of the model at `model_path`."""
+        with self._lock:
+            if self._sess is not None or self._starting:
+                raise RuntimeError("A profiling run is already in progress")
+            self._starting = True
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            options = build_session_options()
+            options.enable_profiling = True
+            options.profile_file_prefix = os.path.join(self.profile_dir, "pgnet")
+            sess = onnxruntime.InferenceSession(model_path, sess_options=options, providers=get_providers(cpu))
+        finally:
+            with self._lock:
+                self._starting = False
+        with self._lock:
+            self._sess = sess
+            self._model_path = model_path
+            self._remaining = requests
+        logger.info("Profiling the next %d recognitions of %s", requests, model_path)
+
+    def acquire(self, model_path):
+        """The profiling session if `model_path` is being profiled and requests remain, else None."""
+        with self._lock:
+            if self._sess is None or self._remaining <= 0 or self._model_path != model_path:
+                return None
+            self._remaining -= 1
+            self._in_use += 1
+            return self._sess
+
+    def release(self, sess):
+        """Hand a session back; the trace is written once the last profiled request is done."""
+        with self._lock:
+            self._in_use -= 1
+            if self._remaining > 0 or self._in_use > 0 or self._sess is not sess:
+                return
+            self._sess = None
+        trace = sess.end_profiling()
+        with self._lock:
+            self.traces.append(trace)
+        logger.info("Wrote onnxruntime profile to %s", trace)
+
+    def status(self):
+        with self._lock:
+            return {
+                "active": self._sess is not None or self._starting,
+                "model_path": self._model_path,
+                "remaining": self._remaining,
+                "profile_dir": self.profile_dir,
+                "traces": list(self.traces),
+            }
+
+
+# Shared by the whole process. Only recognitions that run in the serving process (the
+# thread executor) are profiled; process-pool workers keep using their own sessions.
+ort_profiler = OrtProfiler()
@@ -1,135 +1,170 @@
-# intercollab-backend/app/utils/quantize_model.py
-import os
-import numpy as np
-import cv2
-import tempfile
-from quark.onnx.quantization.config import Config, get_default_config
-from quark.onnx import ModelQuantizer
-from onnxruntime.quantization import CalibrationDataReader
-
-
-class PGNetCalibrationDataReader(CalibrationDataReader):
-    """Custom calibration data reader for PGNet model."""
-    def __init__(self, sample_images_dir, batch_size=1):
-        """Initialize with directory containing sample images for calibration."""
-        super().__init__()
-        self.image_dir = sample_images_dir
-        self.batch_size = batch_size
-        self.image_list = [os.path.join(sample_images_dir, f) for f in os.listdir(sample_images_dir) 
-                          if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-        self.current_index = 0
-        
-    def get_next(self):
-        """Get the next batch of images for calibration."""
-        if self.current_index >= len(self.image_list):
-            return None
-            
-        batch_images = []
-        for _ in range(self.batch_size):
-            if self.current_index >= len(self.image_list):
-                break
-                
-            # Process single image similar to PGNetPredictor's preprocess method
-            img_path = self.image_list[self.current_index]
-            img = cv2.imread(img_path)
-            
-            # Basic preprocessing (resize to fixed size)
-            img = cv2.resize(img, (768, 768))
-            img = img.astype(np.float32) / 255.0
-            
-            # Normalize (ensure all arrays are float32)
-            mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
-            std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
-            img = (img - mean) / std
-            
-            # Convert to NCHW format
-            img = np.transpose(img, (2, 0, 1))
-            
-            # Add batch dimension and ensure float32
-            img = np.expand_dims(img, axis=0).astype(np.float32)
-            batch_images.append(img)
-            self.current_index += 1
-            
-        if not batch_images:
-            return None
-            
-        # If only one image, return it directly
-        if len(batch_images) == 1:
-            return {"x": batch_images[0]}
-            
-        # Otherwise, concatenate the batch and ensure float32
-        batched_input = np.concatenate(batch_images, axis=0).astype(np.float32)
-        return {"x": batched_input}
-
-
-def quantize_pgnet_model(input_model_path=None, output_model_path=None, calibration_data_dir=None):
-    """
-    Quantize PGNet ONNX model.
-    
-    Args:
-        input_model_path (str): Path to the original pgnet.onnx model.
-        output_model_path (str): Path where the quantized model will be saved.
-        calibration_data_dir (str): Directory containing images for calibration.
-        
-    Returns:
-        str: Path to the quantized model.
-    """
-    # Get the directory of the current script for absolute path resolution
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Use default paths if not provided, with proper absolute path resolution
-    if input_model_path is None:
-        input_model_path = os.path.join(current_dir, "pgnet.onnx")
-    
-    if output_model_path is None:
-        # Save in the same directory as input
-        output_model_path = os.path.join(current_dir, "pgnet2.onnx")
-    
-    # Print debug information
-    print(f"Current directory: {current_dir}")
-    print(f"Input model path: {input_model_path}")
-    print(f"Output model path: {output_model_path}")
-    print(f"Model exists: {os.path.exists(input_model_path)}")
-    
-    if not os.path.exists(input_model_path):
-        raise FileNotFoundError(f"Model file not found at {input_model_path}")
-    
-    # Use a temp directory with sample images if no calibration data provided
-    temp_dir = None
-    if calibration_data_dir is None:
-        # Create temp directory for calibration images
-        temp_dir = tempfile.TemporaryDirectory()
-        calibration_data_dir = temp_dir.name
-        
-        # Create at least one sample image for calibration
-        # This is a dummy image, in a real scenario you should use real training data
-        sample_img = np.zeros((768, 768, 3), dtype=np.uint8)
-        cv2.imwrite(os.path.join(calibration_data_dir, "sample.jpg"), sample_img)
-    
-    try:
-        # Create calibration data reader
-        dr = PGNetCalibrationDataReader(calibration_data_dir)
-        
-        # Get quantization configuration
-        quant_config = get_default_config("XINT8")
-        config = Config(global_quant_config=quant_config)
-        print(f"The configuration for quantization is {config}")
-        
-        # Create an ONNX quantizer
-        quantizer = ModelQuantizer(config)
-        
-        # Quantize the ONNX model
-        quantizer.quantize_model(input_model_path, output_model_path, dr)
-        
-        print(f'Calibrated and quantized model saved at: {output_model_path}')
-        return output_model_path
-    
-    finally:
-        # Clean up temporary directory if we created one
-        if temp_dir:
-            temp_dir.close()
-
-
-if __name__ == "__main__":
-    # Example usage:
-    quantize_pgnet_model()
\ No newline at end of file
+# intercollab-backend/app/utils/quantize_model.py
+import argparse
+import os
+import numpy as np
+from quark.onnx.quantization.config import Config, get_default_config
+from quark.onnx import ModelQuantizer
+from onnxruntime.quantization import CalibrationDataReader
+
+from app.utils.image_sets import list_images, stream_map
+from app.utils.inference_pgnet import decode_image, preprocess_image
+
+
+class PGNetCalibrationDataReader(CalibrationDataReader):
+    """
+    Calibration data reader for the PGNet model.
+    
+    Images go through the same `preprocess_image` pipeline (E2EResizeForTest and
+    NormalizeImage) that PGNetPredictor uses when serving, so activation ranges are
+    collected at real input resolutions and normalization. Images are decoded and
+    preprocessed on a thread pool and streamed, so large calibration sets are never
+    held in memory at once.
+    """
+    def __init__(self, sample_images_dir, batch_size=1, workers=4, prefetch=8, max_images=None, input_name="x"):
+        """
+        Initialize with directory containing sample images for calibration.
+        
+        Args:
+            sample_images_dir (str): Directory with calibration images (searched recursively).
+            batch_size (int): Images per calibration batch. Only images that preprocess
+                to the same shape are batched together.
+            workers (int): Threads decoding and preprocessing images.
+            prefetch (int): How many preprocessed images may be buffered ahead.
+            max_images (int, optional): Only use the first `max_images` images.
+            input_name (str): Name of the model input.
+        """
+        super().__init__()
+        self.image_dir = sample_images_dir
+        self.batch_size = batch_size
+        self.workers = workers
+        self.prefetch = max(prefetch, batch_size)
+        self.input_name = input_name
+        self.image_list = list_images(sample_images_dir)[:max_images]
+        if not self.image_list:
+            raise ValueError(f"No calibration images found in {sample_images_dir}")
+        self.rewind()
+    
+    def _load(self, img_path):
+        """Decode and preprocess one image exactly like PGNetPredictor.preprocess."""
+        try:
+            img, _ = preprocess_image(decode_image(img_path))
+            return img.astype(np.float32)
+        except Exception as e:
+            print(f"Skipping calibration image {img_path}: {str(e)}")
+            return None
+    
+    def _batches(self):
+        batch_images = []
+        for img in stream_map(self._load, self.image_list, self.workers, self.prefetch):
+            if img is None:
+                continue
+            # Inputs of different sizes cannot share a batch
+            if batch_images and (len(batch_images) >= self.batch_size or img.shape != batch_images[0].shape):
+                yield np.concatenate(batch_images, axis=0)
+                batch_images = []
+            batch_images.append(img)
+        if batch_images:
+            yield np.concatenate(batch_images, axis=0)
+    
+    def get_next(self):
+        """Get the next batch of images for calibration."""
+        batch = next(self._iterator, None)
+        if batch is None:
+            return None
+        return {self.input_name: batch}
+    
+    def rewind(self):
+        """Start again from the first image."""
+        self._iterator = self._batches()
+
+
+def quantize_pgnet_model(
+    input_model_path=None,
+    output_model_path=None,
+    calibration_data_dir=None,
+    batch_size=1,
+    workers=4,
+    max_images=None
+):
+    """
+    Quantize PGNet ONNX model.
+    
+    Args:
+        input_model_path (str): Path to the original pgnet.onnx model.
+        output_model_path (str): Path where the quantized model will be saved.
+        calibration_data_dir (str): Directory containing representative whiteboard
+            images for calibration (required).
+        batch_size (int): Images per calibration batch.
+        workers (int): Threads loading calibration images.
+        max_images (int, optional): Cap on the number of calibration images.
+        
+    Returns:
+        str: Path to the quantized model.
+    """
+    # Get the directory of the current script for absolute path resolution
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # Use default paths if not provided, with proper absolute path resolution
+    if input_model_path is None:
+        input_model_path = os.path.join(current_dir, "pgnet.onnx")
+    
+    if output_model_path is None:
+        # Save in the same directory as input
+        output_model_path = os.path.join(current_dir, "pgnet2.onnx")
+    
+    # Print debug information
+    print(f"Current directory: {current_dir}")
+    print(f"Input model path: {input_model_path}")
+    print(f"Output model path: {output_model_path}")
+    print(f"Model exists: {os.path.exists(input_model_path)}")
+    
+    if not os.path.exists(input_model_path):
+        raise FileNotFoundError(f"Model file not found at {input_model_path}")
+    
+    # Calibrating on a synthetic image gives activation ranges real frames never hit
+    if calibration_data_dir is None:
+        raise ValueError(
+            "calibration_data_dir is required: use a few hundred representative whiteboard images"
+        )
+    
+    # Create calibration data reader
+    dr = PGNetCalibrationDataReader(
+        calibration_data_dir, batch_size=batch_size, workers=workers, max_images=max_images
+    )
+    print(f"Calibrating on {len(dr.image_list)} images from {calibration_data_dir}")
+    
+    # Get quantization configuration
+    quant_config = get_default_config("XINT8")
+    config = Config(global_quant_config=quant_config)
+    print(f"The configuration for quantization is {config}")
+    
+    # Create an ONNX quantizer
+    quantizer = ModelQuantizer(config)
+    
+    # Quantize the ONNX model
+    quantizer.quantize_model(input_model_path, output_model_path, dr)
+    
+    print(f'Calibrated and quantized model saved at: {output_model_path}')
+    return output_model_path
+
+
+if __name__ == "__main__":
+    # Example usage (from intercollab-backend):
+    #   python -m app.utils.quantize_model path/to/calibration_images --max-images 500
+    parser = argparse.ArgumentParser(description="Quantize PGNet to XINT8 with Quark")
+    parser.add_argument("calibration_data_dir", type=str, help="directory of representative images")
+    parser.add_argument("--input", type=str, default=None, help="fp32 model path (default: app/utils/pgnet.onnx)")
+    parser.add_argument("--output", type=str, default=None, help="quantized model path (default: app/utils/pgnet2.onnx)")
+    parser.add_argument("--batch-size", type=int, default=1, help="images per calibration batch")
+    parser.add_argument("--workers", type=int, default=4, help="threads loading calibration images")
+    parser.add_argument("--max-images", type=int, default=None, help="use at most this many images")
+    args = parser.parse_args()
+    
+    quantize_pgnet_model(
+        input_model_path=args.input,
+        output_model_path=args.output,
+        calibration_data_dir=args.calibration_data_dir,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        max_images=args.max_images
+    )
\ No newline at end of file
@@ -0,0 +1,174 @@
+# intercollab-backend/app/utils/rendering.py
+import base64
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from app.config import config
+
+
+# inline: annotated image embedded in the response as a data URL
+# boxes:  polygons and texts only, the client draws them
+# lazy:   polygons and texts plus a result id; the image is rendered on request
+RENDER_MODES = ("inline", "boxes", "lazy")
+
+IMAGE_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", "image/png", None),
+}
+
+
+def check_render_options(render_mode=None, image_format=None):
+    """Fill in the configured defaults and reject unknown modes and formats."""
+    render_mode = (render_mode or config.RENDER_MODE).lower()
+    image_format = (image_format or config.RENDER_FORMAT).lower()
+    if image_format == "jpg":
+        image_format = "jpeg"
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode: {render_mode}")
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {image_format}")
+    return render_mode, image_format
+
+
+def preview_frame(frame, text_boxes, max_side=None):
+    """
+    Downscale a frame so its longest side is at most `max_side` (0 keeps it as is).
+
+    Returns:
+        (tuple): (frame, boxes) with the boxes scaled to the returned frame.
+    """
+    max_side = config.RENDER_MAX_SIDE if max_side is None else max_side
+    height, width = frame.shape[:2]
+    scale = max_side / max(height, width) if max_side else 1.0
+    if scale >= 1.0:
+        return frame, text_boxes
+    size = (max(int(round(width * scale)), 1), max(int(round(height * scale)), 1))
+    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return frame, [np.asarray(box, dtype=np.float32) * scale for box in text_boxes]
+
+
+def draw_annotations(image, text_boxes, recognized_texts):
+    """Draw bounding boxes and texts on the image in place (similar to PGNetPredictor.draw)."""
+    width = image.shape[1]
+    for box, text_str in zip(text_boxes, recognized_texts):
+        box = np.asarray(box).astype(np.int32).reshape((-1, 1, 2))
+        cv2.polylines(image, [box], True, color=(255, 255, 0), thickness=2)
+
+        # Write text near the box
+        cv2.putText(
+            image,
+            text_str,
+            org=(int(box[0, 0, 0]), int(box[0, 0, 1])),
+            fontFace=cv2.FONT_HERSHEY_COMPLEX,
+            fontScale=0.7 / 400 * width / 2,
+            color=(0, 0, 0),
+            thickness=int(1 / 1000 * width),
+        )
+    return image
+
+
+def encode_image(image, image_format=None, quality=None):
+    """
+    Encode an image with the chosen encoder.
+
+    Args:
+        image (np.ndarray): BGR image.
+        image_format (str, optional): "jpeg", "webp" or "png".
+        quality (int, optional): 1-100 for JPEG and WebP; ignored for PNG.
+
+    Returns:
+        (tuple): (encoded bytes, media type)
+    """
+    _, image_format = check_render_options(image_format=image_format)
+    ext, media_type, quality_flag = IMAGE_FORMATS[image_format]
+    params = []
+    if quality_flag is not None:
+        params = [quality_flag, int(quality or config.RENDER_QUALITY)]
+    ok, buffer = cv2.imencode(ext, image, params)
+    if not ok:
+        raise ValueError(f"Could not encode image as {image_format}")
+    return buffer.tobytes(), media_type
+
+
+def to_data_url(data, media_type):
+    return f"data:{media_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def render_annotations(frame, text_boxes, recognized_texts, max_side=None, image_format=None, quality=None):
+    """
+    Draw the results on a (possibly downscaled) frame and encode it.
+
+    The frame is downscaled before drawing, so both drawing and encoding only
+    touch preview-sized pixels. A full-size frame is drawn on in place.
+
+    Returns:
+        (tuple): (encoded bytes, media type)
+    """
+    image, boxes = preview_frame(frame, text_boxes, max_side)
+    draw_annotations(image, boxes, recognized_texts)
+    return encode_image(image, image_format, quality)
+
+
+def boxes_payload(text_boxes, recognized_texts):
+    """Structured results for clients that draw the annotations themselves."""
+    return [
+        {"points": np.asarray(box).round(1).tolist(), "text": text}
+        for box, text in zip(text_boxes, recognized_texts)
+    ]
+
+
+class AnnotatedImageStore:
+    """
+    Bounded LRU + TTL store of results whose annotated image is rendered on request.
+
+    Entries keep the encoded upload and its `boxes_payload`, not a rendered image; the
+    image is only decoded, drawn and encoded when a client actually fetches it.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None):
+        self.max_entries = config.ANNOTATION_STORE_SIZE if max_entries is None else max_entries
+        self.ttl = config.ANNOTATION_STORE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # result id -> (expires_at, image_bytes, boxes)
+        self.renders = 0
+        self.misses = 0
+
+    def put(self, image_bytes, boxes):
+        """Store an upload with its `boxes_payload` and return the result id."""
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[result_id] = (time.monotonic() + self.ttl, bytes(image_bytes), boxes)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result_id
+
+    def get(self, result_id):
+        """Return (image_bytes, boxes), or None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(result_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(result_id)
+            self.renders += 1
+            return entry[1:]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "renders": self.renders,
+                "misses": self.misses,
+            }
+
+
+# Lives in the serving process, so lazy results work with either executor kind
+annotation_store = AnnotatedImageStore()
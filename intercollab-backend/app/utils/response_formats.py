@@ -0,0 +1,204 @@
+# intercollab-backend/app/utils/response_formats.py
+import gzip
+import json
+
+import numpy as np
+from fastapi.responses import Response
+
+from app.config import config
+from app.utils.rendering import to_data_url
+
+
+# json:    the regular response (annotated image as a data URL, boxes as nested lists)
+# compact: JSON with every polygon as one flat integer array [x0, y0, x1, y1, ...]
+# msgpack: MessagePack with polygons as packed little-endian int16 (or float32)
+#          buffers and the annotated image as raw bytes
+MEDIA_TYPES = {
+    "json": "application/json",
+    "compact": "application/vnd.intercollab.compact+json",
+    "msgpack": "application/msgpack",
+}
+_ACCEPTED = {
+    "application/json": "json",
+    "application/vnd.intercollab.compact+json": "compact",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+}
+
+INT16_MAX = np.iinfo(np.int16).max
+
+
+class NotAcceptable(ValueError):
+    """None of the media types in the Accept header can be produced."""
+
+
+def msgpack_available():
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def negotiate(accept=None, requested=None):
+    """
+    Pick the response format from an Accept header (or an explicit format name).
+
+    Args:
+        accept (str, optional): The Accept header; missing or */* gives "json".
+        requested (str, optional): "json", "compact" or "msgpack", e.g. from a
+            WebSocket query parameter; takes precedence over `accept`.
+
+    Returns:
+        str: "json", "compact" or "msgpack".
+
+    Raises:
+        NotAcceptable: No acceptable format can be produced (msgpack needs the `msgpack` package).
+    """
+    if requested:
+        if requested not in MEDIA_TYPES:
+            raise NotAcceptable(f"Unknown response format: {requested}")
+        if requested == "msgpack" and not msgpack_available():
+            raise NotAcceptable("MessagePack responses need the msgpack package")
+        return requested
+    if not accept:
+        return "json"
+
+    choices = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        media_type = media_type.lower()
+        if media_type in ("*/*", "application/*"):
+            name = "json"
+        elif media_type in _ACCEPTED:
+            name = _ACCEPTED[media_type]
+        else:
+            continue
+        if name == "msgpack" and not msgpack_available():
+            continue
+        choices.append((-quality, position, name))
+    if not choices:
+        raise NotAcceptable(f"None of the accepted media types can be produced: {accept}")
+    return min(choices)[2]
+
+
+def pack_polygons(polygons):
+    """
+    Pack polygons into one flat buffer plus the number of points of each.
+
+    Coordinates are rounded to int16 when they fit (images up to 32767 pixels a
+    side), otherwise they are kept as float32.
+
+    Returns:
+        dict: {"dtype": "int16" | "float32", "counts": [...], "data": bytes}
+    """
+    counts = [len(polygon) for polygon in polygons]
+    points = (
+        np.concatenate([np.asarray(polygon, dtype=np.float32).reshape(-1, 2) for polygon in polygons])
+        if polygons else np.zeros((0, 2), dtype=np.float32)
+    )
+    if len(points) == 0 or (np.abs(points).max() <= INT16_MAX):
+        data, dtype = np.rint(points).astype("<i2"), "int16"
+    else:
+        data, dtype = points.astype("<f4"), "float32"
+    return {"dtype": dtype, "counts": counts, "data": data.tobytes()}
+
+
+def _flat_ints(points):
+    return np.rint(np.asarray(points, dtype=np.float32)).astype(np.int32).ravel().tolist()
+
+
+def compact_result(result):
+    """
+    The result with polygons as flat integer arrays and texts next to them.
+
+    "boxes" becomes "polygons" and "texts"; line points become flat arrays too.
+    """
+    compact = {key: value for key, value in result.items() if key not in ("boxes", "annotated_image_type")}
+    if "boxes" in result:
+        compact["polygons"] = [_flat_ints(box["points"]) for box in result["boxes"]]
+        compact["texts"] = [box["text"] for box in result["boxes"]]
+    if "lines" in result:
+        compact["lines"] = [{**line, "points": _flat_ints(line["points"])} for line in result["lines"]]
+    if isinstance(result.get("annotated_image"), (bytes, bytearray)):
+        compact["annotated_image"] = to_data_url(result["annotated_image"], result["annotated_image_type"])
+    return compact
+
+
+def binary_result(result):
+    """The result with polygons as packed buffers, for MessagePack."""
+    packed = {key: value for key, value in result.items() if key not in ("boxes", "lines")}
+    if "boxes" in result:
+        packed["polygons"] = pack_polygons([box["points"] for box in result["boxes"]])
+        packed["texts"] = [box["text"] for box in result["boxes"]]
+    if "lines" in result:
+        lines = result["lines"]
+        packed["lines"] = {
+            "ids": [line["id"] for line in lines],
+            "texts": [line["text"] for line in lines],
+            "status": [line["status"] for line in lines],
+            "polygons": pack_polygons([line["points"] for line in lines]),
+        }
+        if any("translation" in line for line in lines):
+            packed["lines"]["translations"] = [line.get("translation") for line in lines]
+    return packed
+
+
+def serialize(result, response_format):
+    """
+    Encode a recognition result in the negotiated format.
+
+    Args:
+        result (dict): The endpoint's result; with "compact" and "msgpack" it should
+            come from `get_text_prediction(..., structured=True)`.
+        response_format (str): "json", "compact" or "msgpack".
+
+    Returns:
+        bytes: The encoded body.
+    """
+    if response_format == "msgpack":
+        import msgpack
+        return msgpack.packb(binary_result(result), use_bin_type=True)
+    if response_format == "compact":
+        result = compact_result(result)
+    elif isinstance(result.get("annotated_image"), (bytes, bytearray)):
+        media_type = result["annotated_image_type"]
+        result = {key: value for key, value in result.items() if key != "annotated_image_type"}
+        result["annotated_image"] = to_data_url(result["annotated_image"], media_type)
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def accepts_gzip(accept_encoding):
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*") and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            return True
+    return False
+
+
+def encode_response(result, response_format, accept_encoding=None, status_code=200):
+    """
+    Build the HTTP response for a result, gzip-compressed when RESPONSE_COMPRESSION is
+    "gzip", the client accepts it and the body is at least RESPONSE_COMPRESSION_MIN_BYTES.
+    """
+    body = serialize(result, response_format)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if (
+        config.RESPONSE_COMPRESSION == "gzip"
+        and len(body) >= config.RESPONSE_COMPRESSION_MIN_BYTES
+        and accepts_gzip(accept_encoding)
+    ):
+        body = gzip.compress(body, compresslevel=config.RESPONSE_COMPRESSION_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, status_code=status_code, media_type=MEDIA_TYPES[response_format], headers=headers)
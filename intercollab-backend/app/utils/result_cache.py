@@ -0,0 +1,187 @@
+# intercollab-backend/app/utils/result_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from app.config import config
+
+
+def image_key(image_bytes):
+    """Exact content hash of the encoded image."""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+def perceptual_hash(frame):
+    """
+    64-bit difference hash (dHash) of a decoded BGR frame.
+
+    The frame is downscaled to 9x8 grayscale and each bit records whether a pixel
+    is brighter than its right neighbour, so re-encoded or slightly noisy captures
+    of the same board hash to (nearly) the same value.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class ResultCache:
+    """
+    Bounded LRU + TTL cache of recognition results, keyed by image content.
+
+    Lookups first try the exact content hash, then (if enabled) any entry whose
+    perceptual hash is within `phash_max_distance` bits. Either way the entry must
+    come from a frame of the same geometry (decoded size and scale), since the
+    cached boxes are in that frame's coordinates. Concurrent misses for the same
+    key are coalesced onto a single computation.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None, phash_max_distance=None):
+        """
+        Args:
+            max_entries (int, optional): LRU capacity (0 disables the cache).
+            ttl_seconds (float, optional): How long an entry stays valid.
+            phash_max_distance (int, optional): Hamming distance for near-duplicate
+                hits; negative disables perceptual matching.
+        """
+        self.max_entries = config.RESULT_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = config.RESULT_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.phash_max_distance = (
+            config.RESULT_CACHE_PHASH_MAX_DISTANCE if phash_max_distance is None else phash_max_distance
+        )
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, phash, value, namespace, geometry)
+        self._in_flight = {}  # key -> Future
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @property
+    def uses_phash(self):
+        return self.enabled and self.phash_max_distance >= 0
+
+    def _get_exact(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _get_near(self, phash, now, namespace, geometry):
+        best_key, best_distance = None, self.phash_max_distance + 1
+        for key, (expires_at, entry_phash, _, entry_namespace, entry_geometry) in self._entries.items():
+            if entry_phash is None or expires_at < now or entry_namespace != namespace:
+                continue
+            if entry_geometry != geometry:
+                continue
+            distance = (phash ^ entry_phash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key]
+
+    def _put(self, key, phash, value, namespace, geometry):
+        self._entries[key] = (time.monotonic() + self.ttl, phash, value, namespace, geometry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute, phash=None, namespace="", geometry=None):
+        """
+        Return the cached value for `key`, or compute it exactly once.
+
+        Args:
+            key (str): Exact content key (see `image_key`).
+            compute (callable): Produces the value on a miss.
+            phash (int, optional): Perceptual hash of the frame for near-duplicate lookups.
+            namespace (str): Keeps results of different models apart, e.g. a model variant.
+            geometry (tuple, optional): Size and decode scale of the frame the value is
+                computed on, e.g. (height, width, scale_x, scale_y); only entries of the
+                same geometry are returned.
+
+        Returns:
+            The cached or freshly computed value.
+        """
+        if not self.enabled:
+            return compute()
+
+        # The same upload decodes at another scale for another preview size
+        key = f"{namespace}:{geometry}:{key}"
+        with self._lock:
+            now = time.monotonic()
+            entry = self._get_exact(key, now)
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+            if phash is not None and self.uses_phash:
+                entry = self._get_near(phash, now, namespace, geometry)
+                if entry is not None:
+                    self.near_hits += 1
+                    return entry[2]
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                # Someone is already computing this exact image; wait for them
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self._in_flight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._put(key, phash, value, namespace, geometry)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Shared by the whole process
+result_cache = ResultCache()
@@ -0,0 +1,173 @@
+# intercollab-backend/app/utils/service_metrics.py
+from app.utils.batching import scheduler_stats
+from app.utils.executor import inference_executor, translation_executor
+from app.utils.incremental import incremental_sessions
+from app.utils.line_tracking import line_trackers
+from app.utils.metrics import metrics
+from app.utils.profiling import ort_profiler
+from app.utils.rendering import annotation_store
+from app.utils.result_cache import result_cache
+from app.utils.session_registry import registry
+from app.utils.tiling import tiled_recognizer
+from app.utils.translation import get_translation_service
+from app.utils.translation_cache import translation_cache
+from app.utils.worker_pool import get_worker_pool
+
+
+def _executor_rows(key):
+    return [((stats["name"],), stats[key]) for stats in (inference_executor.stats(), translation_executor.stats())]
+
+
+def _batcher_rows(key):
+    return [((str(i),), stats[key]) for i, stats in enumerate(scheduler_stats())]
+
+
+def _cache_rows(stats, results):
+    return [((result,), stats[key]) for result, key in results]
+
+
+def _pool_rows(key):
+    pool = get_worker_pool()
+    return [((), pool.stats()[key])] if pool is not None else []
+
+
+def _model_info():
+    return [
+        ((status["model_path"], status["state"], ",".join(status.get("providers") or [])), 1)
+        for status in registry.status()
+    ]
+
+
+def _model_seconds(key):
+    return [((status["model_path"],), status.get(key)) for status in registry.status()]
+
+
+def register_service_metrics(in_flight_requests):
+    """
+    Expose the stats the service already keeps (executors, batching, caches, sessions,
+    models) as Prometheus series. They are read on every scrape.
+
+    Args:
+        in_flight_requests (callable): Returns the number of HTTP requests being served.
+    """
+    metrics.collected(
+        "intercollab_http_requests_in_flight", "HTTP requests currently being served.",
+        collect=lambda: [((), in_flight_requests())],
+    )
+    metrics.collected(
+        "intercollab_executor_in_flight", "Tasks admitted to an executor (running or queued).",
+        label_names=("executor",), collect=lambda: _executor_rows("in_flight"),
+    )
+    metrics.collected(
+        "intercollab_executor_capacity", "Maximum tasks an executor admits (workers + queue).",
+        label_names=("executor",), collect=lambda: _executor_rows("capacity"),
+    )
+    metrics.collected(
+        "intercollab_executor_rejected_total", "Tasks rejected because the executor was saturated.",
+        kind="counter", label_names=("executor",), collect=lambda: _executor_rows("rejected"),
+    )
+    metrics.collected(
+        "intercollab_executor_timed_out_total", "Tasks that missed their deadline.",
+        kind="counter", label_names=("executor",), collect=lambda: _executor_rows("timed_out"),
+    )
+    metrics.collected(
+        "intercollab_batch_queue_depth", "Frames waiting for a micro-batch.",
+        label_names=("scheduler",), collect=lambda: _batcher_rows("queued"),
+    )
+    metrics.collected(
+        "intercollab_batch_frames_total", "Frames run through the micro-batcher.",
+        kind="counter", label_names=("scheduler",), collect=lambda: _batcher_rows("frames"),
+    )
+    metrics.collected(
+        "intercollab_batches_total", "Micro-batches run.",
+        kind="counter", label_names=("scheduler",), collect=lambda: _batcher_rows("batches"),
+    )
+    metrics.collected(
+        "intercollab_result_cache_entries", "Recognition results held in the cache.",
+        collect=lambda: [((), result_cache.stats()["entries"])],
+    )
+    metrics.collected(
+        "intercollab_result_cache_lookups_total", "Recognition cache lookups by outcome.",
+        kind="counter", label_names=("result",),
+        collect=lambda: _cache_rows(result_cache.stats(), (
+            ("hit", "hits"), ("near_hit", "near_hits"), ("miss", "misses"), ("coalesced", "coalesced"),
+        )),
+    )
+    metrics.collected(
+        "intercollab_translation_cache_entries", "Translations held in memory.",
+        collect=lambda: [((), translation_cache.stats()["entries"])],
+    )
+    metrics.collected(
+        "intercollab_translation_cache_lookups_total", "Translation cache lookups by outcome.",
+        kind="counter", label_names=("result",),
+        collect=lambda: _cache_rows(translation_cache.stats(), (
+            ("hit", "hits"), ("disk_hit", "disk_hits"), ("miss", "misses"), ("coalesced", "coalesced"),
+        )),
+    )
+    metrics.collected(
+        "intercollab_translation_cache_hit_ratio", "Share of translation lookups served without calling the provider.",
+        collect=lambda: [((), translation_cache.stats()["hit_ratio"])],
+    )
+    metrics.collected(
+        "intercollab_translation_provider_requests_total", "Calls made to the translation provider.",
+        kind="counter", label_names=("provider",),
+        collect=lambda: [((stats["provider"],), stats["requests"]) for stats in [get_translation_service().stats()]],
+    )
+    metrics.collected(
+        "intercollab_translation_provider_errors_total", "Failed calls to the translation provider.",
+        kind="counter", label_names=("provider",),
+        collect=lambda: [((stats["provider"],), stats["errors"]) for stats in [get_translation_service().stats()]],
+    )
+    metrics.collected(
+        "intercollab_incremental_sessions", "Live incremental recognition sessions.",
+        collect=lambda: [((), incremental_sessions.stats()["sessions"])],
+    )
+    metrics.collected(
+        "intercollab_tracked_lines_total", "Lines of tracked sessions by whether their translation was reused.",
+        kind="counter", label_names=("result",),
+        collect=lambda: _cache_rows(line_trackers.stats(), (("translated", "lines_translated"), ("reused", "lines_reused"))),
+    )
+    metrics.collected(
+        "intercollab_annotation_store_entries", "Results kept for lazy annotated image rendering.",
+        collect=lambda: [((), annotation_store.stats()["entries"])],
+    )
+    metrics.collected(
+        "intercollab_worker_pool_pending", "Frames handed to an inference worker and not answered yet.",
+        label_names=("worker",),
+        collect=lambda: [
+            ((str(worker["index"]),), worker["pending"])
+            for worker in (get_worker_pool().stats()["workers"] if get_worker_pool() else [])
+        ],
+    )
+    metrics.collected(
+        "intercollab_worker_pool_free_slots", "Free frame slots in the shared-memory ring.",
+        collect=lambda: _pool_rows("free_slots"),
+    )
+    metrics.collected(
+        "intercollab_worker_pool_restarts_total", "Inference workers restarted after exiting.",
+        kind="counter", collect=lambda: _pool_rows("restarts"),
+    )
+    metrics.collected(
+        "intercollab_tiled_frames_total", "Large frames recognized tile by tile.",
+        kind="counter", collect=lambda: [((), tiled_recognizer.stats()["frames"])],
+    )
+    metrics.collected(
+        "intercollab_tiles_total", "Tiles recognized for tiled frames.",
+        kind="counter", collect=lambda: [((), tiled_recognizer.stats()["tiles"])],
+    )
+    metrics.collected(
+        "intercollab_model_info", "Loaded ONNX sessions.",
+        label_names=("model_path", "state", "providers"), collect=_model_info,
+    )
+    metrics.collected(
+        "intercollab_model_load_seconds", "Time to build the ONNX session.",
+        label_names=("model_path",), collect=lambda: _model_seconds("load_seconds"),
+    )
+    metrics.collected(
+        "intercollab_model_warmup_seconds", "Time of the warm-up inference.",
+        label_names=("model_path",), collect=lambda: _model_seconds("warmup_seconds"),
+    )
+    metrics.collected(
+        "intercollab_ort_profiling_active", "1 while an onnxruntime profiling run is in progress.",
+        collect=lambda: [((), int(ort_profiler.status()["active"]))],
+    )
@@ -0,0 +1,327 @@
+# intercollab-backend/app/utils/session_registry.py
+import hashlib
+import logging
+import os
+import platform
+import threading
+import time
+
+import numpy as np
+import onnxruntime
+
+from app.config import config
+
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def build_session_options(
+    intra_op_threads=None,
+    inter_op_threads=None,
+    execution_mode=None,
+    graph_optimization_level=None,
+):
+    """
+    Build onnxruntime SessionOptions, falling back to the values in app.config.
+
+    Args:
+        intra_op_threads (int, optional): Threads used inside a single operator (0 = ORT default).
+        inter_op_threads (int, optional): Threads used across operators in parallel mode (0 = ORT default).
+        execution_mode (str, optional): "sequential" or "parallel".
+        graph_optimization_level (str, optional): "disable", "basic", "extended" or "all".
+
+    Returns:
+        onnxruntime.SessionOptions: The configured options.
+    """
+    intra_op_threads = config.ORT_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+    inter_op_threads = config.ORT_INTER_OP_THREADS if inter_op_threads is None else inter_op_threads
+    execution_mode = execution_mode or config.ORT_EXECUTION_MODE
+    graph_optimization_level = graph_optimization_level or config.ORT_GRAPH_OPTIMIZATION_LEVEL
+
+    if execution_mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown ORT execution mode: {execution_mode}")
+    if graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"Unknown ORT graph optimization level: {graph_optimization_level}")
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    options.execution_mode = EXECUTION_MODES[execution_mode]
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization_level]
+    return options
+
+
+def get_providers(cpu):
+    """Return the onnxruntime execution providers for CPU or GPU (CUDA) inference."""
+    if not cpu:
+        return ["CUDAExecutionProvider"]
+    return ["CPUExecutionProvider"]
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hardware_tag():
+    """
+    Identify the CPU for the optimized-model cache.
+
+    Graphs optimized at the "extended"/"all" levels can contain kernels and memory
+    layouts picked for the instruction set of the machine that optimized them.
+    """
+    flags = ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = line
+                    break
+    except OSError:
+        pass
+    return f"{platform.machine()}:{hashlib.sha256(flags.encode()).hexdigest()[:8]}"
+
+
+def optimized_model_path(model_path, options, providers, cache_dir=None):
+    """
+    Where the onnxruntime-optimized copy of a model is cached.
+
+    The name is derived from the model's content hash and everything else that
+    changes the optimized graph: optimization level, execution providers, the
+    onnxruntime version and the CPU.
+
+    Returns:
+        str: The cache file path, or None when the cache is off.
+    """
+    cache_dir = config.PGNET_OPTIMIZED_CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir or options.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL:
+        return None
+    settings = "|".join([
+        str(options.graph_optimization_level),
+        ",".join(providers),
+        onnxruntime.__version__,
+        _hardware_tag(),
+    ])
+    key = hashlib.sha256(f"{_file_digest(model_path)}|{settings}".encode()).hexdigest()[:24]
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{name}.{key}.opt.onnx")
+
+
+# Plain settings of SessionOptions; session config entries, initializers and custom op
+# libraries cannot be read back, so options using them are not copied faithfully
+_SESSION_OPTION_FIELDS = (
+    "intra_op_num_threads",
+    "inter_op_num_threads",
+    "execution_mode",
+    "execution_order",
+    "graph_optimization_level",
+    "enable_profiling",
+    "profile_file_prefix",
+    "enable_cpu_mem_arena",
+    "enable_mem_pattern",
+    "enable_mem_reuse",
+    "use_deterministic_compute",
+    "use_per_session_threads",
+    "log_severity_level",
+    "log_verbosity_level",
+    "logid",
+)
+
+
+def copy_session_options(options):
+    """A new SessionOptions with the same settings (SessionOptions cannot be copied or pickled)."""
+    copy = onnxruntime.SessionOptions()
+    for name in _SESSION_OPTION_FIELDS:
+        if hasattr(options, name):
+            setattr(copy, name, getattr(options, name))
+    return copy
+
+
+def create_session(model_path, cpu=True, session_options=None, cache_dir=None):
+    """
+    Build an InferenceSession, reusing the on-disk optimized graph when there is one.
+
+    On a cache miss onnxruntime optimizes the model as usual and also writes the
+    result to the cache; on a hit the saved graph is loaded with optimizations off,
+    so start-up skips the optimization passes.
+
+    Returns:
+        (tuple): (session, "hit" | "miss" | "off")
+    """
+    # The cache settings below are written onto the options, so never onto the caller's
+    options = copy_session_options(session_options) if session_options else build_session_options()
+    providers = get_providers(cpu)
+    try:
+        cached_path = optimized_model_path(model_path, options, providers, cache_dir)
+    except OSError as e:
+        logger.warning("Optimized model cache unavailable for %s: %s", model_path, e)
+        cached_path = None
+    if cached_path is None:
+        return onnxruntime.InferenceSession(model_path, sess_options=options, providers=providers), "off"
+
+    if os.path.exists(cached_path):
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return onnxruntime.InferenceSession(cached_path, sess_options=options, providers=providers), "hit"
+        except Exception as e:
+            # A truncated or incompatible file: fall back to optimizing the original again
+            logger.warning("Ignoring unusable optimized model %s: %s", cached_path, e)
+            options.graph_optimization_level = build_session_options().graph_optimization_level
+
+    os.makedirs(os.path.dirname(cached_path) or ".", exist_ok=True)
+    tmp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    options.optimized_model_filepath = tmp_path
+    sess = onnxruntime.InferenceSession(model_path, sess_options=options, providers=providers)
+    try:
+        os.replace(tmp_path, cached_path)
+    except OSError as e:
+        logger.warning("Could not cache the optimized model at %s: %s", cached_path, e)
+    return sess, "miss"
+
+
+def warmup_input(sess, shape=None):
+    """
+    Build a dummy input for the warm-up inference.
+
+    Dynamic dimensions of the model input are filled from PGNET_WARMUP_SHAPE so the
+    warm-up runs at a resolution that real frames will actually hit.
+    """
+    if shape is None:
+        shape = [int(dim) for dim in config.PGNET_WARMUP_SHAPE.split(",")]
+    height, width = shape
+    model_input = sess.get_inputs()[0]
+    defaults = [1, 3, height, width]
+    dims = [
+        dim if isinstance(dim, int) and dim > 0 else default
+        for dim, default in zip(model_input.shape, defaults)
+    ]
+    return {model_input.name: np.zeros(dims, dtype=np.float32)}
+
+
+class SessionRegistry:
+    """
+    Process-wide, thread-safe registry of onnxruntime sessions.
+
+    Each (model path, device) pair is loaded once, warmed up, and then shared by
+    every request. onnxruntime's InferenceSession.run is safe to call from several
+    threads, so handing out the same session is fine.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._sessions = {}
+        self._status = {}
+
+    def _key(self, model_path, cpu):
+        return (os.path.abspath(model_path), bool(cpu))
+
+    def load(self, model_path, cpu=True, warmup=True, session_options=None, reload=False):
+        """
+        Load (or return the already loaded) session for a model.
+
+        Args:
+            model_path (str): Path to the ONNX model file.
+            cpu (bool): Whether to run inference on CPU. If False, GPU (CUDA) is used.
+            warmup (bool): Run one dummy inference after loading.
+            session_options (onnxruntime.SessionOptions, optional): Overrides the config defaults.
+            reload (bool): Build a new session even if one is loaded (e.g. the file was
+                replaced). Callers holding the old session can keep using it.
+
+        Returns:
+            onnxruntime.InferenceSession: The shared session.
+        """
+        key = self._key(model_path, cpu)
+        sess = self._sessions.get(key)
+        if sess is not None and not reload:
+            return sess
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread builds a given session; the others wait and reuse it.
+        with key_lock:
+            current = self._sessions.get(key)
+            if current is not None and (not reload or current is not sess):
+                # Loaded (or reloaded) by another thread while we waited
+                return current
+
+            if current is None:
+                self._status[key] = {"model_path": key[0], "cpu": key[1], "state": "loading"}
+            try:
+                if not os.path.exists(model_path):
+                    raise FileNotFoundError(f"Model file not found at {model_path}")
+
+                started = time.perf_counter()
+                sess, optimized_cache = create_session(model_path, cpu, session_options)
+                load_seconds = time.perf_counter() - started
+
+                warmup_seconds = None
+                if warmup:
+                    started = time.perf_counter()
+                    sess.run(None, warmup_input(sess))
+                    warmup_seconds = time.perf_counter() - started
+            except Exception as e:
+                if current is not None:
+                    # Keep serving the session we already have
+                    raise
+                self._status[key] = {
+                    "model_path": key[0],
+                    "cpu": key[1],
+                    "state": "error",
+                    "error": str(e),
+                }
+                raise
+
+            self._sessions[key] = sess
+            self._status[key] = {
+                "model_path": key[0],
+                "cpu": key[1],
+                "state": "ready",
+                "load_seconds": round(load_seconds, 4),
+                "optimized_cache": optimized_cache,
+                "warmup_seconds": None if warmup_seconds is None else round(warmup_seconds, 4),
+                "providers": sess.get_providers(),
+            }
+            return sess
+
+    def get(self, model_path, cpu=True):
+        """Return the shared session for a model, loading it on first use."""
+        sess = self._sessions.get(self._key(model_path, cpu))
+        if sess is not None:
+            return sess
+        return self.load(model_path, cpu=cpu)
+
+    def unload(self, model_path, sess, cpu=True):
+        """Forget a model's session, if `sess` is still the one registered for it."""
+        key = self._key(model_path, cpu)
+        with self._lock:
+            if self._sessions.get(key) is sess:
+                del self._sessions[key]
+                self._status.pop(key, None)
+
+    def is_ready(self, model_path, cpu=True):
+        return self._key(model_path, cpu) in self._sessions
+
+    def status(self):
+        """Return a list with the load state of every model the registry has seen."""
+        return [dict(status) for status in self._status.values()]
+
+
+# Shared by the whole process
+registry = SessionRegistry()
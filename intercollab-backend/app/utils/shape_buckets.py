@@ -0,0 +1,288 @@
+# intercollab-backend/app/utils/shape_buckets.py
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.config import config
+from app.utils.pgnet.transforms import normalize_image
+from app.utils.session_registry import _file_digest
+
+
+OUTPUT_NAMES = ["f_border", "f_char", "f_direction", "f_score"]
+
+# A black pixel after normalization, per channel as [C, 1, 1]; padding with 0 would
+# be the normalization mean (mid grey) instead
+PAD_VALUE = normalize_image(np.zeros((1, 1, 3), dtype=np.uint8)).reshape(3, 1, 1)
+
+
+def parse_buckets(spec):
+    """
+    Parse a bucket list such as "640x896,768x1024" into sorted (height, width) pairs.
+
+    Buckets are sorted by area so the first one that fits is also the smallest.
+    """
+    buckets = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        height, width = item.lower().split("x")
+        buckets.append((int(height), int(width)))
+    return sorted(buckets, key=lambda bucket: (bucket[0] * bucket[1], bucket))
+
+
+def pick_bucket(buckets, height, width):
+    """Smallest bucket that fits a (height, width) input, or the input size itself if none does."""
+    for bucket_height, bucket_width in buckets:
+        if bucket_height >= height and bucket_width >= width:
+            return bucket_height, bucket_width
+    return height, width
+
+
+_source_digests = {}
+
+
+def _source_digest(model_path):
+    """Content hash of the source model, recomputed only when its mtime or size changes."""
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _source_digests:
+        _source_digests[key] = _file_digest(model_path)[:12]
+    return _source_digests[key]
+
+
+def fixed_shape_model_path(model_path, shape):
+    """
+    Where the fixed-shape copy of a model for `shape` ([N, C, H, W]) is stored.
+
+    The name includes a hash of the source model, so a replaced model gets new copies
+    instead of reusing ones made from the old weights.
+    """
+    root, ext = os.path.splitext(model_path)
+    dims = "x".join(str(dim) for dim in shape)
+    return f"{root}.fixed_{dims}.{_source_digest(model_path)}{ext}"
+
+
+def make_fixed_shape_model(model_path, shape):
+    """
+    Write (once) a copy of the model whose input shape is fixed to `shape`.
+
+    With static shapes onnxruntime can pre-plan memory and apply shape-dependent
+    graph optimizations. Needs the optional `onnx` package.
+
+    Returns:
+        str: Path of the fixed-shape model.
+    """
+    out_path = fixed_shape_model_path(model_path, shape)
+    if os.path.exists(out_path):
+        return out_path
+
+    import onnx
+    from onnxruntime.tools.onnx_model_utils import fix_output_shapes, make_input_shape_fixed
+
+    model = onnx.load(model_path)
+    make_input_shape_fixed(model.graph, model.graph.input[0].name, list(shape))
+    fix_output_shapes(model)
+    tmp_path = f"{out_path}.tmp"
+    onnx.save(model, tmp_path)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class _BindingSlot:
+    """Preallocated input/output buffers for one input shape, bound through IOBinding."""
+
+    def __init__(self, sess, input_name, shape):
+        self.sess = sess
+        self.shape = shape
+        self.input = np.zeros(shape, dtype=np.float32)
+        self.binding = sess.io_binding()
+        self.binding.bind_input(input_name, "cpu", 0, np.float32, list(shape), self.input.ctypes.data)
+
+        # Output shapes are only known after a run; the first real run lets ORT
+        # allocate them, then our own buffers are bound for every later run.
+        self.output_names = [output.name for output in sess.get_outputs()]
+        for name in self.output_names:
+            self.binding.bind_output(name, "cpu")
+        self.outputs = None
+
+    def run(self):
+        self.sess.run_with_iobinding(self.binding)
+        if self.outputs is not None:
+            return self.outputs
+        first = self.binding.copy_outputs_to_cpu()
+        self.outputs = [np.empty_like(output) for output in first]
+        self.binding.clear_binding_outputs()
+        for name, output in zip(self.output_names, self.outputs):
+            self.binding.bind_output(name, "cpu", 0, output.dtype, list(output.shape), output.ctypes.data)
+        return first
+
+
+class BucketedRunner:
+    """
+    Runs PGNet on inputs padded to fixed shape buckets with IOBinding.
+
+    Every (batch, bucket) shape gets preallocated input and output buffers that
+    are reused across requests, so the hot loop does not reallocate tensors. Inputs
+    are padded with black at the bottom/right into their bucket and the outputs are
+    cropped back to the unpadded size, keeping coordinates unchanged for postprocess.
+    """
+
+    def __init__(self, sess, buckets=None, max_shapes=None, model_path=None, fixed_shape_models=None):
+        """
+        Args:
+            sess (onnxruntime.InferenceSession): The shared session.
+            buckets (list, optional): (height, width) buckets; defaults to PGNET_SHAPE_BUCKETS.
+            max_shapes (int, optional): How many buckets keep their buffers (LRU); every
+                batch size run in a bucket keeps its own buffers under it.
+            model_path (str, optional): Model file, needed for fixed-shape sessions.
+            fixed_shape_models (bool, optional): Run each bucket on a session built from
+                a fixed-shape copy of the model (batch size 1).
+        """
+        self.sess = sess
+        self.input_name = sess.get_inputs()[0].name
+        self.buckets = parse_buckets(config.PGNET_SHAPE_BUCKETS) if buckets is None else buckets
+        self.max_shapes = max_shapes or config.PGNET_BINDING_MAX_SHAPES
+        self.model_path = model_path
+        self.fixed_shape_models = (
+            config.PGNET_FIXED_SHAPE_MODELS if fixed_shape_models is None else fixed_shape_models
+        ) and model_path is not None and bool(self.buckets)
+
+        self._lock = threading.Lock()
+        self._free = OrderedDict()  # bucket shape -> {batch size: list of idle _BindingSlot}
+        self._fixed_sessions = {}  # fixed-shape model path -> session from the registry
+        self.allocations = 0
+
+    def bucket_shape(self, shape):
+        """The padded [C, H, W] an input of shape [N, C, H, W] runs at."""
+        _, channels, height, width = shape
+        return (channels,) + pick_bucket(self.buckets, height, width)
+
+    def _session_for(self, bucket_shape):
+        if not self.fixed_shape_models or bucket_shape[1:] not in self.buckets:
+            return self.sess
+        from app.utils.session_registry import registry
+        fixed_path = make_fixed_shape_model(self.model_path, (1,) + bucket_shape)
+        sess = registry.get(fixed_path, cpu=not config.PGNET_USE_GPU)
+        with self._lock:
+            self._fixed_sessions[fixed_path] = sess
+        return sess
+
+    def fixed_sessions(self):
+        """(model path, session) of every fixed-shape session this runner has used."""
+        with self._lock:
+            return list(self._fixed_sessions.items())
+
+    def _acquire(self, sess, shape):
+        # Batching runs the same bucket at any batch size from 1 to the maximum, so the
+        # LRU is keyed by bucket alone and the batch sizes share its entry
+        with self._lock:
+            idle = self._free.get(shape[1:], {}).get(shape[0])
+            if idle:
+                self._free.move_to_end(shape[1:])
+                return idle.pop()
+            self.allocations += 1
+        return _BindingSlot(sess, self.input_name, shape)
+
+    def _release(self, slot):
+        with self._lock:
+            self._free.setdefault(slot.shape[1:], {}).setdefault(slot.shape[0], []).append(slot)
+            self._free.move_to_end(slot.shape[1:])
+            while len(self._free) > self.max_shapes:
+                self._free.popitem(last=False)
+
+    def _run_padded(self, sess, imgs, bucket_shape):
+        slot = self._acquire(sess, (len(imgs),) + bucket_shape)
+        try:
+            for i, img in enumerate(imgs):
+                _, _, height, width = img.shape
+                if (height, width) != bucket_shape[1:]:
+                    slot.input[i] = PAD_VALUE
+                slot.input[i, :, :height, :width] = img[0]
+            outputs = slot.run()
+
+            preds_list = []
+            for i, img in enumerate(imgs):
+                _, _, height, width = img.shape
+                preds = {}
+                for name, output in zip(OUTPUT_NAMES, outputs):
+                    out_height = output.shape[2] * height // bucket_shape[1]
+                    out_width = output.shape[3] * width // bucket_shape[2]
+                    # Copy out: the buffers are reused by the next request
+                    preds[name] = output[i:i + 1, :, :out_height, :out_width].copy()
+                preds_list.append(preds)
+            return preds_list
+        finally:
+            self._release(slot)
+
+    def run_batch(self, imgs):
+        """
+        Run several [1, C, H, W] inputs that share a bucket as one batch.
+
+        Returns:
+            list: One predictions dict (as returned by `PGNetPredictor.predict`) per input.
+        """
+        bucket_shape = self.bucket_shape(imgs[0].shape)
+        sess = self._session_for(bucket_shape)
+        if sess is self.sess:
+            return self._run_padded(sess, imgs, bucket_shape)
+        # Fixed-shape models have a batch size of 1
+        return [self._run_padded(sess, [img], bucket_shape)[0] for img in imgs]
+
+    def run(self, img):
+        """Run a single [1, C, H, W] input."""
+        return self.run_batch([img])[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "buckets": ["x".join(map(str, bucket)) for bucket in self.buckets],
+                "fixed_shape_models": self.fixed_shape_models,
+                "shapes": [
+                    "x".join(map(str, (batch,) + shape)) for shape, slots in self._free.items() for batch in slots
+                ],
+                "allocations": self.allocations,
+            }
+
+
+_runners = {}
+_runners_lock = threading.Lock()
+
+
+def get_runner(sess, model_path=None):
+    """Return the shared BucketedRunner for a session, or None when PGNET_IO_BINDING is off."""
+    if not config.PGNET_IO_BINDING:
+        return None
+    with _runners_lock:
+        entry = _runners.get(id(sess))
+        if entry is None or entry[0] is not sess:
+            entry = (sess, BucketedRunner(sess, model_path=model_path))
+            _runners[id(sess)] = entry
+        return entry[1]
+
+
+def release_runner(sess):
+    """
+    Drop the runner (and its buffers) of a session that is no longer served.
+
+    Its fixed-shape sessions are unloaded from the registry too, unless a runner
+    still serving (e.g. for a reload of the same model file) uses them.
+    """
+    from app.utils.session_registry import registry
+    with _runners_lock:
+        entry = _runners.get(id(sess))
+        if entry is None or entry[0] is not sess:
+            return
+        del _runners[id(sess)]
+        in_use = {id(fixed) for _, runner in _runners.values() for _, fixed in runner.fixed_sessions()}
+    for fixed_path, fixed in entry[1].fixed_sessions():
+        if id(fixed) not in in_use:
+            registry.unload(fixed_path, fixed, cpu=not config.PGNET_USE_GPU)
+
+
+def runner_stats():
+    with _runners_lock:
+        runners = [runner for _, runner in _runners.values()]
+    return [runner.stats() for runner in runners]
@@ -0,0 +1,82 @@
+# intercollab-backend/app/utils/stand_in_model.py
+import argparse
+import os
+
+import numpy as np
+
+from app.utils.inference_pgnet import get_dict_path
+from app.utils.pgnet.postprocess import load_lexicon
+
+
+def build_stand_in_model(output_path, num_classes=None, seed=0):
+    """
+    Write a tiny ONNX model with PGNet's input and outputs.
+
+    It has the same input ("x", [N, 3, H, W], dynamic) and the same four outputs
+    at 1/4 resolution as pgnet.onnx, so the whole serving pipeline runs against
+    it: dark strokes on a light board score as text, and characters come from
+    fixed random 1x1 convolutions. It is meant for benchmarks and load tests
+    where the real model is not available, not for recognizing anything.
+    Needs the optional `onnx` package.
+
+    Args:
+        output_path (str): Where to write the model.
+        num_classes (int, optional): f_char channels; defaults to the dictionary size + 1 (CTC blank).
+        seed (int): Seed for the character weights.
+
+    Returns:
+        str: `output_path`.
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    if num_classes is None:
+        num_classes = len(load_lexicon(get_dict_path())) + 1
+    rng = np.random.default_rng(seed)
+    initializers = []
+    # Downsample to the 1/4 resolution PGNet predicts at
+    nodes = [helper.make_node("AveragePool", ["x"], ["pooled"], kernel_shape=[4, 4], strides=[4, 4])]
+
+    def conv(name, output, weight, bias):
+        initializers.append(numpy_helper.from_array(weight.astype(np.float32), f"{name}_w"))
+        initializers.append(numpy_helper.from_array(bias.astype(np.float32), f"{name}_b"))
+        nodes.append(helper.make_node("Conv", ["pooled", f"{name}_w", f"{name}_b"], [output], kernel_shape=[1, 1]))
+
+    # Normalized dark pixels are negative, so they get a high text score
+    conv("score", "score_logits", np.full((1, 3, 1, 1), -2.0), np.array([-1.0]))
+    nodes.append(helper.make_node("Sigmoid", ["score_logits"], ["f_score"]))
+    conv("border", "f_border", np.zeros((4, 3, 1, 1)), np.array([-3.0, 0.0, 3.0, 0.0]))
+    conv("direction", "f_direction", np.zeros((2, 3, 1, 1)), np.array([10.0, 0.0]))
+    conv("char", "f_char", rng.normal(size=(num_classes, 3, 1, 1)), rng.normal(size=num_classes))
+
+    model_input = helper.make_tensor_value_info("x", TensorProto.FLOAT, ["N", 3, "H", "W"])
+    outputs = [
+        helper.make_tensor_value_info(name, TensorProto.FLOAT, ["N", None, "h", "w"])
+        for name in ("f_border", "f_char", "f_direction", "f_score")
+    ]
+    graph = helper.make_graph(nodes, "pgnet_stand_in", [model_input], outputs, initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 11)])
+    model.ir_version = 7
+    onnx.checker.check_model(model)
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    onnx.save(model, output_path)
+    return output_path
+
+
+def ensure_stand_in_model(output_path):
+    """Build the stand-in model unless it already exists."""
+    if not os.path.exists(output_path):
+        build_stand_in_model(output_path)
+    return output_path
+
+
+if __name__ == "__main__":
+    # Example usage (from intercollab-backend):
+    #   python -m app.utils.stand_in_model /tmp/pgnet_stand_in.onnx
+    parser = argparse.ArgumentParser(description="Write a tiny stand-in for pgnet.onnx")
+    parser.add_argument("output_path", type=str, help="where to write the model")
+    args = parser.parse_args()
+    print(f"Stand-in model written to {build_stand_in_model(args.output_path)}")
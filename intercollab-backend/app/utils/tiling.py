@@ -0,0 +1,259 @@
+# intercollab-backend/app/utils/tiling.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from app.config import config
+from app.utils.metrics import stage
+from app.utils.pgnet.postprocess import clip_boxes
+
+
+# Detections reaching this close to an edge shared with a neighbouring tile were cut by it
+EDGE_MARGIN = 4
+
+
+def tile_grid(height, width, tile_size, overlap):
+    """
+    Overlapping tiles covering a frame, all of the same size.
+
+    The last row and column are shifted back to end at the frame's edge instead of
+    being cut short, so every tile preprocesses to the same input shape.
+
+    Returns:
+        list: (x0, y0, x1, y1) per tile, in row-major order.
+    """
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        stride = tile_size - overlap
+        positions = list(range(0, length - tile_size, stride))
+        return positions + [length - tile_size]
+
+    tile_h, tile_w = min(tile_size, height), min(tile_size, width)
+    return [(x0, y0, x0 + tile_w, y0 + tile_h) for y0 in starts(height) for x0 in starts(width)]
+
+
+def polygon_area(poly):
+    return abs(cv2.contourArea(np.asarray(poly, dtype=np.float32)))
+
+
+def intersection_area(a, b):
+    """Intersection area of two polygons, taken on their convex hulls."""
+    hull_a = cv2.convexHull(np.asarray(a, dtype=np.float32))
+    hull_b = cv2.convexHull(np.asarray(b, dtype=np.float32))
+    area, _ = cv2.intersectConvexConvex(hull_a, hull_b)
+    return max(area, 0.0)
+
+
+def join_texts(left, right, left_span, right_span):
+    """
+    Join the texts of two pieces of one line read on either side of a tile seam.
+
+    The longest suffix of `left` that is also a prefix of `right` is read twice (it
+    lies in the overlap); without one, each side keeps the characters on its half of
+    the overlap, estimated from the pieces' horizontal spans.
+
+    Args:
+        left_span, right_span (tuple): (x0, x1) of each piece.
+    """
+    for size in range(min(len(left), len(right)), 1, -1):
+        if left[-size:] == right[:size]:
+            return left + right[size:]
+    middle = (right_span[0] + left_span[1]) / 2.0
+    left_keep = round(len(left) * (middle - left_span[0]) / max(left_span[1] - left_span[0], 1e-6))
+    right_skip = round(len(right) * (middle - right_span[0]) / max(right_span[1] - right_span[0], 1e-6))
+    return left[:max(left_keep, 0)] + right[max(right_skip, 0):]
+
+
+def join_polys(left, right):
+    """
+    Join two polygons of one line: the left piece's left half and the right piece's right half.
+
+    PGNet polygons list the top points left to right, then the bottom points right to
+    left, so the joined polygon has as many points as its pieces.
+    """
+    points = len(left) // 2
+    half = points // 2
+    left_top, left_bottom = left[:points], left[points:]
+    right_top, right_bottom = right[:points], right[points:]
+    return np.concatenate([left_top[:points - half], right_top[points - half:], right_bottom[:half], left_bottom[half:]])
+
+
+class _Detection:
+    __slots__ = ("poly", "text", "tile", "rect", "area", "cut_left", "cut_right", "cut")
+
+    def __init__(self, poly, text, tile, cut_left, cut_right, cut):
+        self.poly = poly
+        self.text = text
+        self.tile = tile
+        self.rect = np.concatenate([poly.min(axis=0), poly.max(axis=0)])
+        self.area = polygon_area(poly)
+        self.cut_left = cut_left
+        self.cut_right = cut_right
+        self.cut = cut
+
+    def quality(self):
+        """Uncut detections win over cut ones, then longer texts, then larger boxes."""
+        return (not self.cut, len(self.text), self.area)
+
+
+def _joinable(left, right):
+    """Whether `left` and `right` are the two sides of one line cut by a vertical seam."""
+    if left.tile == right.tile or not (left.cut_right and right.cut_left):
+        return False
+    lx0, ly0, lx1, ly1 = left.rect
+    rx0, ry0, rx1, ry1 = right.rect
+    if not (lx0 < rx0 < lx1 < rx1):
+        return False
+    shared_height = min(ly1, ry1) - max(ly0, ry0)
+    return shared_height >= 0.5 * min(ly1 - ly0, ry1 - ry0)
+
+
+class TiledRecognizer:
+    """
+    Recognizes large frames tile by tile at native scale instead of downsizing them.
+
+    `preprocess_image` caps frames at 768 pixels high, so small handwriting on a 4K
+    board gets lost, while a larger cap makes a single inference much slower. Frames
+    whose longer side exceeds `min_side` are split into overlapping tiles of one
+    size, which run concurrently (and so end up in the same micro-batch, or on
+    different inference workers). The tile results are mapped back to frame
+    coordinates; pieces of a line cut by a seam are joined, and duplicates read in
+    the overlap are dropped by polygon NMS, keeping the most complete reading.
+    """
+
+    def __init__(self, tile_size=None, overlap=None, min_side=None, workers=None, nms_threshold=None):
+        """
+        Args:
+            tile_size (int, optional): Tile edge in pixels; 768 keeps tiles at native scale.
+            overlap (int, optional): Pixels shared by neighbouring tiles; should exceed a text line's height.
+            min_side (int, optional): Frames with a longer side above this are tiled (0 turns tiling off).
+            workers (int, optional): Tiles recognized concurrently.
+            nms_threshold (float, optional): Intersection over the smaller polygon's area
+                above which two detections count as the same text.
+        """
+        self.tile_size = tile_size or config.PGNET_TILE_SIZE
+        self.overlap = config.PGNET_TILE_OVERLAP if overlap is None else overlap
+        self.min_side = config.PGNET_TILE_MIN_SIDE if min_side is None else min_side
+        self.workers = workers or config.PGNET_TILE_WORKERS
+        self.nms_threshold = config.PGNET_TILE_NMS_THRESHOLD if nms_threshold is None else nms_threshold
+        if not 0 <= self.overlap < self.tile_size:
+            raise ValueError("PGNET_TILE_OVERLAP must be smaller than PGNET_TILE_SIZE")
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.tiles = 0
+        self.joined = 0
+        self.suppressed = 0
+
+    def applies(self, frame):
+        return self.applies_to(frame.shape[1], frame.shape[0])
+
+    def applies_to(self, width, height):
+        # Tiles are never split again, even if min_side is set below the tile size
+        return self.min_side > 0 and max(width, height) > max(self.min_side, self.tile_size)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pgnet-tile")
+            return self._executor
+
+    def __call__(self, frame, recognize):
+        """
+        Recognize a frame through its tiles.
+
+        Args:
+            frame (np.ndarray): The decoded BGR frame.
+            recognize (callable): `recognize(tile) -> (dt_boxes, texts)` for one tile.
+
+        Returns:
+            (tuple): (dt_boxes, texts) in frame coordinates.
+        """
+        height, width = frame.shape[:2]
+        tiles = tile_grid(height, width, self.tile_size, self.overlap)
+        futures = [self._get_executor().submit(recognize, frame[y0:y1, x0:x1]) for x0, y0, x1, y1 in tiles]
+        results = [future.result() for future in futures]
+
+        with stage("recognition", "tile_merge"):
+            detections = []
+            for index, ((x0, y0, x1, y1), (boxes, texts)) in enumerate(zip(tiles, results)):
+                offset = np.array([x0, y0], dtype=np.float64)
+                for box, text in zip(boxes, texts):
+                    poly = np.asarray(box, dtype=np.float64) + offset
+                    px0, py0 = poly.min(axis=0)
+                    px1, py1 = poly.max(axis=0)
+                    # Only edges shared with another tile cut text; the frame's own edges do not
+                    cut_left = x0 > 0 and px0 <= x0 + EDGE_MARGIN
+                    cut_right = x1 < width and px1 >= x1 - 1 - EDGE_MARGIN
+                    cut_top = y0 > 0 and py0 <= y0 + EDGE_MARGIN
+                    cut_bottom = y1 < height and py1 >= y1 - 1 - EDGE_MARGIN
+                    detections.append(_Detection(
+                        poly, text, index, cut_left, cut_right, cut_left or cut_right or cut_top or cut_bottom
+                    ))
+            boxes, texts, joined, suppressed = self.merge(detections)
+            boxes = clip_boxes(boxes, frame.shape)
+
+        with self._lock:
+            self.frames += 1
+            self.tiles += len(tiles)
+            self.joined += joined
+            self.suppressed += suppressed
+        return boxes, texts
+
+    def merge(self, detections):
+        """
+        Join the pieces of lines cut by a seam, then drop duplicates with polygon NMS.
+
+        Returns:
+            (tuple): (polygons, texts, joined pieces, suppressed duplicates)
+        """
+        joined = 0
+        merged = True
+        while merged:
+            merged = False
+            for left in detections:
+                right = next((other for other in detections if _joinable(left, other)), None)
+                if right is None:
+                    continue
+                text = join_texts(left.text, right.text, left.rect[[0, 2]], right.rect[[0, 2]])
+                detection = _Detection(
+                    join_polys(left.poly, right.poly), text, left.tile, left.cut_left, right.cut_right,
+                    left.cut_left or right.cut_right,
+                )
+                detections = [d for d in detections if d is not left and d is not right] + [detection]
+                joined += 1
+                merged = True
+                break
+
+        kept = []
+        for detection in sorted(detections, key=_Detection.quality, reverse=True):
+            duplicate = any(
+                intersection_area(detection.poly, other.poly) > self.nms_threshold * min(detection.area, other.area)
+                for other in kept
+            )
+            if not duplicate:
+                kept.append(detection)
+
+        # Back to reading order, as PGNet reports lines of a single frame
+        kept.sort(key=lambda d: (d.rect[1], d.rect[0]))
+        return [d.poly for d in kept], [d.text for d in kept], joined, len(detections) - len(kept)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min_side": self.min_side,
+                "tile_size": self.tile_size,
+                "overlap": self.overlap,
+                "frames": self.frames,
+                "tiles": self.tiles,
+                "joined_pieces": self.joined,
+                "suppressed_duplicates": self.suppressed,
+            }
+
+
+# Shared by the whole process
+tiled_recognizer = TiledRecognizer()
@@ -0,0 +1,287 @@
+# intercollab-backend/app/utils/translation.py
+import asyncio
+import threading
+
+from app.config import config
+from app.utils.executor import translation_executor
+from app.utils.metrics import stage
+from app.utils.translation_cache import TranslationCancelled, cache_key, translation_cache
+
+
+class TranslationProvider:
+    """
+    Translates batches of texts into one target language.
+
+    Subclasses implement `translate_many`; at most `max_concurrency` calls run at once.
+    """
+
+    name = "base"
+
+    def __init__(self, max_concurrency=None):
+        self.max_concurrency = max_concurrency or config.TRANSLATE_MAX_CONCURRENCY
+        self._semaphore = None
+        self.requests = 0
+        self.texts = 0
+        self.errors = 0
+
+    @property
+    def semaphore(self):
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def translate_many(self, texts, target_language):
+        """
+        Args:
+            texts (list): Texts to translate.
+            target_language (str): Target language code.
+
+        Returns:
+            list: One translated string per text, in order.
+        """
+        raise NotImplementedError
+
+    async def __call__(self, texts, target_language):
+        if not texts:
+            return []
+        async with self.semaphore:
+            self.requests += 1
+            self.texts += len(texts)
+            try:
+                with stage("translation", "provider"):
+                    return await self.translate_many(texts, target_language)
+            except Exception:
+                self.errors += 1
+                raise
+
+    async def close(self):
+        pass
+
+    def stats(self):
+        return {
+            "provider": self.name,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.requests,
+            "texts": self.texts,
+            "errors": self.errors,
+        }
+
+
+class GoogletransProvider(TranslationProvider):
+    """
+    The public Google Translate endpoint through googletrans.
+
+    googletrans is blocking, so calls run on the translation executor. Every
+    worker thread keeps its own Translator, and with it a keep-alive HTTP client.
+    """
+
+    name = "googletrans"
+
+    def __init__(self, max_concurrency=None):
+        super().__init__(max_concurrency)
+        self._local = threading.local()
+
+    def _translate_blocking(self, texts, target_language):
+        translator = getattr(self._local, "translator", None)
+        if translator is None:
+            from googletrans import Translator
+            translator = self._local.translator = Translator()
+        results = translator.translate(texts, src=config.TRANSLATE_SOURCE_LANGUAGE, dest=target_language)
+        return [result.text for result in results]
+
+    async def translate_many(self, texts, target_language):
+        return await translation_executor.run(self._translate_blocking, list(texts), target_language)
+
+
+class HTTPProvider(TranslationProvider):
+    """
+    A LibreTranslate-compatible HTTP service, such as a self-hosted server or a local stub.
+
+    One pooled, keep-alive httpx.AsyncClient is shared by all requests and every
+    batch goes out as a single POST with a list of texts.
+    """
+
+    name = "http"
+
+    def __init__(self, url=None, api_key=None, timeout=None, max_concurrency=None):
+        super().__init__(max_concurrency)
+        self.url = url or config.TRANSLATE_HTTP_URL
+        self.api_key = config.TRANSLATE_HTTP_API_KEY if api_key is None else api_key
+        self.timeout = timeout or config.TRANSLATE_HTTP_TIMEOUT_SECONDS
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def translate_many(self, texts, target_language):
+        payload = {
+            "q": list(texts),
+            "source": config.TRANSLATE_SOURCE_LANGUAGE,
+            "target": target_language,
+            "format": "text",
+        }
+        if self.api_key:
+            payload["api_key"] = self.api_key
+        response = await self.client.post(self.url, json=payload)
+        response.raise_for_status()
+        translated = response.json()["translatedText"]
+        if isinstance(translated, str):
+            translated = [translated]
+        if len(translated) != len(texts):
+            raise ValueError(f"Expected {len(texts)} translations, got {len(translated)}")
+        return translated
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class ArgosProvider(TranslationProvider):
+    """
+    Offline translation with a locally installed Argos Translate model.
+
+    Needs the optional `argostranslate` package and the language pair installed.
+    Argos cannot detect the source language, so "auto" falls back to English.
+    """
+
+    name = "argos"
+
+    def _translate_blocking(self, texts, target_language):
+        from argostranslate import translate
+
+        source = config.TRANSLATE_SOURCE_LANGUAGE
+        if source == "auto":
+            source = "en"
+        return [translate.translate(text, source, target_language) for text in texts]
+
+    async def translate_many(self, texts, target_language):
+        return await translation_executor.run(self._translate_blocking, list(texts), target_language)
+
+
+class EchoProvider(TranslationProvider):
+    """Returns the texts unchanged. For development and load tests without a translation service."""
+
+    name = "echo"
+
+    async def translate_many(self, texts, target_language):
+        return list(texts)
+
+
+PROVIDERS = {
+    provider.name: provider
+    for provider in (GoogletransProvider, HTTPProvider, ArgosProvider, EchoProvider)
+}
+
+
+def create_provider(name=None):
+    """Build the provider selected by TRANSLATE_PROVIDER."""
+    name = name or config.TRANSLATE_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown translation provider: {name}")
+    return PROVIDERS[name]()
+
+
+class TranslationService:
+    """
+    Cached, coalesced translation on top of a provider.
+
+    Texts already in the translation cache (or being translated by another
+    request) are not sent again; the remaining ones go to the provider in one batch.
+    """
+
+    def __init__(self, provider=None, cache=None):
+        self.provider = provider or create_provider()
+        self.cache = cache or translation_cache
+
+    async def translate(self, text, target_language):
+        return (await self.translate_many([text], target_language))[0]
+
+    async def translate_many(self, texts, target_language):
+        """
+        Translate several texts into one language.
+
+        Returns:
+            list: One translated string per text, in order.
+        """
+        if not texts:
+            return []
+        if not self.cache.enabled:
+            return await self.provider(texts, target_language)
+
+        keys = [cache_key(text, target_language) for text in texts]
+        # Providers get the code as given: "zh-CN" and "zh-Hant" are case-sensitive for some
+        language = target_language.strip()
+        results, waiting, owned = {}, {}, {}
+        for key in dict.fromkeys(keys):
+            with stage("translation", "cache_lookup"):
+                state, value = self.cache.claim(key)
+            if state == "hit":
+                results[key] = value
+            elif state == "wait":
+                waiting[key] = value
+            else:
+                owned[key] = value
+
+        try:
+            missing = []
+            for key in owned:
+                translation = await asyncio.to_thread(self.cache.load, key) if self.cache.db_path else None
+                if translation is None:
+                    missing.append(key)
+                else:
+                    self.cache.resolve(key, owned[key], translation, from_disk=True)
+                    results[key] = translation
+            # Translate the normalized texts, since each result is shared by every spelling of it
+            translated = await self.provider([key[0] for key in missing], language)
+        except BaseException as e:
+            for key, future in owned.items():
+                if key not in results:
+                    self.cache.abandon(key, future, e)
+            raise
+
+        for key, translation in zip(missing, translated):
+            self.cache.resolve(key, owned[key], translation)
+            results[key] = translation
+        if waiting:
+            with stage("translation", "wait_in_flight"):
+                for key, future in waiting.items():
+                    try:
+                        results[key] = await asyncio.wrap_future(future)
+                    except TranslationCancelled:
+                        # The request translating it went away; translate it here instead
+                        results[key] = (await self.translate_many([key[0]], language))[0]
+        return [results[key] for key in keys]
+
+    async def translate_batch(self, texts, target_languages):
+        """
+        Translate every text into every target language, one provider batch per language.
+
+        Returns:
+            dict: target language -> list of translations, in the order of `texts`.
+        """
+        languages = list(dict.fromkeys(target_languages))
+        translations = await asyncio.gather(*(self.translate_many(texts, language) for language in languages))
+        return dict(zip(languages, translations))
+
+    async def close(self):
+        await self.provider.close()
+
+    def stats(self):
+        return self.provider.stats()
+
+
+_service = None
+
+
+def get_translation_service():
+    """The shared TranslationService, built on first use."""
+    global _service
+    if _service is None:
+        _service = TranslationService()
+    return _service
@@ -0,0 +1,187 @@
+# intercollab-backend/app/utils/translation_cache.py
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from app.config import config
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Collapse whitespace so the same board text recognized with different spacing shares a key."""
+    return " ".join(text.split())
+
+
+def cache_key(text, target_language):
+    """(normalized text, casefolded language); the key only, providers get the caller's language code."""
+    return normalize_text(text), target_language.strip().casefold()
+
+
+class TranslationCancelled(RuntimeError):
+    """The request translating a text was cancelled before the translation finished."""
+
+
+class TranslationCache:
+    """
+    LRU cache of translations keyed by (normalized text, target language).
+
+    An optional SQLite file backs the in-memory LRU so translations survive
+    restarts. Concurrent misses for the same key are coalesced onto one
+    translation call.
+    """
+
+    def __init__(self, max_entries=None, db_path=None):
+        """
+        Args:
+            max_entries (int, optional): In-memory LRU capacity (0 disables the cache).
+            db_path (str, optional): SQLite file for the persistent store; empty keeps it in memory only.
+        """
+        self.max_entries = config.TRANSLATION_CACHE_SIZE if max_entries is None else max_entries
+        self.db_path = config.TRANSLATION_CACHE_DB if db_path is None else db_path
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (text, language) -> translation
+        self._in_flight = {}  # (text, language) -> Future
+        self._db = None
+        self._db_lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _connect(self):
+        """Open the SQLite store on first use. Called with `_db_lock` held."""
+        if self._db is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "text TEXT NOT NULL, language TEXT NOT NULL, translation TEXT NOT NULL, "
+                "PRIMARY KEY (text, language))"
+            )
+            self._db.commit()
+        return self._db
+
+    def _load(self, key):
+        if not self.db_path:
+            return None
+        try:
+            with self._db_lock:
+                row = self._connect().execute(
+                    "SELECT translation FROM translations WHERE text = ? AND language = ?", key
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Error reading translation cache: %s", e)
+            return None
+        return row[0] if row else None
+
+    def _store(self, key, translation):
+        if not self.db_path:
+            return
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO translations (text, language, translation) VALUES (?, ?, ?)",
+                    key + (translation,)
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            logger.warning("Error writing translation cache: %s", e)
+
+    def _put(self, key, translation):
+        self._entries[key] = translation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def claim(self, key):
+        """
+        Look a key up, registering the caller as its translator on a miss.
+
+        Returns:
+            (tuple): ("hit", translation), ("wait", future) when another caller is
+                already translating the key, or ("own", future) when the caller must
+                translate it and then call `resolve` or `abandon`.
+        """
+        with self._lock:
+            translation = self._entries.get(key)
+            if translation is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return "hit", translation
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                # The same text is already being translated; wait for it
+                self.coalesced += 1
+                return "wait", future
+
+            future = Future()
+            self._in_flight[key] = future
+            return "own", future
+
+    def load(self, key):
+        """Persistent-store lookup for a claimed key; None when absent or not configured."""
+        return self._load(key)
+
+    def resolve(self, key, future, translation, from_disk=False):
+        """Publish the translation of a claimed key to the cache and to everyone waiting on it."""
+        if not from_disk:
+            self._store(key, translation)
+        with self._lock:
+            if from_disk:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            self._put(key, translation)
+            del self._in_flight[key]
+        future.set_result(translation)
+
+    def abandon(self, key, future, error):
+        """
+        Release a claimed key whose translation failed.
+
+        Waiters get the same error, except when the owner was cancelled (e.g. its client
+        disconnected): they get TranslationCancelled, an ordinary exception they can retry on.
+        """
+        if not isinstance(error, Exception):
+            error = TranslationCancelled(f"Translation cancelled ({type(error).__name__})")
+        with self._lock:
+            del self._in_flight[key]
+        future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": bool(self.db_path),
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0,
+            }
+
+
+# Shared by the whole process
+translation_cache = TranslationCache()
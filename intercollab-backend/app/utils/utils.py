@@ -1,85 +1,252 @@
-from app.utils.inference_pgnet import PGNetPredictor
-import tempfile
-import os
-import base64
-import cv2
 import numpy as np
-from io import BytesIO
-from app.utils.inference_pgnet import PGNetPredictor
+from app.config import config
+from app.utils.batching import get_scheduler
+from app.utils.incremental import incremental_sessions
+from app.utils.line_tracking import line_trackers
+from app.utils.metrics import stage
+from app.utils.model_manager import model_manager
+from app.utils.profiling import ort_profiler
+from app.utils.inference_pgnet import (
+    MAX_SIDE_LEN,
+    PGNetPredictor,
+    check_image_size,
+    decode_image,
+    decode_image_reduced,
+    probe_image_size,
+    rescale_boxes,
+)
+from app.utils.rendering import boxes_payload, check_render_options, render_annotations, to_data_url
+from app.utils.result_cache import image_key, perceptual_hash, result_cache
+from app.utils.shape_buckets import get_runner
+from app.utils.tiling import tiled_recognizer
+from app.utils.worker_pool import get_worker_pool
 
-def get_annotated_image(image_bytes, text_boxes, recognized_texts):
+def get_annotated_image(image, text_boxes, recognized_texts, max_side=None, image_format=None, quality=None):
     """
     Create an annotated image with bounding boxes and text recognition results
     
     Args:
-        image_bytes (bytes): The original image bytes
+        image (np.ndarray | bytes): The decoded frame (drawn on in place) or the original image bytes
         text_boxes (np.ndarray): Bounding boxes of detected text
         recognized_texts (list): List of recognized text strings
+        max_side (int, optional): Render at a preview size with this longest side (0 for full size)
+        image_format (str, optional): "jpeg", "webp" or "png"
+        quality (int, optional): Encoder quality for JPEG and WebP
     
     Returns:
         str: Base64 encoded image with annotations
     """
-    # Convert image bytes to numpy array for OpenCV
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    # Get image dimensions
-    height, width, _ = image.shape
-    
-    # Draw bounding boxes and text (similar to PGNetPredictor.draw)
-    for box, text_str in zip(text_boxes, recognized_texts):
-        box = box.astype(np.int32).reshape((-1, 1, 2))
-        cv2.polylines(image, [box], True, color=(255, 255, 0), thickness=2)
-        
-        # Write text near the box
-        cv2.putText(
-            image,
-            text_str,
-            org=(int(box[0, 0, 0]), int(box[0, 0, 1])),
-            fontFace=cv2.FONT_HERSHEY_COMPLEX,
-            fontScale=0.7 / 400 * width / 2,
-            color=(0, 0, 0),
-            thickness=int(1 / 1000 * width),
-        )
+    # Reuse the frame decoded for inference; only decode if we were given raw bytes
+    image = decode_image(image)
     
     # Encode the image to base64 for sending to frontend
-    _, buffer = cv2.imencode('.jpg', image)
-    jpg_as_text = base64.b64encode(buffer).decode('utf-8')
+    data, media_type = render_annotations(image, text_boxes, recognized_texts, max_side, image_format, quality)
+    return to_data_url(data, media_type)
+
+def render_stored_result(image_bytes, boxes, max_side=None, image_format=None, quality=None):
+    """
+    Render the annotated image of a result kept for lazy fetching.
+    
+    Args:
+        image_bytes (bytes): The original upload
+        boxes (list): The result's `boxes_payload`
+    
+    Returns:
+        (tuple): (encoded bytes, media type)
+    """
+    max_side = config.RENDER_MAX_SIDE if max_side is None else max_side
+    if max_side and config.PGNET_REDUCED_DECODE:
+        # Previews only need enough pixels for their longest side
+        frame, scale, _ = decode_image_reduced(image_bytes, min_side=max_side)
+    else:
+        frame, scale = decode_image(image_bytes), np.array([1.0, 1.0])
+    text_boxes = [np.array(box["points"], dtype=np.float32) / scale for box in boxes]
+    recognized_texts = [box["text"] for box in boxes]
+    return render_annotations(frame, text_boxes, recognized_texts, max_side, image_format, quality)
+
+def decode_upload(image_bytes, max_side=None, render=False):
+    """
+    Decode an upload for recognition, at a reduced size when the model would downscale it anyway.
+    
+    Frames that will be tiled keep their full resolution. When the annotated image is
+    rendered on the frame, a reduced decode keeps enough pixels for the preview's
+    `max_side`, and a full-size render (max side 0) gets the full-size frame.
+    
+    Args:
+        image_bytes (bytes | memoryview): The encoded image
+        max_side (int, optional): Preview size of the rendered image (RENDER_MAX_SIDE by default)
+        render (bool): The annotated image will be drawn on the decoded frame
+    
+    Returns:
+        (tuple): (frame, scale, (width, height)), see `decode_image_reduced`
     
-    return f"data:image/jpeg;base64,{jpg_as_text}"
+    Raises:
+        UnsupportedImage: The format's size cannot be read before decoding
+        ImageTooLarge: The image exceeds MAX_IMAGE_MEGAPIXELS
+    """
+    size = probe_image_size(image_bytes)
+    check_image_size(size)
+    max_side = config.RENDER_MAX_SIDE if max_side is None else max_side
+    if (
+        not config.PGNET_REDUCED_DECODE
+        or tiled_recognizer.applies_to(*size)
+        or (render and not max_side)
+    ):
+        frame = decode_image(image_bytes)
+        return frame, np.array([1.0, 1.0]), (frame.shape[1], frame.shape[0])
+    return decode_image_reduced(image_bytes, min_height=MAX_SIDE_LEN, min_side=max_side if render else 0)
 
-def get_text_prediction(image_bytes):
-    # Save the image bytes to a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-        temp_file.write(image_bytes)
-        temp_file_path = temp_file.name
+def recognize_frame(frame, model=None):
+    """
+    Run PGNet detection and recognition on a decoded frame.
+    
+    Args:
+        frame (np.ndarray): The decoded BGR frame
+        model (LoadedModel | str, optional): A leased model, or the name of the variant
+            to lease for this call (defaults to the weighted choice)
+    
+    Returns:
+        (tuple): (dt_boxes, recognized_texts)
+    """
+    if model is None or isinstance(model, str):
+        with model_manager.lease(model) as leased:
+            return recognize_frame(frame, leased)
 
-    try:
-        # Get model path from environment or use a default
-        model_path = os.environ.get("PGNET_MODEL_PATH", "app/utils/pgnet.onnx")
-        
-        # Check if model exists
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found at {model_path}")
-        
-        # Initialize the PGNetPredictor with the temporary image file and model path
-        predictor = PGNetPredictor(
-            img_path=temp_file_path,
-            cpu=True,
-            model_path=model_path
-        )
-        
-        # Run the prediction
-        dt_boxes, recognized_texts = predictor()
-        
-        # Create annotated image
-        annotated_image = get_annotated_image(image_bytes, dt_boxes, recognized_texts)
-        
-        # Join the recognized texts into a single string
-        recognized_text = " ".join(recognized_texts) if recognized_texts else "No text detected"
-        return recognized_text, annotated_image
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+    # Large frames are read tile by tile at native scale (each tile comes back through here)
+    if tiled_recognizer.applies(frame):
+        return tiled_recognizer(frame, lambda tile: recognize_frame(tile, model))
 
+    # While an onnxruntime profiling run of this variant's model is active, use its session directly
+    profiled_sess = ort_profiler.acquire(model.model_path)
+    if profiled_sess is not None:
+        try:
+            return PGNetPredictor(image=frame, cpu=not config.PGNET_USE_GPU, sess=profiled_sess)()
+        finally:
+            ort_profiler.release(profiled_sess)
+    
+    # Hand the frame to a dedicated inference process when the worker pool is running
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.recognize(frame, model)
+    
+    # Reuse the variant's shared session (loaded and warmed up once at startup)
+    sess, model_path = model.sess, model.model_path
+    
+    # Initialize the PGNetPredictor with the decoded frame and the shared session;
+    # inference goes through the micro-batching scheduler and the IOBinding runner
+    # when they are enabled
+    runner = get_runner(sess, model_path=model_path)
+    predictor = PGNetPredictor(
+        image=frame,
+        cpu=not config.PGNET_USE_GPU,
+        model_path=model_path,
+        sess=sess,
+        scheduler=get_scheduler(sess, runner=runner),
+        runner=runner
+    )
+    
+    # Run the prediction
+    return predictor()
+
+def get_text_prediction(image_bytes, session_id=None, render_mode=None, max_side=None, image_format=None, quality=None,
+                        model=None, incremental=True, structured=False):
+    """
+    Run the PGNet pipeline on an uploaded image.
+    
+    The upload is decoded exactly once, in memory; the same frame is used for
+    inference and for drawing the annotations. Recognition results are cached by
+    image content, and identical concurrent uploads share one inference.
+    
+    With a session id, the frame is recognized incrementally: only the areas that
+    changed since the session's previous frame go through PGNet. Its lines are
+    returned for `track_lines`, which gives them stable ids across the session's frames.
+    
+    Args:
+        image_bytes (bytes | memoryview): The encoded image
+        session_id (str, optional): Enables incremental recognition and line tracking for this session
+        render_mode (str, optional): "inline" embeds the annotated image; "boxes" and
+            "lazy" return polygons and texts only and skip rendering
+        max_side (int, optional): Preview size of the inline annotated image
+        image_format (str, optional): Encoder of the inline annotated image
+        quality (int, optional): Encoder quality of the inline annotated image
+        model (str, optional): Model variant to use; by default picked by the A/B
+            weights (sticky per session)
+        incremental (bool): With a session id, only re-recognize the changed areas
+        structured (bool): Always return "boxes" and "image_size", and the inline
+            annotated image as encoded bytes ("annotated_image_type" is its media type)
+            instead of a data URL, for the compact and binary response formats
+    
+    Returns:
+        dict: "text", "model" plus "annotated_image" (inline) or "boxes" and "image_size";
+              with a session id also "lines" (text and points of every detection, not yet tracked)
+    """
+    render_mode, image_format = check_render_options(render_mode, image_format)
+    variant = model_manager.choose(model, sticky_key=session_id)
+    
+    # Decode the upload once, straight from memory (reduced for large images: the
+    # boxes are found on the reduced frame and mapped back to the original size)
+    with stage("recognition", "decode"):
+        frame, scale, image_size = decode_upload(image_bytes, max_side, render=render_mode == "inline")
+    
+    if session_id and incremental:
+        recognizer = incremental_sessions.get(session_id, lambda tile: recognize_frame(tile, variant))
+        with stage("recognition", "recognize_incremental"):
+            dt_boxes, recognized_texts = recognizer(frame)
+    else:
+        with stage("recognition", "cache_key"):
+            key = image_key(image_bytes)
+            phash = perceptual_hash(frame) if result_cache.uses_phash else None
+            # Cached boxes are in the coordinates of the frame they were found on
+            geometry = (frame.shape[0], frame.shape[1], float(scale[0]), float(scale[1]))
+        # Includes waiting for an identical in-flight request; near zero on cache hits
+        with stage("recognition", "recognize"), model_manager.lease(variant) as leased:
+            dt_boxes, recognized_texts = result_cache.get_or_compute(
+                key, lambda: recognize_frame(frame, leased), phash=phash, namespace=leased.cache_namespace,
+                geometry=geometry
+            )
+    
+    # Join the recognized texts into a single string
+    recognized_text = " ".join(recognized_texts) if recognized_texts else "No text detected"
+    result = {"text": recognized_text, "model": variant}
+    original_boxes = rescale_boxes(dt_boxes, scale, image_size)
+    if session_id:
+        result["lines"] = [
+            {"text": text, "points": np.asarray(box).round(1).tolist()}
+            for box, text in zip(original_boxes, recognized_texts)
+        ]
+    
+    if render_mode == "inline":
+        # Create annotated image on the same frame (inference no longer needs it); a
+        # reduced decode is drawn at its decoded size
+        with stage("recognition", "annotate"):
+            if structured:
+                result["annotated_image"], result["annotated_image_type"] = render_annotations(
+                    frame, dt_boxes, recognized_texts, max_side, image_format, quality
+                )
+            else:
+                result["annotated_image"] = get_annotated_image(
+                    frame, dt_boxes, recognized_texts, max_side, image_format, quality
+                )
+    if render_mode != "inline" or structured:
+        # The client draws the results (or fetches the image later), so skip rendering
+        result["boxes"] = boxes_payload(original_boxes, recognized_texts)
+        result["image_size"] = list(image_size)
+    return result
+
+def track_lines(result, session_id):
+    """
+    Give the lines of a session's result stable ids and a new/changed/unchanged status.
+    
+    Runs in the serving process, after `get_text_prediction` returns, so the session's
+    tracks (and the translations kept with them) are found whichever executor process
+    recognized the frame.
+    
+    Returns:
+        dict: `result`, its "lines" with "id" and "status" added
+    """
+    lines = result["lines"]
+    with stage("recognition", "track_lines"):
+        result["lines"] = line_trackers.get(session_id).update(
+            [np.array(line["points"], dtype=np.float32) for line in lines], [line["text"] for line in lines]
+        )
+    return result
@@ -0,0 +1,424 @@
+# intercollab-backend/app/utils/worker_pool.py
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait as wait_connections
+
+import numpy as np
+
+from app.config import config
+from app.utils.metrics import merge_stage_timings, take_stage_timings
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_core_sets(spec, workers):
+    """
+    The CPU cores each worker is pinned to.
+
+    Args:
+        spec (str): PGNET_WORKER_CORES, e.g. "0-3;4-7" (one set per worker). Empty
+            splits the cores this process may use evenly across the workers.
+        workers (int): Number of workers.
+
+    Returns:
+        list: One sorted list of core ids per worker (empty lists mean no pinning).
+    """
+    if spec.strip():
+        sets = []
+        for item in spec.split(";"):
+            cores = set()
+            for part in item.split(","):
+                if "-" in part:
+                    first, last = part.split("-")
+                    cores.update(range(int(first), int(last) + 1))
+                elif part.strip():
+                    cores.add(int(part))
+            sets.append(sorted(cores))
+        if len(sets) != workers:
+            raise ValueError(f"PGNET_WORKER_CORES has {len(sets)} core sets for {workers} workers")
+        return sets
+    if not hasattr(os, "sched_getaffinity"):
+        return [[] for _ in range(workers)]
+    available = sorted(os.sched_getaffinity(0))
+    if len(available) < workers:
+        return [[] for _ in range(workers)]
+    per_worker = len(available) // workers
+    return [available[i * per_worker:(i + 1) * per_worker] for i in range(workers)]
+
+
+class FrameRing:
+    """
+    Fixed-size slots in one shared memory block, handed out to frames in flight.
+
+    A frame is written into a free slot once and the worker maps the same memory
+    as an ndarray, so it crosses processes without pickling. The number of slots
+    bounds the memory used for frames; callers wait for a free slot when all are taken.
+    """
+
+    def __init__(self, slots, slot_bytes):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def fits(self, frame):
+        return frame.nbytes <= self.slot_bytes
+
+    def put(self, frame, timeout=None):
+        """
+        Copy a frame into a free slot.
+
+        Returns:
+            int: The slot index, to be given back with `release`.
+        """
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No free frame slot in the worker ring buffer") from None
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        view[...] = frame
+        return slot
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def free_slots(self):
+        return self._free.qsize()
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _worker_main(index, cores, intra_op_threads, shm_name, slot_bytes, tasks, results):
+    """Entry point of an inference worker process."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    # This process only runs inference: one session sized to its cores, no nested pool
+    config.ORT_INTRA_OP_THREADS = intra_op_threads
+    config.PGNET_WORKER_PROCESSES = 0
+
+    from app.utils.model_manager import model_manager
+    from app.utils.utils import recognize_frame
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    model_manager.load_all()
+    # Generation of each variant as the API process numbers them
+    synced = {name: (0, model_manager.model_path(name)) for name in model_manager.weights}
+    results.send(("ready", index, None))
+
+    def sync(name, model_path, generation):
+        if synced.get(name, (-1, None))[0] < generation:
+            model_manager.swap(name, model_path)
+            synced[name] = (generation, model_path)
+
+    while True:
+        message = tasks.get()
+        if message is None:
+            break
+        kind, task_id = message[0], message[1]
+        try:
+            if kind == "sync":
+                sync(*message[2])
+                results.send((task_id, True, None))
+                continue
+            _, _, slot, shape, dtype, frame, (name, model_path, generation) = message
+            if slot is not None:
+                frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=slot * slot_bytes)
+            sync(name, model_path, generation)
+            boxes, texts = recognize_frame(frame, name)
+            # The stages timed here go back with the result, to be recorded by the API process
+            results.send((task_id, True, (boxes, texts, take_stage_timings())))
+        except Exception as e:
+            results.send((task_id, False, f"{type(e).__name__}: {e}"))
+    shm.close()
+
+
+class _Worker:
+    def __init__(self, index, cores):
+        self.index = index
+        self.cores = cores
+        self.process = None
+        self.tasks = None
+        self.results = None  # read end of the worker's result pipe
+        self.pending = {}  # task_id -> (future, slot)
+        self.ready = threading.Event()
+
+
+class InferenceWorkerPool:
+    """
+    Separate inference processes, each pinned to its own cores with its own session.
+
+    API processes hand decoded frames over through a shared-memory FrameRing and get
+    (boxes, texts) back over a pipe. Each worker has its own task queue and result
+    pipe, so work goes to the least busy one, model swaps reach all of them and a
+    worker killed mid-write cannot block the others' results.
+    Workers that die, or hang past a request's timeout, are restarted and their
+    pending requests fail.
+    """
+
+    def __init__(self, workers=None, core_spec=None, ring_slots=None, slot_mb=None):
+        self.workers_count = config.PGNET_WORKER_PROCESSES if workers is None else workers
+        core_sets = parse_core_sets(config.PGNET_WORKER_CORES if core_spec is None else core_spec, self.workers_count)
+        slots = (config.PGNET_WORKER_RING_SLOTS if ring_slots is None else ring_slots) or 2 * self.workers_count
+        slot_mb = config.PGNET_WORKER_SLOT_MB if slot_mb is None else slot_mb
+        self.ring = FrameRing(slots, int(slot_mb * 1024 * 1024))
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._closed = False
+        self._workers = [_Worker(index, cores) for index, cores in enumerate(core_sets)]
+        self.tasks = 0
+        self.oversized = 0
+        self.restarts = 0
+        self.timed_out = 0
+
+        for worker in self._workers:
+            self._spawn(worker)
+        self._reader = threading.Thread(target=self._read_results, name="pgnet-pool-results", daemon=True)
+        self._reader.start()
+
+    def _spawn(self, worker):
+        intra_op_threads = config.ORT_INTRA_OP_THREADS or len(worker.cores)
+        worker.tasks = self._ctx.Queue()
+        results, worker_results = self._ctx.Pipe(duplex=False)
+        worker.ready.clear()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, worker.cores, intra_op_threads, self.ring.name,
+                  self.ring.slot_bytes, worker.tasks, worker_results),
+            name=f"pgnet-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        # Only the worker writes; without our copy of its end, its exit reads as EOF
+        worker_results.close()
+        worker.results = results
+
+    def _read_results(self):
+        checked = time.monotonic()
+        ended = set()  # pipes of workers that exited, until they are restarted
+        while not self._closed:
+            # Checked on a timer, so a dead worker is noticed under steady load too
+            if time.monotonic() - checked >= 1.0:
+                self._check_workers()
+                checked = time.monotonic()
+            connections = [worker.results for worker in self._workers if worker.results not in ended]
+            ended.intersection_update(worker.results for worker in self._workers)
+            try:
+                ready = wait_connections(connections, timeout=1.0)
+            except OSError:
+                # A pipe was closed by a restart while it was being collected
+                continue
+            for connection in ready:
+                try:
+                    task_id, ok, payload = connection.recv()
+                except (EOFError, OSError):
+                    # The worker exited (or was restarted while we waited)
+                    ended.add(connection)
+                    continue
+                self._handle_result(task_id, ok, payload)
+
+    def _handle_result(self, task_id, ok, payload):
+        if task_id == "ready":
+            self._workers[ok].ready.set()
+            return
+        with self._lock:
+            for worker in self._workers:
+                entry = worker.pending.pop(task_id, None)
+                if entry is not None:
+                    break
+        if entry is None:
+            return
+        future, slot = entry
+        if slot is not None:
+            self.ring.release(slot)
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        for worker in self._workers:
+            process = worker.process
+            if self._closed or process.is_alive():
+                continue
+            logger.error("Inference worker %d exited with code %s, restarting", worker.index, process.exitcode)
+            self._restart(worker, process, f"Inference worker {worker.index} died")
+
+    def _restart(self, worker, process, reason):
+        """Stop `process` if it is still the worker's, fail its pending requests and start a new one."""
+        with self._restart_lock:
+            if self._closed or worker.process is not process:
+                # Already restarted by someone else
+                return
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+            with self._lock:
+                pending, worker.pending = worker.pending, {}
+                self.restarts += 1
+            for future, slot in pending.values():
+                if slot is not None:
+                    self.ring.release(slot)
+                future.set_exception(RuntimeError(reason))
+            results = worker.results
+            self._spawn(worker)
+            results.close()
+
+    def _submit(self, worker, message, slot=None):
+        future = Future()
+        with self._lock:
+            task_id = next(self._task_ids)
+            worker.pending[task_id] = (future, slot)
+        worker.tasks.put((message[0], task_id) + message[1:])
+        return future
+
+    def recognize(self, frame, model, timeout=None):
+        """
+        Run PGNet on a decoded frame in a worker process.
+
+        Args:
+            frame (np.ndarray): The decoded BGR frame (or a crop of it).
+            model (LoadedModel): The leased variant; the worker switches to its generation.
+            timeout (float, optional): How long to wait for a free frame slot, and then
+                for the result; defaults to REQUEST_TIMEOUT_SECONDS.
+
+        Returns:
+            (tuple): (dt_boxes, recognized_texts)
+
+        Raises:
+            TimeoutError: No free slot, or the worker did not answer in time. A worker
+                that does not answer is restarted, failing its other pending requests.
+        """
+        timeout = config.REQUEST_TIMEOUT_SECONDS if timeout is None else timeout
+        variant = (model.name, model.model_path, model.generation)
+        if self.ring.fits(frame):
+            slot = self.ring.put(frame, timeout=timeout)
+            message = ("recognize", slot, frame.shape, frame.dtype.str, None, variant)
+        else:
+            # Larger than a slot (e.g. 4K): send it through the queue, copied and pickled
+            slot = None
+            message = ("recognize", None, None, None, np.ascontiguousarray(frame), variant)
+            self.oversized += 1
+        with self._lock:
+            worker = min(self._workers, key=lambda w: (not w.ready.is_set(), len(w.pending)))
+            process = worker.process
+            self.tasks += 1
+        try:
+            future = self._submit(worker, message, slot)
+        except BaseException:
+            if slot is not None:
+                self.ring.release(slot)
+            raise
+        try:
+            boxes, texts, timings = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            logger.error("Inference worker %d did not answer within %.1fs, restarting", worker.index, timeout)
+            self._restart(worker, process, f"Inference worker {worker.index} was restarted after a timeout")
+            raise TimeoutError(f"Inference worker {worker.index} did not answer within {timeout}s") from None
+        merge_stage_timings(timings)
+        return boxes, texts
+
+    def sync_model(self, name, model_path, generation, timeout=300):
+        """Make every worker load and warm up a variant's new generation, then return."""
+        futures = [self._submit(worker, ("sync", (name, model_path, generation))) for worker in self._workers]
+        for future in futures:
+            future.result(timeout=timeout)
+
+    def wait_ready(self, timeout=None):
+        return all(worker.ready.wait(timeout) for worker in self._workers)
+
+    def is_ready(self):
+        return all(worker.ready.is_set() for worker in self._workers)
+
+    def stats(self):
+        with self._lock:
+            workers = [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid,
+                    "cores": worker.cores,
+                    "ready": worker.ready.is_set(),
+                    "pending": len(worker.pending),
+                }
+                for worker in self._workers
+            ]
+        return {
+            "workers": workers,
+            "ring_slots": self.ring.slots,
+            "ring_slot_bytes": self.ring.slot_bytes,
+            "free_slots": self.ring.free_slots(),
+            "tasks": self.tasks,
+            "oversized_frames": self.oversized,
+            "restarts": self.restarts,
+            "timed_out": self.timed_out,
+        }
+
+    def close(self):
+        self._closed = True
+        for worker in self._workers:
+            try:
+                worker.tasks.put(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.results.close()
+        self.ring.close()
+
+
+_pool = None
+
+
+def start_worker_pool():
+    """
+    Start the pool if PGNET_WORKER_PROCESSES > 0 (from the API process, at startup).
+
+    Each API process owns its pool; nothing is shared between uvicorn workers.
+    """
+    global _pool
+    if _pool is None and config.PGNET_WORKER_PROCESSES > 0:
+        if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+            logger.warning(
+                "Every API worker starts its own %d inference processes (WEB_CONCURRENCY > 1)",
+                config.PGNET_WORKER_PROCESSES,
+            )
+        _pool = InferenceWorkerPool()
+    return _pool
+
+
+def get_worker_pool():
+    """The running pool, or None when inference runs in this process."""
+    return _pool
+
+
+def stop_worker_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
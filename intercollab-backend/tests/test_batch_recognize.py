@@ -0,0 +1,34 @@
+import json
+
+from app.utils.batch_recognize import item_key, load_done_keys
+
+
+def test_item_key():
+    assert item_key("a.jpg") == "a.jpg"
+    assert item_key("clip.mp4", 12) == "clip.mp4#12"
+
+
+def test_load_done_keys_missing_file(tmp_path):
+    assert load_done_keys(str(tmp_path / "out.jsonl")) == set()
+
+
+def test_load_done_keys_truncates_partial_line(tmp_path):
+    output = tmp_path / "out.jsonl"
+    records = [
+        {"source": "a.jpg", "texts": []},
+        {"source": "clip.mp4", "frame": 3, "texts": []},
+        {"source": "b.jpg", "error": "unreadable"},
+    ]
+    complete = "".join(json.dumps(record) + "\n" for record in records)
+    output.write_text(complete + '{"source": "c.jp', encoding="utf-8")
+
+    # Failed items are retried, the cut-off record is dropped from the file
+    assert load_done_keys(str(output)) == {"a.jpg", "clip.mp4#3"}
+    assert output.read_text(encoding="utf-8") == complete
+
+
+def test_load_done_keys_complete_file_untouched(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text(json.dumps({"source": "a.jpg"}) + "\n", encoding="utf-8")
+    assert load_done_keys(str(output)) == {"a.jpg"}
+    assert output.read_text(encoding="utf-8") == json.dumps({"source": "a.jpg"}) + "\n"
@@ -0,0 +1,38 @@
+import random
+import threading
+import time
+
+from app.utils.image_sets import stream_map
+
+
+def test_stream_map_keeps_order():
+    def slow(i):
+        time.sleep(random.random() * 0.01)
+        return i * i
+
+    assert list(stream_map(slow, range(50), workers=8, prefetch=6)) == [i * i for i in range(50)]
+
+
+def test_stream_map_bounds_prefetch():
+    started = []
+    lock = threading.Lock()
+
+    def record(i):
+        with lock:
+            started.append(i)
+        return i
+
+    results = stream_map(record, range(100), workers=4, prefetch=5)
+    assert next(results) == 0
+    time.sleep(0.05)
+    # The first result was taken, so at most one more than `prefetch` items were submitted
+    assert len(started) <= 6
+    assert list(results) == list(range(1, 100))
+
+
+def test_stream_map_is_lazy():
+    calls = []
+    results = stream_map(calls.append, iter(range(10)))
+    assert calls == []
+    list(results)
+    assert sorted(calls) == list(range(10))
@@ -0,0 +1,43 @@
+import numpy as np
+
+from app.utils.line_tracking import LineTracker, _rect_iou
+
+
+def box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def test_rect_iou():
+    assert _rect_iou(np.array([0, 0, 10, 10]), np.array([0, 0, 10, 10])) == 1.0
+    assert _rect_iou(np.array([0, 0, 10, 10]), np.array([50, 50, 60, 60])) == 0.0
+    # Flat boxes still overlap themselves
+    assert _rect_iou(np.array([0, 5, 10, 5]), np.array([0, 5, 10, 5])) == 1.0
+
+
+def test_lines_keep_their_ids_across_frames():
+    tracker = LineTracker(min_iou=0.5, max_missed=2)
+    first = tracker.update([box(0, 0, 100, 20), box(0, 50, 100, 70)], ["HELLO", "WORLD"])
+    assert [line["status"] for line in first] == ["new", "new"]
+
+    # Moved slightly, listed in the other order, one text changed
+    second = tracker.update([box(2, 51, 102, 71), box(1, 1, 101, 21)], ["WORLD!", "HELLO"])
+    assert [line["id"] for line in second] == [first[1]["id"], first[0]["id"]]
+    assert [line["status"] for line in second] == ["changed", "unchanged"]
+
+
+def test_matching_is_one_to_one():
+    tracker = LineTracker(min_iou=0.3, max_missed=2)
+    (line,) = tracker.update([box(0, 0, 100, 20)], ["A"])
+    lines = tracker.update([box(0, 0, 100, 20), box(5, 0, 105, 20)], ["A", "A"])
+    assert lines[0]["id"] == line["id"]
+    assert lines[1]["status"] == "new" and lines[1]["id"] != line["id"]
+
+
+def test_missed_lines_are_forgotten_after_max_missed():
+    tracker = LineTracker(min_iou=0.5, max_missed=1)
+    (line,) = tracker.update([box(0, 0, 100, 20)], ["A"])
+    tracker.update([], [])
+    assert tracker.update([box(0, 0, 100, 20)], ["A"])[0]["id"] == line["id"]
+    tracker.update([], [])
+    tracker.update([], [])
+    assert tracker.update([box(0, 0, 100, 20)], ["A"])[0]["id"] != line["id"]
@@ -0,0 +1,34 @@
+import pytest
+
+from app.utils.model_manager import DEFAULT_VARIANT, parse_variants, parse_weights
+
+
+def test_parse_variants():
+    variants = parse_variants(" base=models/a.onnx, int8 = models/b.onnx ,")
+    assert variants == {"base": "models/a.onnx", "int8": "models/b.onnx"}
+    assert list(variants) == ["base", "int8"]
+
+
+def test_parse_variants_empty_serves_default_path():
+    assert parse_variants("  ", default_path="m.onnx") == {DEFAULT_VARIANT: "m.onnx"}
+
+
+@pytest.mark.parametrize("spec", ["base", "=a.onnx", "base=", "base=a.onnx,int8"])
+def test_parse_variants_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_variants(spec)
+
+
+def test_parse_weights():
+    assert parse_weights("base=3, int8=1", ["base", "int8"]) == {"base": 3.0, "int8": 1.0}
+    assert parse_weights("int8=1", ["base", "int8"]) == {"base": 0.0, "int8": 1.0}
+
+
+def test_parse_weights_empty_sends_everything_to_first():
+    assert parse_weights("", ["base", "int8"]) == {"base": 1.0, "int8": 0.0}
+
+
+@pytest.mark.parametrize("spec", ["other=1", "base", "base=-1", "base=0,int8=0", "base=x"])
+def test_parse_weights_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_weights(spec, ["base", "int8"])
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.utils.check_parity import recorded_cases, replay_case
+from app.utils.pgnet.textpoint import thin
+
+
+# Recorded from the real pgnet.onnx with:
+#   python -m app.utils.check_parity --images <sample boards> --record tests/fixtures/parity
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "parity")
+
+
+def random_masks():
+    rng = np.random.default_rng(0)
+    for size in [(1, 1), (3, 7), (40, 60), (97, 131)]:
+        for density in (0.1, 0.5, 0.9):
+            yield (rng.random(size) < density).astype(np.uint8)
+
+
+def stroke_masks():
+    import cv2
+
+    rng = np.random.default_rng(1)
+    for _ in range(10):
+        mask = np.zeros((120, 200), dtype=np.uint8)
+        for _ in range(8):
+            start = tuple(int(v) for v in rng.integers(0, (200, 120)))
+            end = tuple(int(v) for v in rng.integers(0, (200, 120)))
+            cv2.line(mask, start, end, 1, int(rng.integers(1, 9)))
+        yield mask
+
+
+@pytest.mark.parametrize("name", recorded_cases(FIXTURES) or [
+    pytest.param(None, marks=pytest.mark.skip(reason="no cases recorded from pgnet.onnx in tests/fixtures/parity")),
+])
+def test_recorded_cases(name):
+    assert replay_case(FIXTURES, name) == []
+
+
+def test_thin_matches_skimage():
+    skimage_thin = pytest.importorskip("skimage.morphology").thin
+    for mask in [*random_masks(), *stroke_masks()]:
+        assert np.array_equal(thin(mask), skimage_thin(mask))
+
+
+def test_stand_in_cases_round_trip(tmp_path):
+    pytest.importorskip("paddleocr")
+    pytest.importorskip("onnx")
+    import onnxruntime
+
+    from app.utils.benchmark_pipeline import build_cases
+    from app.utils.check_parity import paddle_reference, record_case, replay_cases
+    from app.utils.inference_pgnet import get_dict_path
+    from app.utils.stand_in_model import build_stand_in_model
+
+    sess = onnxruntime.InferenceSession(build_stand_in_model(str(tmp_path / "stand_in.onnx")))
+    reference = paddle_reference(get_dict_path())
+    for name, image_bytes in build_cases(["vga"], ["sparse", "dense"]):
+        record_case(sess, image_bytes, reference, str(tmp_path / "cases"), name)
+    assert replay_cases(str(tmp_path / "cases")) == [("vga-dense", []), ("vga-sparse", [])]
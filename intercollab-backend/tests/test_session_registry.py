@@ -0,0 +1,19 @@
+import onnxruntime
+
+from app.utils.session_registry import build_session_options, copy_session_options
+
+
+def test_copy_session_options():
+    options = build_session_options(intra_op_threads=3, execution_mode="parallel", graph_optimization_level="basic")
+    options.enable_profiling = True
+    copy = copy_session_options(options)
+    assert copy is not options
+    assert copy.intra_op_num_threads == 3
+    assert copy.execution_mode == onnxruntime.ExecutionMode.ORT_PARALLEL
+    assert copy.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    assert copy.enable_profiling
+
+    copy.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+    copy.optimized_model_filepath = "cached.onnx"
+    assert options.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    assert options.optimized_model_filepath == ""
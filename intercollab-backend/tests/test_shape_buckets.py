@@ -0,0 +1,21 @@
+from app.utils.shape_buckets import parse_buckets, pick_bucket
+
+
+def test_parse_buckets_sorts_by_area():
+    assert parse_buckets("768x1024, 640X896,,512x512") == [(512, 512), (640, 896), (768, 1024)]
+
+
+def test_parse_buckets_empty():
+    assert parse_buckets("") == []
+
+
+def test_pick_bucket_smallest_that_fits():
+    buckets = parse_buckets("512x512,640x896,768x1024")
+    assert pick_bucket(buckets, 500, 500) == (512, 512)
+    assert pick_bucket(buckets, 512, 600) == (640, 896)
+    assert pick_bucket(buckets, 700, 700) == (768, 1024)
+
+
+def test_pick_bucket_falls_back_to_input_size():
+    assert pick_bucket(parse_buckets("512x512"), 600, 400) == (600, 400)
+    assert pick_bucket([], 32, 64) == (32, 64)
@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.utils.tiling import TiledRecognizer, _Detection, join_texts, tile_grid
+
+
+def box(x0, y0, x1, y1):
+    return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32)
+
+
+def detection(poly, text, tile=0, cut=False):
+    return _Detection(poly, text, tile, False, False, cut)
+
+
+def test_tile_grid_covers_frame_with_equal_tiles():
+    tiles = tile_grid(1000, 1500, 640, 64)
+    assert {(x1 - x0, y1 - y0) for x0, y0, x1, y1 in tiles} == {(640, 640)}
+    assert max(x1 for _, _, x1, _ in tiles) == 1500
+    assert max(y1 for _, _, _, y1 in tiles) == 1000
+
+
+def test_tile_grid_small_frame_is_one_tile():
+    assert tile_grid(300, 400, 640, 64) == [(0, 0, 400, 300)]
+
+
+def test_join_texts_overlap():
+    assert join_texts("HELLO WOR", "WORLD", (0, 90), (60, 110)) == "HELLO WORLD"
+
+
+def test_merge_suppresses_duplicates():
+    recognizer = TiledRecognizer(nms_threshold=0.5)
+    polys, texts, joined, suppressed = recognizer.merge([
+        detection(box(10, 10, 110, 40), "HELLO", tile=0, cut=True),
+        detection(box(12, 11, 112, 41), "HELLO!", tile=1),
+        detection(box(10, 100, 110, 130), "WORLD", tile=1),
+    ])
+    assert texts == ["HELLO!", "WORLD"]
+    assert (joined, suppressed) == (0, 1)
+    assert np.array_equal(polys[0], box(12, 11, 112, 41))
+
+
+def test_merge_keeps_disjoint_lines_in_reading_order():
+    recognizer = TiledRecognizer(nms_threshold=0.5)
+    _, texts, _, suppressed = recognizer.merge([
+        detection(box(10, 100, 110, 130), "SECOND"),
+        detection(box(10, 10, 110, 40), "FIRST"),
+    ])
+    assert texts == ["FIRST", "SECOND"]
+    assert suppressed == 0
+
+
+def test_merge_joins_pieces_cut_by_a_seam():
+    recognizer = TiledRecognizer(nms_threshold=0.5)
+    left = _Detection(box(10, 10, 100, 40), "HELLO WOR", 0, False, True, True)
+    right = _Detection(box(70, 10, 160, 40), "WORLD", 1, True, False, True)
+    polys, texts, joined, _ = recognizer.merge([left, right])
+    assert texts == ["HELLO WORLD"]
+    assert joined == 1
+    assert polys[0][:, 0].min() == 10 and polys[0][:, 0].max() == 160
@@ -0,0 +1,14 @@
+from app.utils.translation_cache import cache_key, normalize_text
+
+
+def test_normalize_text_collapses_whitespace():
+    assert normalize_text("  Hello \n  world\t") == "Hello world"
+
+
+def test_cache_key_folds_spacing_and_language_case():
+    assert cache_key("Hello   world", " zh-CN ") == cache_key("Hello world", "zh-cn")
+    assert cache_key("Hello world", "zh-Hant") == ("Hello world", "zh-hant")
+
+
+def test_cache_key_keeps_text_case():
+    assert cache_key("Hello", "en") != cache_key("hello", "en")
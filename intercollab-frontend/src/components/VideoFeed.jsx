@@ -4,9 +4,10 @@ import React, { useEffect, useRef, useState, useCallback } from "react";
 /**
  * @param {Object} props
  * @param {boolean} props.active
- * @param {function(string): void} [props.onImageCapture]
+ * @param {function(Blob): void} [props.onImageCapture]
+ * @param {number} [props.fps] capture rate while live streaming
  */
-const VideoFeed = ({ active, onImageCapture }) => {
+const VideoFeed = ({ active, onImageCapture, fps = 5 }) => {
   // Ref for camera stream
   const cameraStreamRef = useRef(null);
   
@@ -19,6 +20,9 @@ const VideoFeed = ({ active, onImageCapture }) => {
   // State to manage video visibility
   const [isVideoVisible, setIsVideoVisible] = useState(true);
 
+  // State to manage continuous (live) capture
+  const [isLive, setIsLive] = useState(false);
+
   // Function to capture image from video
   const captureImage = useCallback(() => {
     if (!videoRef.current) return;
@@ -36,20 +40,27 @@ const VideoFeed = ({ active, onImageCapture }) => {
     
     ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
     
-    // Convert canvas to image data URL
-    const imageDataUrl = canvas.toDataURL("image/jpeg");
+    // Encode the frame as binary JPEG (no base64 data URL)
+    canvas.toBlob((blob) => {
+      if (!blob) return;
 
-    // Update state with new image
-    setCapturedImage(imageDataUrl);
-    
-    // Call the callback function with the image data if provided
-    if (typeof onImageCapture === "function") {
-      onImageCapture(imageDataUrl);
-    }
-    
-    console.log("Image captured at", new Date().toLocaleTimeString());
+      // Update state with new image
+      setCapturedImage(blob);
+
+      // Call the callback function with the image data if provided
+      if (typeof onImageCapture === "function") {
+        onImageCapture(blob);
+      }
+    }, "image/jpeg", 0.8);
   }, [onImageCapture]);
 
+  // Capture continuously while live
+  useEffect(() => {
+    if (!isLive || !active) return;
+    const interval = setInterval(captureImage, 1000 / fps);
+    return () => clearInterval(interval);
+  }, [isLive, active, fps, captureImage]);
+
   // Setup and cleanup camera stream
   useEffect(() => {
     if (active && !cameraStreamRef.current) {
@@ -107,6 +118,14 @@ const VideoFeed = ({ active, onImageCapture }) => {
         Capture Now
       </button>
 
+      {/* Button to toggle live streaming of frames */}
+      <button 
+        onClick={() => setIsLive((prev) => !prev)}
+        className="absolute top-4 right-4 bg-red-500 text-white px-3 py-1 rounded"
+      >
+        {isLive ? "Stop Live" : "Go Live"}
+      </button>
+
       {/* Button to toggle video visibility */}
       <button 
         onClick={() => setIsVideoVisible((prev) => !prev)}
@@ -1,38 +1,89 @@
 // intercollab-frontend/src/hooks/Image.jsx
-import { useState, useCallback } from "react";
-import { processImage } from "../utils/api";
+import { useState, useCallback, useEffect, useRef } from "react";
+import { createFrameStream } from "../utils/api";
 
-export const useLatestImage = () => {
+// Shown when the server skipped a frame, keyed by result status
+const SKIPPED_NOTICES = {
+  busy: "Server busy, skipping frames",
+  timeout: "Recognition is taking too long, skipping frames",
+  too_large: "Frame too large for the server, skipping frames",
+};
+
+/**
+ * @param {string} [targetLanguage] translate the recognized lines into this language
+ *   (the original language when empty)
+ */
+export const useLatestImage = (targetLanguage) => {
   const [latestImage, setLatestImage] = useState(null);
   const [recognizedText, setRecognizedText] = useState("");
+  const [translatedText, setTranslatedText] = useState("");
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
+  // Transient state that keeps the last result on screen, e.g. a busy server
+  const [notice, setNotice] = useState(null);
+  const streamRef = useRef(null);
+  const previewUrlRef = useRef(null);
+
+  // Keep one WebSocket open per target language; the backend translates line by
+  // line and reuses the translations of lines that did not change
+  useEffect(() => {
+    setTranslatedText("");
+    const stream = createFrameStream(
+      (result) => {
+        setIsLoading(false);
+        if (result.status === "success") {
+          setError(null);
+          setNotice(null);
+          setRecognizedText(result.text);
+          setTranslatedText(result.translated_text || "");
+          // Update the latest image with the annotated version from the backend
+          if (result.annotated_image) {
+            setLatestImage(result.annotated_image);
+          }
+          console.log("Recognized text:", result.text);
+        } else if (result.status in SKIPPED_NOTICES) {
+          // The server skipped this frame; the next capture is sent as usual
+          setNotice(SKIPPED_NOTICES[result.status]);
+        } else if (result.status === "error") {
+          setError("Failed to process image");
+          console.error("Error processing image:", result.message);
+        }
+      },
+      () => setIsLoading(false),
+      {
+        targetLanguage,
+        onConnectionChange: (connected) => {
+          if (connected) {
+            setError(null);
+          } else {
+            setNotice(null);
+            setError("Connection to the server lost, reconnecting...");
+          }
+        },
+      }
+    );
+    streamRef.current = stream;
+
+    return () => stream.close();
+  }, [targetLanguage]);
 
-  const handleImageCapture = useCallback((imageData) => {
-    setLatestImage(imageData);
-    sendImageForProcessing(imageData);
+  useEffect(() => () => {
+    if (previewUrlRef.current) {
+      URL.revokeObjectURL(previewUrlRef.current);
+    }
   }, []);
 
-  const sendImageForProcessing = async (imageData) => {
-    setIsLoading(true);
-    setError(null);
-    
-    try {
-      console.log("Sending image for processing...");
-      const result = await processImage(imageData);
-      setRecognizedText(result.text);
-      // Update the latest image with the annotated version from the backend
-      if (result.annotated_image) {
-        setLatestImage(result.annotated_image);
-      }
-      console.log("Recognized text:", result.text);
-    } catch (err) {
-      setError("Failed to process image");
-      console.error("Error processing image:", err);
-    } finally {
-      setIsLoading(false);
+  const handleImageCapture = useCallback((frameBlob) => {
+    // Until the first annotated frame comes back, show the raw capture. In live
+    // mode the previous result stays on screen instead of flickering.
+    if (!previewUrlRef.current) {
+      previewUrlRef.current = URL.createObjectURL(frameBlob);
+      setLatestImage((current) => current || previewUrlRef.current);
+      setIsLoading(true);
     }
-  };
 
-  return { latestImage, recognizedText, isLoading, error, handleImageCapture };
-};
\ No newline at end of file
+    streamRef.current?.sendFrame(frameBlob);
+  }, []);
+
+  return { latestImage, recognizedText, translatedText, isLoading, error, notice, handleImageCapture };
+};
@@ -1,38 +1,15 @@
-import React, { useState, useEffect } from "react";
+import React, { useState } from "react";
 import VideoFeed from "../components/VideoFeed";
 import { useLatestImage } from "../hooks/Image";
-import axios from "axios";
 
 const Whiteboard = () => {
   // State for language selection
   const [selectedLanguage, setSelectedLanguage] = useState("en");
-  const [translatedText, setTranslatedText] = useState("");
   
-  // Use the hook to handle image capture and processing
-  const { latestImage, recognizedText, isLoading, error, handleImageCapture } = useLatestImage();
-
-  // Translate text when recognizedText changes
-  useEffect(() => {
-    const translateText = async () => {
-      if (recognizedText && selectedLanguage !== "en") {
-        try {
-          // In a real app, replace this with your actual translation API call
-          const response = await axios.post("http://localhost:8000/api/translate", {
-            text: recognizedText,
-            target_language: selectedLanguage
-          });
-          setTranslatedText(response.data.translated_text);
-        } catch (err) {
-          console.error("Translation error:", err);
-          setTranslatedText("Translation failed");
-        }
-      } else {
-        setTranslatedText("");
-      }
-    };
-    
-    translateText();
-  }, [recognizedText, selectedLanguage]);
+  // Use the hook to handle image capture and processing; the backend translates the
+  // recognized lines with each result, only redoing lines that are new or changed
+  const { latestImage, recognizedText, translatedText, isLoading, error, notice, handleImageCapture } =
+    useLatestImage(selectedLanguage !== "en" ? selectedLanguage : undefined);
 
   const handleLanguageChange = (e: React.ChangeEvent<HTMLSelectElement>) => {
     setSelectedLanguage(e.target.value);
@@ -74,6 +51,7 @@ const Whiteboard = () => {
                 <p className="text-red-500">{error}</p>
               ) : (
                 <div className="w-full">
+                  {notice && <p className="text-sm text-gray-500 mb-2">{notice}</p>}
                   <div className="mb-2">
                     <p className="font-semibold">Original:</p>
                     <p>{recognizedText || "No text recognized yet. Capture an image to start."}</p>
@@ -27,4 +27,101 @@ export const processImage = async (imageData) => {
     }
     throw error;
   }
-};
\ No newline at end of file
+};
+
+const WS_URL = API_URL.replace(/^http/, 'ws');
+
+/**
+ * Open a WebSocket that streams binary JPEG frames to the backend.
+ *
+ * Only one frame is in flight at a time; frames captured meanwhile replace
+ * each other so only the newest one is sent next (latest frame wins).
+ *
+ * With a target language the backend tracks the board's lines across frames and
+ * only translates lines that are new or changed; results then carry
+ * `translated_text` and per-line translations.
+ *
+ * When the connection drops (network error, server restart) it is reopened
+ * with exponential backoff, and the newest frame is sent once it is back.
+ * Results with status "busy", "timeout" or "too_large" mean the frame was
+ * skipped by the server; they are passed to `onResult` like any other result.
+ *
+ * @param {function(Object): void} onResult called with each result message
+ * @param {function(Event|Object): void} [onError] called on connection errors and
+ *   drops (with the close event) and on "error" results
+ * @param {Object} [options]
+ * @param {string} [options.targetLanguage] translate the recognized lines into this language
+ * @param {function(boolean): void} [options.onConnectionChange] called with true/false
+ *   when the connection opens or drops
+ */
+export const createFrameStream = (onResult, onError, { targetLanguage, onConnectionChange } = {}) => {
+  const params = new URLSearchParams();
+  if (targetLanguage) params.set('target_language', targetLanguage);
+  const query = params.toString() ? `?${params}` : '';
+  const url = `${WS_URL}/api/ws/process-image${query}`;
+
+  const INITIAL_RETRY_MS = 500;
+  const MAX_RETRY_MS = 10000;
+
+  let socket = null;
+  let inFlight = false;
+  let pendingFrame = null;
+  let closed = false;
+  let retryMs = INITIAL_RETRY_MS;
+  let retryTimer = null;
+
+  const reportError = (event) => {
+    if (typeof onError === 'function') onError(event);
+  };
+
+  const flush = () => {
+    if (!pendingFrame || inFlight || !socket || socket.readyState !== WebSocket.OPEN) return;
+    socket.send(pendingFrame);
+    pendingFrame = null;
+    inFlight = true;
+  };
+
+  const connect = () => {
+    socket = new WebSocket(url);
+    socket.binaryType = 'arraybuffer';
+
+    socket.onopen = () => {
+      retryMs = INITIAL_RETRY_MS;
+      if (typeof onConnectionChange === 'function') onConnectionChange(true);
+      flush();
+    };
+    socket.onmessage = (event) => {
+      inFlight = false;
+      onResult(JSON.parse(event.data));
+      flush();
+    };
+    socket.onerror = (event) => {
+      console.error('Frame stream error:', event);
+      reportError(event);
+    };
+    socket.onclose = (event) => {
+      // A frame sent on the old connection will never be answered
+      inFlight = false;
+      if (closed) return;
+      if (typeof onConnectionChange === 'function') onConnectionChange(false);
+      reportError(event);
+      console.warn(`Frame stream closed (code ${event.code}), reconnecting in ${retryMs} ms`);
+      retryTimer = setTimeout(connect, retryMs);
+      retryMs = Math.min(retryMs * 2, MAX_RETRY_MS);
+    };
+  };
+
+  connect();
+
+  return {
+    sendFrame: (blob) => {
+      pendingFrame = blob;
+      flush();
+    },
+    close: () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      socket.close();
+    },
+  };
+};